@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+"""
+    Measures the client's per-call overhead, concurrency scaling, token refresh cost and large-response decode time
+
+    Runs offline: the overhead and decode benchmarks answer requests with a canned response from a transport adapter
+    without any network, and the others run against a local StandInServer.  Results are printed as a table and may be
+    written as JSON with --json, then compared with the results of another release with --compare.  Exits with
+    status 1 when --max-regression is given and a result regressed by more than that percentage.
+
+    Usage: python benchmarks/client_bench.py [--quick] [--only overhead,threads,async,token,decode]
+                                             [--json results.json] [--compare baseline.json] [--max-regression 10]
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from timeit import default_timer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pokitdok
+from pokitdok.api import PokitDokClient
+from pokitdok.api.codec import JSONCodec, OrjsonCodec, UjsonCodec
+from pokitdok.api.stand_in import StandInServer
+
+BENCHMARKS = ('overhead', 'threads', 'async', 'token', 'decode')
+
+THREAD_COUNTS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+TOKEN = {'access_token': 'benchmark', 'token_type': 'Bearer', 'expires_in': 3600}
+
+ELIGIBILITY_REQUEST = {
+    'member': {'birth_date': '1970-01-25', 'first_name': 'Jane', 'last_name': 'Doe', 'id': 'W000000000'},
+    'provider': {'first_name': 'JEROME', 'last_name': 'AYA-AY', 'npi': '1467560003'},
+    'service_types': ['health_benefit_plan_coverage'],
+    'trading_partner_id': 'MOCKPAYER',
+}
+
+
+class Results(object):
+    """
+        Benchmark results, each with a name, a value, its unit and whether lower or higher values are better
+    """
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, value, unit, better='lower', **details):
+        result = {'name': name, 'value': value, 'unit': unit, 'better': better}
+        result.update(details)
+        self.results.append(result)
+        print('{0:<40} {1:>14.2f} {2}'.format(name, value, unit))
+        sys.stdout.flush()
+
+    def document(self):
+        """
+            :return: the machine readable results along with a description of the environment they were measured in
+        """
+        return {
+            'suite': 'pokitdok-client',
+            'version': pokitdok.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpus': _cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'results': self.results,
+        }
+
+
+def percentile(values, fraction):
+    """
+        :return: the value below which the given fraction of values fall
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def stub_adapter(content, status_code=200):
+    """
+        :return: a requests transport adapter answering every request with the given JSON content without any
+                 network, so that timings measure the client alone
+    """
+    import datetime
+    import requests
+    from requests.adapters import BaseAdapter
+    from requests.structures import CaseInsensitiveDict
+
+    class StubAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            response = requests.Response()
+            response.status_code = status_code
+            response.headers = CaseInsensitiveDict({'Content-Type': 'application/json',
+                                                    'Content-Length': str(len(content))})
+            response._content = content
+            response.encoding = 'utf-8'
+            response.url = request.url
+            response.request = request
+            response.elapsed = datetime.timedelta(0)
+            response.connection = self
+            return response
+
+        def close(self):
+            pass
+
+    return StubAdapter()
+
+
+def stub_client(content, **kwargs):
+    """
+        :return: a client holding a token, whose requests are answered by a stub_adapter
+    """
+    client = PokitDokClient('benchmark', 'benchmark', base='http://stub.invalid', token=dict(TOKEN), **kwargs)
+    client.api_client.mount('http://', stub_adapter(content))
+    return client
+
+
+def timed(func, iterations, setup=None):
+    """
+        Calls func repeatedly
+        :param setup: a function called before each call of func, which is not timed
+        :return: a list of the seconds taken by each call
+    """
+    timings = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        started = default_timer()
+        func()
+        timings.append(default_timer() - started)
+    return timings
+
+
+def bench_overhead(results, quick):
+    """
+        The time the client spends on a call which is answered without any network: URL formatting, request
+        serialization, header building, OAuth session handling and response decoding
+    """
+    iterations = 500 if quick else 5000
+    content = json.dumps({'meta': {'processing_time': 1}, 'data': {'id': 'MOCKPAYER'}}).encode('utf-8')
+    client = stub_client(content)
+    calls = (
+        ('overhead.get', lambda: client.trading_partners('MOCKPAYER')),
+        ('overhead.post', lambda: client.eligibility(ELIGIBILITY_REQUEST)),
+    )
+    for name, call in calls:
+        timed(call, iterations // 10)
+        timings = timed(call, iterations)
+        results.add(name, percentile(timings, 0.5) * 1e6, 'us', p99=percentile(timings, 0.99) * 1e6,
+                    iterations=iterations)
+
+    # the parts of a call, measured on their own
+    from requests import Request
+    session = client.api_client
+    url = '{0}{1}'.format(client.url_base, client.eligibility_url)
+    body = client.json_codec.dumps(ELIGIBILITY_REQUEST)
+    parts = (
+        ('overhead.url_format', lambda: '{0}{1}'.format(client.url_base, client.trading_partners_url.format('X'))),
+        ('overhead.serialize', lambda: client.json_codec.dumps(ELIGIBILITY_REQUEST)),
+        ('overhead.endpoint_name', lambda: client.endpoint_name(client.eligibility_url)),
+        ('overhead.oauth_sign', lambda: session._client.add_token(url, http_method='POST', body=body,
+                                                                   headers=dict(client.json_headers))),
+        ('overhead.prepare_request', lambda: session.prepare_request(
+            Request('POST', url, data=body, headers=client.json_headers))),
+    )
+    for name, part in parts:
+        timings = timed(part, iterations)
+        results.add(name, percentile(timings, 0.5) * 1e6, 'us', iterations=iterations)
+
+
+def bench_threads(results, quick, server):
+    """
+        Eligibility request throughput and latency of a client shared by many threads
+    """
+    calls = 400 if quick else 2000
+    for threads in THREAD_COUNTS:
+        client = PokitDokClient('benchmark', 'benchmark', base=server.url, pool_connections=1, pool_maxsize=threads)
+        latencies = []
+        client.register_hook('after_response', lambda event: latencies.append(event.timings['total']))
+        per_thread = max(1, calls // threads)
+        client.eligibility(ELIGIBILITY_REQUEST)
+        del latencies[:]
+
+        def worker():
+            for _ in range(per_thread):
+                client.eligibility(ELIGIBILITY_REQUEST)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = default_timer()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = default_timer() - started
+        results.add('threads.{0}.throughput'.format(threads), per_thread * threads / elapsed, 'req/s',
+                    better='higher', p50_ms=percentile(latencies, 0.5) * 1000,
+                    p99_ms=percentile(latencies, 0.99) * 1000, calls=per_thread * threads)
+
+
+def bench_async(results, quick, server):
+    """
+        Eligibility request throughput of the asyncio client at increasing concurrency
+    """
+    try:
+        import aiohttp  # noqa: F401
+        from pokitdok.api.async_client import AsyncPokitDokClient
+    except (ImportError, SyntaxError):
+        print('async benchmarks skipped: aiohttp is not installed')
+        return
+    import asyncio
+
+    calls = 400 if quick else 2000
+    loop = asyncio.new_event_loop()
+    try:
+        for concurrency in THREAD_COUNTS:
+            client = AsyncPokitDokClient('benchmark', 'benchmark', base=server.url, max_connections=concurrency)
+            latencies = []
+            client.register_hook('after_response', lambda event: latencies.append(event.timings['total']))
+            loop.run_until_complete(client.eligibility(ELIGIBILITY_REQUEST))
+            del latencies[:]
+
+            started = default_timer()
+            responses = loop.run_until_complete(client.eligibility_many([ELIGIBILITY_REQUEST] * calls,
+                                                                        max_concurrency=concurrency))
+            elapsed = default_timer() - started
+            loop.run_until_complete(client.close())
+            errors = [response for response in responses if isinstance(response, Exception)]
+            if errors:
+                raise errors[0]
+            results.add('async.{0}.throughput'.format(concurrency), calls / elapsed, 'req/s', better='higher',
+                        p50_ms=percentile(latencies, 0.5) * 1000, p99_ms=percentile(latencies, 0.99) * 1000,
+                        calls=calls)
+    finally:
+        loop.close()
+
+
+def bench_token(results, quick, server):
+    """
+        The cost of fetching an access token, and the added latency of a call made with an expired token
+    """
+    iterations = 50 if quick else 300
+    client = PokitDokClient('benchmark', 'benchmark', base=server.url, auto_refresh=True)
+    timings = timed(client.fetch_access_token, iterations)
+    results.add('token.fetch', percentile(timings, 0.5) * 1000, 'ms', p99=percentile(timings, 0.99) * 1000,
+                iterations=iterations)
+
+    call = lambda: client.trading_partners('MOCKPAYER')
+    fresh = timed(call, iterations)
+
+    def expire_token():
+        # oauthlib derives the expiry from expires_in when it is present
+        token = dict(client.token, expires_at=time.time() - 60)
+        token.pop('expires_in', None)
+        client.token = token
+        client.initialize_api_client()
+
+    expired = timed(call, iterations, setup=expire_token)
+    results.add('token.expired_call_penalty', (percentile(expired, 0.5) - percentile(fresh, 0.5)) * 1000, 'ms',
+                iterations=iterations)
+
+
+def bench_decode(results, quick):
+    """
+        The time taken to decode large responses, by the client and by each available JSON codec alone
+    """
+    iterations = 3 if quick else 10
+    for records in (1000, 10000, 50000):
+        content = json.dumps({'meta': {'count': records}, 'data': [
+            dict(ELIGIBILITY_REQUEST, id=str(index), coverage={'active': True, 'copay': [{'amount': '25.00'}] * 4})
+            for index in range(records)]}).encode('utf-8')
+        megabytes = len(content) / 1e6
+
+        client = stub_client(content)
+        timings = timed(lambda: client.trading_partners(), iterations)
+        results.add('decode.{0}.request'.format(records), percentile(timings, 0.5) * 1000, 'ms',
+                    megabytes=megabytes, iterations=iterations)
+
+        for codec_class in (JSONCodec, OrjsonCodec, UjsonCodec):
+            try:
+                codec = codec_class()
+            except ImportError:
+                continue
+            timings = timed(lambda: codec.loads(content), iterations)
+            results.add('decode.{0}.{1}'.format(records, codec_class.__name__), megabytes / percentile(timings, 0.5),
+                        'MB/s', better='higher', megabytes=megabytes, iterations=iterations)
+
+
+# benchmarks answered by a stub transport, called as bench(results, quick)
+OFFLINE_BENCHMARKS = {
+    'overhead': bench_overhead,
+    'decode': bench_decode,
+}
+
+# benchmarks run against the stand-in server, called as bench(results, quick, server)
+SERVER_BENCHMARKS = {
+    'threads': bench_threads,
+    'async': bench_async,
+    'token': bench_token,
+}
+
+
+def compare(results, baseline, max_regression=None):
+    """
+        Prints the change of each result relative to a baseline
+        :return: the names of the results which regressed by more than max_regression percent
+    """
+    previous = dict((result['name'], result) for result in baseline['results'])
+    regressed = []
+    print('\nCompared with {0} on python {1}:'.format(baseline.get('version'), baseline.get('python')))
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None or not before['value']:
+            continue
+        change = (result['value'] - before['value']) / abs(before['value']) * 100
+        regression = change if result['better'] == 'lower' else -change
+        flag = ''
+        if max_regression is not None and regression > max_regression:
+            regressed.append(result['name'])
+            flag = '  REGRESSED'
+        print('{0:<40} {1:>14.2f} -> {2:>10.2f} {3:<6} {4:+7.1f}%{5}'.format(
+            result['name'], before['value'], result['value'], result['unit'], change, flag))
+    return regressed
+
+
+def _cpu_count():
+    import multiprocessing
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help='comma separated benchmarks to run, from {0}'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--quick', action='store_true', help='run fewer iterations')
+    parser.add_argument('--json', help='the file to write machine readable results to')
+    parser.add_argument('--compare', help='a results file written by --json to compare with')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='the percentage by which a result may regress from --compare before failing')
+    args = parser.parse_args(argv)
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: {0}'.format(', '.join(sorted(unknown))))
+
+    # the stub client and the stand-in server are reached over plain http, which oauthlib refuses unless this is set
+    os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+    results = Results()
+    server = None
+    if any(name in SERVER_BENCHMARKS for name in selected):
+        server = StandInServer(activity_duration=0).start()
+    try:
+        for name in selected:
+            if name in SERVER_BENCHMARKS:
+                SERVER_BENCHMARKS[name](results, args.quick, server)
+            else:
+                OFFLINE_BENCHMARKS[name](results, args.quick)
+    finally:
+        if server is not None:
+            server.stop()
+
+    document = results.document()
+    if args.json:
+        with open(args.json, 'w') as results_file:
+            json.dump(document, results_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressed = compare(document['results'], json.load(baseline_file), args.max_regression)
+        if regressed:
+            print('Regressed: {0}'.format(', '.join(regressed)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
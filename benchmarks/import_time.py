@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+"""
+    Measures the time taken by `import pokitdok` in fresh interpreters and enforces an import time budget
+
+    The import must not load the client's heavy dependencies, which are imported when a client is first used.
+    Exits with status 1 when the median import time exceeds the budget or a deferred module was imported.
+
+    Usage: python benchmarks/import_time.py [--runs 20] [--budget-ms 50]
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# modules which importing pokitdok must not import
+DEFERRED_MODULES = ('requests', 'requests_oauthlib', 'oauthlib', 'urllib3', 'asyncio', 'aiohttp', 'platform',
+                    'concurrent.futures', 'sqlite3', 'email.utils', 'uuid', 'hashlib', 'tempfile')
+
+# imports pokitdok, then prints the import time in seconds and the deferred modules which were imported as JSON
+MEASURE = '''
+import json, sys, time
+before = set(sys.modules)
+started = time.time()
+import pokitdok
+elapsed = time.time() - started
+loaded = [name for name in {0!r} if name in sys.modules and name not in before]
+print(json.dumps([elapsed, loaded]))
+'''
+
+
+def measure(python=sys.executable):
+    """
+        Imports pokitdok in a fresh interpreter
+        :param python: the python interpreter to run
+        :return: a (seconds, list of deferred modules which were imported) tuple
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(path for path in (root, env.get('PYTHONPATH')) if path)
+    output = subprocess.check_output([python, '-c', MEASURE.format(DEFERRED_MODULES)], env=env)
+    elapsed, loaded = json.loads(output.decode('utf-8'))
+    return elapsed, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='the number of interpreters to measure')
+    parser.add_argument('--budget-ms', type=float, default=50.0, help='the import time budget in milliseconds')
+    args = parser.parse_args(argv)
+
+    # the first run compiles any stale bytecode, so it is not counted
+    measure()
+    timings = []
+    loaded = set()
+    for _ in range(args.runs):
+        elapsed, modules = measure()
+        timings.append(elapsed)
+        loaded.update(modules)
+    timings.sort()
+    median = timings[len(timings) // 2] * 1000
+    print('import pokitdok: median {0:.1f} ms, min {1:.1f} ms, max {2:.1f} ms over {3} runs (budget {4:.1f} ms)'
+          .format(median, timings[0] * 1000, timings[-1] * 1000, args.runs, args.budget_ms))
+
+    failed = False
+    if loaded:
+        print('import pokitdok imported deferred modules: {0}'.format(', '.join(sorted(loaded))))
+        failed = True
+    if median > args.budget_ms:
+        print('import pokitdok exceeded its budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,7 +8,45 @@
 #
 
 from __future__ import absolute_import
+import importlib
+import sys
 
+from .cache import ResponseCache, SQLiteResponseCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 from .client import PokitDokClient
+from .codec import JSONCodec, OrjsonCodec, UjsonCodec
+from .exceptions import PokitDokError, APIError
+from .hooks import RequestEvent
+from .metrics import Histogram, Metrics
+from .rate_limit import RateLimiter, RateLimitExceeded
+from .response import APIResponse
+from .retry import RetryPolicy, RetryBudget
+from .token_store import TokenStore, MemoryTokenStore, FileTokenStore
 
 connect = PokitDokClient
+
+# names exported from modules which are imported on first use, since their dependencies are slow to import
+_LAZY_EXPORTS = {
+    'ActivityError': 'activities',
+    'ActivityFuture': 'activities',
+    'ActivityGroup': 'activities',
+    'ActivityTimeout': 'activities',
+    'ActivityWaiter': 'activities',
+    'CallbackReceiver': 'callbacks',
+    'StandInServer': 'stand_in',
+}
+if sys.version_info >= (3, 6):
+    _LAZY_EXPORTS['AsyncPokitDokClient'] = 'async_client'
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in _LAZY_EXPORTS:
+            module = importlib.import_module('.' + _LAZY_EXPORTS[name], __name__)
+            return getattr(module, name)
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+else:
+    from .activities import ActivityError, ActivityFuture, ActivityGroup, ActivityTimeout, ActivityWaiter
+    from .callbacks import CallbackReceiver
+    from .stand_in import StandInServer
+    if sys.version_info >= (3, 6):
+        from .async_client import AsyncPokitDokClient
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from .exceptions import PokitDokError
+from .pagination import page_records
+
+log = logging.getLogger(__name__)
+
+# activity states after which an activity does not change
+TERMINAL_STATES = ('completed', 'failed', 'canceled')
+
+# terminal activity states which mean the activity did not complete
+FAILED_STATES = ('failed', 'canceled')
+
+
+class ActivityError(PokitDokError):
+    """
+        Raised when a watched activity fails or is canceled
+    """
+    def __init__(self, activity):
+        """
+            :param activity: the activity record
+        """
+        self.activity = activity
+        super(ActivityError, self).__init__('Activity {0} {1}'.format(activity.get('id'), activity_state(activity)))
+
+
+class ActivityTimeout(PokitDokError):
+    """
+        Raised when a watched activity has not finished within its timeout
+    """
+    def __init__(self, activity_id, timeout):
+        """
+            :param activity_id: the activity id
+            :param timeout: the number of seconds the activity was watched for
+        """
+        self.activity_id = activity_id
+        self.timeout = timeout
+        super(ActivityTimeout, self).__init__(
+            'Activity {0} did not finish within {1} seconds'.format(activity_id, timeout))
+
+
+def activity_id(activity):
+    """
+        :param activity: an activity id, an activity record, or an API response naming an activity, such as the
+                         response to a claims request
+        :return: the activity id
+    """
+    if not isinstance(activity, dict):
+        return activity
+    meta = activity.get('meta')
+    if isinstance(meta, dict) and meta.get('activity_id'):
+        return meta['activity_id']
+    data = activity.get('data')
+    if isinstance(data, dict):
+        activity = data
+    return activity.get('id') or activity.get('_id')
+
+
+def watched_activity_id(activity):
+    """
+        :param activity: an activity id, an activity record, or an API response naming an activity
+        :return: the activity id
+        :raises ValueError: if no activity id can be found, since polling without one would list all activities
+    """
+    watched_id = activity_id(activity)
+    if not watched_id:
+        raise ValueError('No activity id was found in {0!r}'.format(activity))
+    return watched_id
+
+
+def activity_state(activity):
+    """
+        :param activity: an activity record
+        :return: the name of the activity's state, such as 'scheduled' or 'completed', or None if it is unknown
+    """
+    state = activity.get('state')
+    if isinstance(state, dict):
+        state = state.get('name')
+    return state.lower() if state else None
+
+
+class ActivityFuture(Future):
+    """
+        The eventual outcome of a platform activity, resolved by an ActivityWaiter
+
+        The result is the activity record once the activity completes.  A failed or canceled activity raises
+        ActivityError and an activity which outlives its timeout raises ActivityTimeout.  The latest activity
+        record received is available while the activity is in progress.  The future may be awaited in asyncio
+        code.
+    """
+    def __init__(self, activity_id, parent_id=None):
+        """
+            :param activity_id: the activity id
+            :param parent_id: the id of the activity's parent when it is part of a batch, or None
+        """
+        super(ActivityFuture, self).__init__()
+        self.activity_id = activity_id
+        self.parent_id = parent_id
+        self.activity = None
+        self.timeout = None
+        self.deadline = None
+
+    def __await__(self):
+        import asyncio
+        return asyncio.wrap_future(self).__await__()
+
+
+class ActivityGroup(Future):
+    """
+        The combined outcome of several platform activities, such as the activities started by the chunks of a
+        chunked enrollment snapshot
+
+        The group resolves once every one of its futures has resolved.  The result is the list of activity records
+        in the order of the futures.  If any future failed, the group raises the first failure in that order, and
+        the futures tell which of the activities completed.  The group may be awaited in asyncio code.
+    """
+    def __init__(self, futures):
+        """
+            :param futures: a list of ActivityFutures, or of other futures which have failed, such as the failed
+                            upload of a chunk
+        """
+        super(ActivityGroup, self).__init__()
+        self.futures = list(futures)
+        self._pending = len(self.futures)
+        self._lock = threading.Lock()
+        if not self.futures:
+            self.set_result([])
+        for future in self.futures:
+            future.add_done_callback(self._future_done)
+
+    @property
+    def activity_ids(self):
+        """
+            The ids of the group's activities, with None for a future which does not describe an activity
+        """
+        return [getattr(future, 'activity_id', None) for future in self.futures]
+
+    @property
+    def completed(self):
+        """
+            The number of the group's futures which have resolved
+        """
+        return len(self.futures) - self._pending
+
+    def failed(self):
+        """
+            :return: the indexes of the group's futures which have failed
+        """
+        return [index for index, future in enumerate(self.futures)
+                if future.done() and (future.cancelled() or future.exception() is not None)]
+
+    def _future_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if self._pending:
+                return
+        results = []
+        for future in self.futures:
+            try:
+                results.append(future.result())
+            except BaseException as error:
+                self.set_exception(error)
+                return
+        self.set_result(results)
+
+    def __await__(self):
+        import asyncio
+        return asyncio.wrap_future(self).__await__()
+
+
+class ActivityWaiter(object):
+    """
+        Watches many platform activities at once and resolves an ActivityFuture for each one as it finishes
+
+        Activities are polled from a background thread with adaptive backoff.  Each poll that finds no change
+        lengthens the activity's poll interval by the backoff factor, up to max_poll_interval, and a change of
+        state shortens it to poll_interval again.  The child activities of a batch are polled together with a
+        single parent_id query, rather than with a request per child.  Polls go through the client, so they are
+        subject to its rate limiter and retry policy.
+    """
+    def __init__(self, client, poll_interval=1.0, max_poll_interval=30.0, backoff=1.5):
+        """
+            :param client: the PokitDokClient used to poll activities
+            :param poll_interval: the number of seconds between polls of an activity which is changing
+            :param max_poll_interval: the longest number of seconds between polls of an activity
+            :param backoff: the factor by which the poll interval grows when an activity has not changed
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.polls = 0
+        self._futures = {}
+        self._watches = {}
+        # reentrant, since futures are resolved with the lock held and their callbacks may watch more activities
+        self._lock = threading.RLock()
+        self._condition = threading.Condition(self._lock)
+        self._running = False
+
+    def watch(self, activity, parent_id=None, timeout=None, delay=0):
+        """
+            Starts watching an activity.  Watching an activity which is already watched returns its future.
+            :param activity: an activity id, an activity record, or an API response naming an activity
+            :param parent_id: the id of the activity's parent when it is part of a batch.  The children of a parent
+                              are polled with a single query.
+            :param timeout: the number of seconds after which the future raises ActivityTimeout, or None
+            :param delay: the number of seconds before the activity is first polled, or None to poll it now
+            :return: an ActivityFuture
+            :raises ValueError: if no activity id can be found in activity
+        """
+        watched_id = watched_activity_id(activity)
+        delay = delay or 0
+        with self._lock:
+            future = self._futures.get(watched_id)
+            if future is not None and not future.done():
+                return future
+            future = self._futures[watched_id] = ActivityFuture(watched_id, parent_id=parent_id)
+            now = time.time()
+            if timeout is not None:
+                future.timeout = timeout
+                future.deadline = now + timeout
+            key = ('parent', parent_id) if parent_id is not None else ('activity', watched_id)
+            watch = self._watches.get(key)
+            if watch is None:
+                watch = self._watches[key] = _Watch(key, now + delay, self.poll_interval)
+            else:
+                watch.next_poll = min(watch.next_poll, now + delay)
+            watch.futures[watched_id] = future
+            self._wake()
+        return future
+
+    def watch_children(self, parent, timeout=None, delay=None):
+        """
+            Lists the child activities of a batch activity and starts watching them
+            :param parent: the parent activity id, activity record, or an API response naming it
+            :param timeout: the number of seconds after which each future raises ActivityTimeout, or None
+            :param delay: the number of seconds before the children are next polled.  Defaults to poll_interval.
+            :return: a list of ActivityFutures, one per child activity
+            :raises ValueError: if no activity id can be found in parent
+        """
+        parent_id = watched_activity_id(parent)
+        children = list(self.client.iter_activities(parent_id=parent_id, prefetch=False))
+        return self._watch_records(parent_id, children, timeout, delay)
+
+    def _watch_records(self, parent_id, children, timeout, delay):
+        delay = self.poll_interval if delay is None else delay
+        futures = [self.watch(child, parent_id=parent_id, timeout=timeout, delay=delay) for child in children]
+        for child in children:
+            self.resolve(child)
+        return futures
+
+    def resolve(self, activity):
+        """
+            Updates the future of a watched activity from an activity record received by other means, such as a
+            callback, resolving it if the activity has finished
+            :param activity: the activity record
+            :return: True if the activity is watched
+        """
+        with self._lock:
+            future = self._futures.get(activity_id(activity))
+            if future is None:
+                return False
+            self._update(future, activity)
+            return True
+
+    def cancel(self):
+        """
+            Stops watching all activities, canceling their futures
+        """
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+            self._watches.clear()
+            if self._running:
+                self._wake()
+        for future in futures:
+            future.cancel()
+
+    def _wake(self):
+        """
+            Wakes the poller after the watched activities changed, starting it if it is not running.  Called with
+            the lock held.
+        """
+        if self._running:
+            self._condition.notify()
+            return
+        self._running = True
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        """
+            Polls the watched activities until none remain
+        """
+        while True:
+            with self._lock:
+                due, wait = self._due(time.time())
+                if not due and wait is None:
+                    self._running = False
+                    return
+                if not due:
+                    self._condition.wait(wait)
+                    continue
+            for watch in due:
+                try:
+                    activities = self._fetch(watch)
+                except Exception as error:
+                    self._poll_failed(watch, error)
+                else:
+                    self._polled(watch, activities)
+
+    def _fetch(self, watch):
+        """
+            :return: the activity records of a watch
+        """
+        kind, watched_id = watch.key
+        self.polls += 1
+        if kind == 'parent':
+            return list(self.client.iter_activities(parent_id=watched_id, prefetch=False))
+        return page_records(self.client.activities(watched_id))
+
+    def _due(self, now):
+        """
+            Times out expired futures and finds the watches which are due to be polled.  Called with the lock held.
+            :return: a (list of due watches, seconds until the next watch is due or None) tuple
+        """
+        due = []
+        wait = None
+        for key, watch in list(self._watches.items()):
+            for watched_id, future in list(watch.futures.items()):
+                if future.deadline is not None and future.deadline <= now and not future.done():
+                    future.set_exception(ActivityTimeout(watched_id, future.timeout))
+                if future.done():
+                    del watch.futures[watched_id]
+                    self._futures.pop(watched_id, None)
+                elif future.deadline is not None:
+                    wait = min(wait, future.deadline - now) if wait is not None else future.deadline - now
+            if not watch.futures:
+                del self._watches[key]
+            elif watch.polling:
+                continue
+            elif watch.next_poll <= now:
+                watch.polling = True
+                due.append(watch)
+            else:
+                wait = min(wait, watch.next_poll - now) if wait is not None else watch.next_poll - now
+        return due, wait
+
+    def _polled(self, watch, activities):
+        """
+            Updates the futures of a watch from its polled activity records and schedules its next poll
+        """
+        with self._lock:
+            changed = False
+            for activity in activities:
+                future = watch.futures.get(activity_id(activity))
+                if future is not None:
+                    changed = self._update(future, activity) or changed
+            watch.interval = self.poll_interval if changed else min(self.max_poll_interval,
+                                                                    watch.interval * self.backoff)
+            self._schedule(watch)
+
+    def _poll_failed(self, watch, error):
+        """
+            Backs off the next poll of a watch whose poll failed
+        """
+        log.warning('Unable to poll PokitDok activities %s: %r', watch.key[1], error)
+        with self._lock:
+            watch.interval = min(self.max_poll_interval, watch.interval * self.backoff)
+            self._schedule(watch)
+
+    def _schedule(self, watch):
+        watch.polling = False
+        watch.next_poll = time.time() + watch.interval
+
+    def _update(self, future, activity):
+        """
+            Records an activity record on its future, resolving the future if the activity has finished.  Called
+            with the lock held.
+            :return: True if the activity's state changed
+        """
+        if future.done():
+            return False
+        state = activity_state(activity)
+        changed = future.activity is None or activity_state(future.activity) != state
+        future.activity = activity
+        if state in FAILED_STATES:
+            future.set_exception(ActivityError(activity))
+        elif state in TERMINAL_STATES:
+            future.set_result(activity)
+        return changed
+
+
+class _Watch(object):
+    """
+        Activities polled by a single request: one activity, or the watched children of a parent activity
+    """
+    def __init__(self, key, next_poll, interval):
+        self.key = key
+        self.next_poll = next_poll
+        self.interval = interval
+        self.polling = False
+        self.futures = {}
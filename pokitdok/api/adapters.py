@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_timings = threading.local()
+
+
+@contextmanager
+def record_timings(timings):
+    """
+        Adds the connection pool wait, TCP connect and TLS handshake times of requests sent by the calling thread
+        to a timings dictionary
+        :param timings: dictionary with queue_wait, connect and tls entries
+    """
+    _timings.current = timings
+    try:
+        yield timings
+    finally:
+        _timings.current = None
+
+
+@contextmanager
+def separate_timing(phase):
+    """
+        Records the time spent within the block as a phase of its own in the timings of the calling thread's
+        request.  Connections opened within the block are not recorded in the request's other phases.
+        :param phase: the phase, such as 'token'
+    """
+    timings = getattr(_timings, 'current', None)
+    _timings.current = None
+    started = time.time()
+    try:
+        yield
+    finally:
+        _timings.current = timings
+        if timings is not None:
+            timings[phase] = (timings.get(phase) or 0.0) + time.time() - started
+
+
+def _record(phase, seconds):
+    timings = getattr(_timings, 'current', None)
+    if timings is not None:
+        timings[phase] = (timings.get(phase) or 0.0) + seconds
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+        HTTP connection which records its TCP connect time
+    """
+    def _new_conn(self):
+        started = time.time()
+        try:
+            return super(TimedHTTPConnection, self)._new_conn()
+        finally:
+            _record('connect', time.time() - started)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """
+        HTTPS connection which records its TCP connect and TLS handshake times
+    """
+    def _new_conn(self):
+        started = time.time()
+        try:
+            return super(TimedHTTPSConnection, self)._new_conn()
+        finally:
+            self._connect_time = time.time() - started
+            _record('connect', self._connect_time)
+
+    def connect(self):
+        self._connect_time = 0.0
+        started = time.time()
+        try:
+            return super(TimedHTTPSConnection, self).connect()
+        finally:
+            _record('tls', max(0.0, time.time() - started - self._connect_time))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+    def _get_conn(self, timeout=None):
+        started = time.time()
+        try:
+            return super(TimedHTTPConnectionPool, self)._get_conn(timeout=timeout)
+        finally:
+            _record('queue_wait', time.time() - started)
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+    def _get_conn(self, timeout=None):
+        started = time.time()
+        try:
+            return super(TimedHTTPSConnectionPool, self)._get_conn(timeout=timeout)
+        finally:
+            _record('queue_wait', time.time() - started)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+        requests transport adapter with configurable connection pooling and TCP keep-alive
+
+        Connections record the time spent waiting for a pooled connection, connecting and in the TLS handshake
+        for requests sent within record_timings.
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['tcp_keepalive']
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, tcp_keepalive=False):
+        """
+            :param pool_connections: the number of per-host connection pools to cache
+            :param pool_maxsize: the maximum number of connections kept open for each host
+            :param pool_block: Boolean to indicate whether requests should wait for a free connection when
+                               all connections for a host are in use, rather than opening an extra connection
+                               which is discarded after the request
+            :param tcp_keepalive: False to disable TCP keep-alive probes, True to enable them with the operating
+                                  system's default timing, or the number of idle seconds before the first probe
+        """
+        self.tcp_keepalive = tcp_keepalive
+        super(PooledHTTPAdapter, self).__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                pool_block=pool_block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        socket_options = self.socket_options()
+        if socket_options:
+            pool_kwargs['socket_options'] = socket_options
+        super(PooledHTTPAdapter, self).init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        # time the phases of each request, see record_timings
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+    def socket_options(self):
+        """
+            :return: the socket options applied to new connections, or None to use the urllib3 defaults
+        """
+        if not self.tcp_keepalive:
+            return None
+
+        from requests.packages.urllib3.connection import HTTPConnection
+
+        options = list(HTTPConnection.default_socket_options)
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if self.tcp_keepalive is not True:
+            idle = int(self.tcp_keepalive)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 4)))
+        return options
@@ -0,0 +1,961 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import asyncio
+import codecs
+import functools
+import logging
+import threading
+import time
+from oauthlib.common import generate_token, urldecode
+from oauthlib.oauth2 import (BackendApplicationClient, WebApplicationClient, TokenExpiredError,
+                             InsecureTransportError, is_secure_transport)
+from .activities import ActivityWaiter, watched_activity_id
+from .client import PokitDokClient
+from .hooks import dispatch_hooks
+from .pagination import next_page_params, page_records, repeats_page
+from .response import APIResponse
+from .streaming import ResponseParser
+from .uploads import MultipartUpload
+
+log = logging.getLogger(__name__)
+
+
+class AsyncPokitDokClient(PokitDokClient):
+    """
+        PokitDok Platform API Client for asyncio applications
+        This class provides the same API operations as PokitDokClient over a non-blocking
+        aiohttp transport.  Every API convenience method (eligibility, claims, providers, etc.)
+        returns an awaitable.
+
+        An access token is not fetched during construction.  It is retrieved on the first API
+        request, ahead of it by warm_up(), or explicitly by awaiting fetch_access_token().
+
+        The status_code and last_response attributes describe the last request made by the calling task.  Read
+        from code which has not made requests itself, such as the caller of run_until_complete or gather, they
+        describe the last request made by the client.
+    """
+    def __init__(self, client_id, client_secret, max_connections=100, **kwargs):
+        """
+            Initialize a new asyncio PokitDok API Client
+
+            Accepts the same arguments as PokitDokClient, along with:
+
+            :param max_connections: The maximum number of simultaneous connections held by the client's
+                                    connection pool.  Use 0 for no limit.  Defaults to 100.
+                                    The requests connection pool options of PokitDokClient do not apply.
+
+            The client is always lazy, so the lazy argument has no effect.
+        """
+        self.max_connections = max_connections
+        self.oauth_client = None
+        self.session = None
+        self._async_token_lock = None
+        self._refresh_task = None
+        super(AsyncPokitDokClient, self).__init__(client_id, client_secret, **kwargs)
+        self._call_state = _TaskLocal()
+        if self.single_flight is not None:
+            self.single_flight = _AsyncSingleFlight()
+        if self.oauth_client is None:
+            self.initialize_api_client()
+
+    def _authenticate(self):
+        """
+            Access tokens are fetched on the first API request rather than during construction
+        """
+        pass
+
+    def initialize_api_client(self):
+        """
+            Initialize the oauthlib client depending on client credentials flow or authorization grant flow.
+            The aiohttp session is created on first use so that it is bound to the running event loop.
+        """
+        if self.code is None:
+            # client credentials flow
+            self.oauth_client = BackendApplicationClient(self.client_id, token=self.token)
+        else:
+            # authorization grant flow
+            self.oauth_client = WebApplicationClient(self.client_id, token=self.token)
+
+    def _get_session(self):
+        """
+            Returns the aiohttp session used for API requests, creating it if needed
+        """
+        if self.session is None or self.session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError('AsyncPokitDokClient requires aiohttp. '
+                                  'Install it with: pip install pokitdok[async]')
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections),
+                                                 trace_configs=[_timing_trace_config()])
+        return self.session
+
+    def _get_token_lock(self):
+        if self._async_token_lock is None:
+            self._async_token_lock = asyncio.Lock()
+        return self._async_token_lock
+
+    async def close(self):
+        """
+            Close the aiohttp session and release pooled connections
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def authorization_url(self):
+        """
+            Construct OAuth2 Authorization Grant URL
+            :return: (authorization url, state value) tuple
+        """
+        state = generate_token()
+        url = WebApplicationClient(self.client_id).prepare_request_uri(self.authorize_url,
+                                                                       redirect_uri=self.redirect_uri,
+                                                                       scope=self.scope, state=state)
+        return url, state
+
+    async def _token_request(self, body):
+        """
+            Submits a prepared token request body to the token endpoint and updates the client's token
+
+            :param body: an application/x-www-form-urlencoded token request body
+            :return: the client application's token information as a dictionary
+        """
+        if not is_secure_transport(self.token_url):
+            raise InsecureTransportError()
+
+        started = time.time()
+        async with self._get_session().post(self.token_url, data=dict(urldecode(body)),
+                                            headers={'Accept': 'application/json'}) as response:
+            text = await response.text()
+        self.oauth_client.parse_request_body_response(text, scope=self.scope)
+        self._record_token_request(time.time() - started)
+        self.token = self.oauth_client.token
+        return self.token
+
+    async def fetch_access_token(self, code=None):
+        """
+            Retrieves an OAuth2 access token.
+            When a token store is configured, a valid client credentials token is taken from the store if available.
+            Otherwise the store's lock is held while a token is requested, so that only one of the clients and
+            processes sharing the store requests a new token.  The lock is waited for in a separate thread, so
+            the event loop is not blocked.
+            :param code: optional code value obtained via an authorization grant
+            :return: the client application's token information as a dictionary
+        """
+        if code is None and self.token_store is not None:
+            return await self._fetch_shared_access_token()
+        return await self._request_access_token(code=code)
+
+    async def _fetch_shared_access_token(self):
+        """
+            Retrieves an access token from the token store, requesting a new token while holding the store's lock
+            if the stored token is missing or expired
+        """
+        key = self.token_store_key()
+        token = self._stored_token(key)
+        if token is None:
+            lock = self.token_store.lock(key)
+            await _acquire_in_thread(lock)
+            try:
+                token = self._stored_token(key)
+                if token is None:
+                    token = await self._request_access_token()
+                    self.token_store.set(key, token)
+                    return token
+            finally:
+                lock.__exit__(None, None, None)
+
+        self.token = token
+        self.initialize_api_client()
+        return self.token
+
+    async def _request_access_token(self, code=None):
+        """
+            Requests a new OAuth2 access token from the platform
+            :param code: optional code value obtained via an authorization grant
+            :return: the client application's token information as a dictionary
+        """
+        body = self.oauth_client.prepare_request_body(code=code, redirect_uri=self.redirect_uri,
+                                                      client_id=self.client_id, client_secret=self.client_secret,
+                                                      scope=self.scope)
+        return await self._token_request(body)
+
+    async def refresh_access_token(self):
+        """
+            Exchanges the current refresh token for a new access token.  Clients using the client credentials
+            flow, which are not issued refresh tokens, fetch a new access token instead.
+            :return: the client application's token information as a dictionary
+        """
+        refresh_token = self.oauth_client.refresh_token
+        if not refresh_token:
+            token = await self.fetch_access_token(code=self.code)
+        else:
+            body = self.oauth_client.prepare_refresh_body(refresh_token=refresh_token, scope=self.scope,
+                                                          client_id=self.client_id,
+                                                          client_secret=self.client_secret)
+            token = await self._token_request(body)
+            token.setdefault('refresh_token', refresh_token)
+
+        if self.token_refresh_callback:
+            self.token_refresh_callback(token)
+        return token
+
+    def _refresh_token_ahead(self):
+        """
+            Starts a background token renewal task when the current token is due for one and no renewal is in progress
+        """
+        if (self._refresh_task is None and self._token_refresh_due(self.token) and
+                time.time() >= self._next_refresh_attempt):
+            self._refresh_task = asyncio.ensure_future(self._refresh_token_in_background(self.token))
+
+    async def _refresh_token_in_background(self, token):
+        """
+            Renews the access token unless another task has already replaced it
+        """
+        try:
+            async with self._get_token_lock():
+                if self.token is token:
+                    await self.refresh_access_token()
+        except Exception:
+            log.warning('Unable to refresh the PokitDok access token in the background', exc_info=True)
+            self._next_refresh_attempt = time.time() + 10
+        finally:
+            self._refresh_task = None
+
+    async def _ensure_access_token(self):
+        """
+            Fetches an access token if the client does not have one yet.  Concurrent requests share a single token
+            request.
+        """
+        if not self.token:
+            async with self._get_token_lock():
+                if not self.token:
+                    await self.fetch_access_token(code=self.code)
+
+    def warm_up(self):
+        """
+            Fetches an access token ahead of the first API request, if the client does not have one yet, in a new
+            task.  The token request also opens a pooled connection to the platform, which later requests reuse.
+            Must be called while the event loop is running.  Errors are logged, and the first request fetches the
+            token again.
+            :return: the asyncio Task, which may be awaited to wait for the token
+        """
+        return asyncio.ensure_future(self._warm_up())
+
+    async def _warm_up(self):
+        try:
+            await self._ensure_access_token()
+        except Exception:
+            log.warning('Unable to fetch the PokitDok access token in the background', exc_info=True)
+
+    async def _authorize(self, url, method, headers):
+        """
+            Adds the access token to the request headers, fetching or refreshing the token when needed.
+            Concurrent requests share a single token request.
+        """
+        await self._ensure_access_token()
+
+        try:
+            url, headers, _ = self.oauth_client.add_token(url, http_method=method.upper(), headers=dict(headers))
+        except TokenExpiredError:
+            if not self.auto_refresh:
+                self.status_code = 401  # UNAUTHORIZED
+                raise TokenExpiredError('Access Token has expired. Please, re-authenticate. '
+                                        'Use auto_refresh=True to have your client auto refresh')
+            expired_token = self.token
+            async with self._get_token_lock():
+                if self.token is expired_token:
+                    await self.refresh_access_token()
+            url, headers, _ = self.oauth_client.add_token(url, http_method=method.upper(), headers=dict(headers))
+        return url, headers
+
+    async def _open(self, method, url, headers, data=None, params=None, trading_partner_id=None):
+        """
+            Submits an authorized request, retrying it according to the client's retry policy.  Streamed uploads
+            and file uploads are not retried.  Each attempt is checked by the client's circuit breaker and waits
+            for its rate limiter.
+            :return: the aiohttp response, which must be released by the caller
+        """
+        endpoint = self._url_endpoint(url)
+        policy = self.retry_policy
+        if policy is None or not isinstance(data, (bytes, str, type(None))):
+            return await self._open_attempt(method, url, endpoint, trading_partner_id, 0, headers, data=data,
+                                            params=params)
+
+        import aiohttp
+        policy.budget.record_request()
+        attempt = 0
+        delay = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self._open_attempt(method, url, endpoint, trading_partner_id, attempt - 1, headers,
+                                                    data=data, params=params)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                sent = not isinstance(error, aiohttp.ClientConnectorError)
+                delay = policy.retry_delay(attempt, delay, method, endpoint, sent=sent)
+                if delay is None:
+                    raise
+                log.info('Retrying %s %s in %.2f seconds after %r', method.upper(), url, delay, error)
+            else:
+                delay = policy.retry_delay(attempt, delay, method, endpoint, status=response.status,
+                                           headers=response.headers)
+                if delay is None:
+                    return response
+                log.info('Retrying %s %s in %.2f seconds after a %s response', method.upper(), url, delay,
+                         response.status)
+                response.release()
+            await asyncio.sleep(delay)
+
+    async def _open_attempt(self, method, url, endpoint, trading_partner_id, retries, headers, data=None,
+                            params=None):
+        """
+            Submits one attempt of a request once the client's circuit breaker and rate limiter allow it, calling
+            the client's lifecycle hooks
+        """
+        import aiohttp
+        event = self._request_event(method, url, endpoint, data, retries)
+        # aiohttp reports the TLS handshake as part of connecting
+        event.timings['tls'] = None
+        dispatch_hooks(self.hooks, 'before_request', event)
+        circuit = None
+        try:
+            if self.circuit_breaker is not None:
+                requested_circuit = self.circuit_breaker.circuit(endpoint or url, trading_partner_id)
+                admission = requested_circuit.before_request()
+                circuit = requested_circuit
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(endpoint)
+                if wait:
+                    await asyncio.sleep(wait)
+                event.timings['queue_wait'] = time.time() - event.started
+            sent = time.time()
+            response = await self._open_authorized(method, url, headers, data=data, params=params,
+                                                   timings=event.timings)
+        except BaseException as error:
+            if circuit is not None:
+                if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+                    circuit.record(admission, True, time.time() - sent)
+                else:
+                    circuit.release(admission)
+            event.finish(error=error)
+            dispatch_hooks(self.hooks, 'on_error', event)
+            raise
+
+        if circuit is not None:
+            circuit.record(admission, response.status in self.circuit_breaker.failure_statuses, time.time() - sent)
+        event.finish(response=response, status_code=response.status)
+        dispatch_hooks(self.hooks, 'after_response', event)
+        # the event's timings are reported with the request's APIResponse
+        response.request_event = event
+        return response
+
+    async def _open_authorized(self, method, url, headers, data=None, params=None, timings=None):
+        """
+            Submits an authorized request
+            :param timings: dictionary in which the phases of the request are recorded, see RequestEvent
+            :return: the aiohttp response, which must be released by the caller
+        """
+        if self.refresh_ahead:
+            self._refresh_token_ahead()
+        started = time.time()
+        url, headers = await self._authorize(url, method, headers)
+        if timings is not None:
+            # the time taken to fetch or renew the access token is kept out of the request's other phases
+            timings['token'] += time.time() - started
+        return await self._get_session().request(method.upper(), url, data=data, params=_query_params(params),
+                                                 headers=headers, trace_request_ctx=timings)
+
+    async def _send(self, method, url, headers, data=None, params=None, cache_key=None, cache_ttl=None,
+                    trading_partner_id=None):
+        """
+            Submits an authorized request and decodes the JSON response
+            :return: an APIResponse
+        """
+        response = await self._open(method, url, headers, data=data, params=params,
+                                    trading_partner_id=trading_partner_id)
+        async with response:
+            content = await response.read()
+        if cache_key is not None and response.status == 200:
+            self.response_cache.set(cache_key, (response.status, content), cache_ttl)
+        event = response.request_event
+        return APIResponse(response.status, response.headers, self.json_codec.loads(content),
+                           timings=event.timings, retries=event.retries)
+
+    async def request(self, path, method='get', data=None, files=None, **kwargs):
+        """
+        General coroutine for submitting an API request
+
+        :param path: the API request path
+        :param method: the http request method that should be used
+        :param data: dictionary of request data that should be used for post/put requests, bytes holding
+                     request data which has already been JSON encoded, or a MultipartUpload
+        :param files: dictionary of file information when the API accepts file uploads as input
+        :param kwargs: optional keyword arguments to be relayed along as request parameters
+        :return:
+        """
+        response = await self.request_response(path, method=method, data=data, files=files, **kwargs)
+        return response.body
+
+    async def request_response(self, path, method='get', data=None, files=None, **kwargs):
+        """
+        Submits an API request and returns an APIResponse holding the response's status code, headers, timings
+        and decoded body.  Accepts the same arguments as request.
+
+        :return: an APIResponse
+        """
+        if files:
+            headers = self.base_headers
+            request_data = _form_data(data, files)
+        else:
+            headers, request_data = self._request_body(data, files)
+            if isinstance(data, MultipartUpload):
+                request_data = _stream_upload(data)
+
+        cache_key, cache_ttl = self._response_cache_key(path, method, data, files, kwargs)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                status_code, content = cached
+                self.last_response = APIResponse(status_code, {}, self.json_codec.loads(content), cached=True)
+                return self.last_response
+
+        request_url = "{0}{1}".format(self.url_base, path)
+        send = functools.partial(self._send, method, request_url, headers, data=request_data, params=kwargs,
+                                 cache_key=cache_key, cache_ttl=cache_ttl,
+                                 trading_partner_id=self._trading_partner_id(data, kwargs))
+        single_flight_key = self._single_flight_key(path, method, data, files, kwargs)
+        if single_flight_key is not None:
+            self.last_response = await self.single_flight.do(single_flight_key, send)
+        else:
+            self.last_response = await send()
+        return self.last_response
+
+    async def stream_request(self, path, method='get', data=None, **kwargs):
+        """
+        Submits an API request and decodes the response incrementally as it is received
+
+        :param path: the API request path
+        :param method: the http request method that should be used
+        :param data: dictionary of request data that should be used for post/put requests
+        :param kwargs: optional keyword arguments to be relayed along as request parameters
+        :return: an AsyncStreamingResponse which asynchronously yields the elements of the response's data array
+        :raises APIError: if the response's data is not an array, as when the response reports errors
+        """
+        headers, request_data = self._request_body(data, None)
+        request_url = "{0}{1}".format(self.url_base, path)
+        response = await self._open(method, request_url, headers, data=request_data, params=kwargs,
+                                    trading_partner_id=self._trading_partner_id(data, kwargs))
+        self.status_code = response.status
+        return await AsyncStreamingResponse(response).start()
+
+    async def identity_history(self, identity_uuid, historical_version=None):
+        """
+            Queries for an identity record's history.
+            Returns a history summary including the insert date and version number or a specific record version, if
+            the historical_version argument is provided.
+            :param identity_uuid: The identity resource's uuid.
+            :param historical_version: The historical version id. Used to return a historical identity record
+            :return: history result (list)
+        """
+        path = self.identity_history_url.format(self.url_base, str(identity_uuid))
+
+        if historical_version is not None:
+            path = "{0}/{1}".format(path, historical_version)
+
+        self.last_response = await self._send('get', path, self.base_headers)
+        return self.last_response.body
+
+    async def _iter_records(self, fetch_page, params, prefetch):
+        """
+            Asynchronously iterates over the records of a paginated API listing.  With prefetch enabled, the next
+            page is requested while the current page's records are consumed.
+        """
+        next_response = None
+        try:
+            response = await fetch_page(**params)
+            previous = None
+            while response is not None and not repeats_page(response, previous):
+                params = next_page_params(response, params)
+                if params is not None:
+                    next_response = asyncio.ensure_future(fetch_page(**params)) if prefetch else fetch_page(**params)
+                for record in page_records(response):
+                    yield record
+                previous = response
+                response = await next_response if params is not None else None
+                next_response = None
+        finally:
+            if next_response is not None and prefetch:
+                next_response.cancel()
+            elif next_response is not None:
+                next_response.close()
+
+    def _create_activity_waiter(self):
+        return AsyncActivityWaiter(self)
+
+    async def watch_child_activities(self, parent, timeout=None):
+        """
+            Watches the child activities of a batch activity until they finish
+
+            :param parent: the parent activity id, activity record, or the API response which started it
+            :param timeout: the number of seconds after which each future raises ActivityTimeout, or None
+            :return: a list of ActivityFutures, one per child activity
+        """
+        futures = await self.activity_waiter.watch_children(parent, timeout=timeout, delay=self._poll_delay())
+        self._claim_callbacks(futures)
+        return futures
+
+    async def wait_for_activity(self, activity, timeout=None, parent_id=None):
+        """
+            Waits until a platform activity finishes
+
+            :param activity: an activity id, an activity record, or the API response which started the activity
+            :param timeout: the number of seconds to wait, or None to wait until the activity finishes
+            :param parent_id: the id of the activity's parent when it is part of a batch
+            :return: the activity record of the completed activity
+            :raises ActivityError: if the activity failed or was canceled
+            :raises ActivityTimeout: if the activity did not finish within the timeout
+        """
+        return await self.watch_activity(activity, parent_id=parent_id, timeout=timeout)
+
+    async def eligibility_many(self, eligibility_requests, max_concurrency=10):
+        """
+            Submit many eligibility requests concurrently
+
+            :param eligibility_requests: a list or iterator of dictionaries representing eligibility requests
+            :param max_concurrency: the maximum number of requests in flight at the same time
+            :return: a list of responses in the same order as the requests.  A request which failed is
+                     represented by the exception it raised.
+        """
+        return await _gather_bounded(self.eligibility, eligibility_requests, max_concurrency)
+
+    async def claims_status_many(self, claims_status_requests, max_concurrency=10):
+        """
+            Submit many claims status requests concurrently
+
+            :param claims_status_requests: a list or iterator of dictionaries representing claims status requests
+            :param max_concurrency: the maximum number of requests in flight at the same time
+            :return: a list of responses in the same order as the requests.  A request which failed is
+                     represented by the exception it raised.
+        """
+        return await _gather_bounded(self.claims_status, claims_status_requests, max_concurrency)
+
+    async def enrollment_snapshot_chunked(self, trading_partner_id, x12_file, max_chunk_size=10 * 1024 * 1024,
+                                          max_concurrency=4, compress=False, timeout=None):
+        """
+            Submit a large X12 834 file as several enrollment snapshots which are uploaded concurrently
+
+            Accepts the same arguments as PokitDokClient.enrollment_snapshot_chunked.  The file is split in the
+            default executor, so the event loop is not blocked.
+
+            :return: an ActivityGroup which resolves to the snapshot activity records of the chunks
+        """
+        from .x12 import X12EnrollmentFile
+        loop = asyncio.get_event_loop()
+        with X12EnrollmentFile(x12_file) as enrollment_file:
+            chunks = await loop.run_in_executor(None, enrollment_file.chunks, max_chunk_size)
+            upload = functools.partial(self._enrollment_snapshot_chunk, trading_partner_id, compress=compress)
+            responses = await _gather_bounded(upload, chunks, max_concurrency)
+        return self._activity_group(responses, timeout)
+
+
+async def _acquire_in_thread(lock):
+    """
+        Enters a blocking lock context manager from a new thread, so that neither the event loop nor the default
+        executor's workers are blocked while waiting for it.  If the calling task is canceled while waiting, the
+        lock is released as soon as it has been acquired.
+    """
+    loop = asyncio.get_event_loop()
+    acquired = loop.create_future()
+
+    def acquire():
+        try:
+            lock.__enter__()
+        except BaseException as error:
+            loop.call_soon_threadsafe(_lock_acquired, acquired, lock, error)
+        else:
+            loop.call_soon_threadsafe(_lock_acquired, acquired, lock, None)
+
+    thread = threading.Thread(target=acquire)
+    thread.daemon = True
+    thread.start()
+    await acquired
+
+
+def _lock_acquired(acquired, lock, error):
+    if acquired.cancelled():
+        if error is None:
+            lock.__exit__(None, None, None)
+    elif error is not None:
+        acquired.set_exception(error)
+    else:
+        acquired.set_result(None)
+
+
+async def _gather_bounded(func, items, max_concurrency):
+    """
+        Awaits func for each item with at most max_concurrency calls in progress, returning results in input order
+        with exceptions in place of failed results
+    """
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be at least 1')
+
+    items = enumerate(items)
+    results = []
+
+    async def worker():
+        for index, item in items:
+            try:
+                result = await func(item)
+            except Exception as e:
+                result = e
+            results.append((index, result))
+
+    await asyncio.gather(*[worker() for _ in range(max_concurrency)])
+    return [result for _, result in sorted(results, key=lambda pair: pair[0])]
+
+
+class AsyncStreamingResponse(object):
+    """
+        An API response which is decoded incrementally as it is received
+
+        Asynchronously iterating over the response yields the elements of its "data" array one at a time.
+        The other top level values, such as meta, are available once they have been received.
+    """
+    def __init__(self, response, chunk_size=65536):
+        """
+            :param response: an aiohttp response
+            :param chunk_size: the number of bytes read from the connection at a time
+        """
+        self.response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.chunk_size = chunk_size
+        self.parser = ResponseParser()
+        self._parsed = self._parse()
+        self._pending = []
+
+    @property
+    def meta(self):
+        """
+            :return: the response meta section, or None if it has not been received yet
+        """
+        return self.parser.fields.get('meta')
+
+    @property
+    def fields(self):
+        """
+            :return: dictionary of the top level response values received so far, other than the data array
+        """
+        return self.parser.fields
+
+    async def start(self):
+        """
+            Reads the response up to the start of its data array, like StreamingResponse.start
+            :return: the response
+            :raises APIError: if the response's data is not an array, as when the response reports errors
+        """
+        try:
+            while not self.parser.array_started and not self.parser.done:
+                self._pending.extend(await self._parsed.__anext__())
+            self.parser.raise_for_data()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    async def _parse(self):
+        decoder = codecs.getincrementaldecoder(self.response.charset or 'utf-8')(errors='replace')
+        async for chunk in self.response.content.iter_chunked(self.chunk_size):
+            yield self.parser.feed(decoder.decode(chunk))
+        yield self.parser.feed(decoder.decode(b'', final=True), final=True)
+
+    async def __aiter__(self):
+        try:
+            pending, self._pending = self._pending, []
+            for element in pending:
+                yield element
+            async for elements in self._parsed:
+                for element in elements:
+                    yield element
+            self.parser.raise_for_data()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+            Releases the response's connection
+        """
+        self.response.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+async def _stream_upload(upload):
+    """
+        Yields the chunks of a MultipartUpload, reading files in the default executor so the event loop is not blocked
+    """
+    loop = asyncio.get_event_loop()
+    chunks = iter(upload)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        chunks.close()
+
+
+class AsyncActivityWaiter(ActivityWaiter):
+    """
+        ActivityWaiter for the asyncio client, which polls activities from a task on the event loop rather than
+        from a thread.  Activities must be watched while the event loop is running.
+    """
+    def __init__(self, client, **kwargs):
+        super(AsyncActivityWaiter, self).__init__(client, **kwargs)
+        self._wakeup = None
+
+    async def watch_children(self, parent, timeout=None, delay=None):
+        """
+            Lists the child activities of a batch activity and starts watching them
+            :param parent: the parent activity id, activity record, or an API response naming it
+            :param timeout: the number of seconds after which each future raises ActivityTimeout, or None
+            :param delay: the number of seconds before the children are next polled.  Defaults to poll_interval.
+            :return: a list of ActivityFutures, one per child activity
+            :raises ValueError: if no activity id can be found in parent
+        """
+        parent_id = watched_activity_id(parent)
+        children = [child async for child in self.client.iter_activities(parent_id=parent_id, prefetch=False)]
+        return self._watch_records(parent_id, children, timeout, delay)
+
+    def _wake(self):
+        if self._running:
+            self._wakeup.set()
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            with self._lock:
+                due, wait = self._due(time.time())
+                if not due and wait is None:
+                    self._running = False
+                    return
+                self._wakeup.clear()
+            if not due:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for watch in due:
+                try:
+                    activities = await self._fetch(watch)
+                except Exception as error:
+                    self._poll_failed(watch, error)
+                else:
+                    self._polled(watch, activities)
+
+    async def _fetch(self, watch):
+        kind, watched_id = watch.key
+        self.polls += 1
+        if kind == 'parent':
+            return [activity async for activity in self.client.iter_activities(parent_id=watched_id,
+                                                                                 prefetch=False)]
+        return page_records(await self.client.activities(watched_id))
+
+
+class _AsyncSingleFlight(object):
+    """
+        Coalesces concurrent calls with the same key within an event loop, like SingleFlight does for threads
+    """
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+            Awaits func(), unless a call with the same key is in progress, in which case its outcome is shared
+            :param key: a hashable key identifying the call
+            :param func: a callable which takes no arguments and returns an awaitable
+            :return: the result of func
+        """
+        outcome = self._calls.get(key)
+        if outcome is not None:
+            self.coalesced += 1
+            # shielded so that a cancelled waiter does not cancel the call shared with other waiters
+            result, error = await asyncio.shield(outcome)
+            if error is not None:
+                raise error
+            return result
+
+        # the outcome holds a (result, exception) tuple, so that an exception nobody waits for is not reported
+        # as never retrieved
+        outcome = self._calls[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await func()
+        except BaseException as error:
+            outcome.set_result((None, error))
+            raise
+        finally:
+            del self._calls[key]
+        outcome.set_result((result, None))
+        return result
+
+
+class _TaskLocal(object):
+    """
+        Attributes local to the calling asyncio task, like threading.local is to a thread, with a shared fallback
+
+        Values are kept in a context variable, which each task copies when it is created, so a task's changes stay
+        private to it.  Every value set is also kept as the shared value, which is returned to tasks and other
+        code which have not set the attribute themselves, so that it holds the value set most recently by any task.
+    """
+    def __init__(self):
+        object.__setattr__(self, '_shared', {})
+        try:
+            import contextvars
+        except ImportError:
+            # Python 3.6 has no context variables; fall back to attributes per thread
+            object.__setattr__(self, '_local', threading.local())
+            object.__setattr__(self, '_values', None)
+        else:
+            object.__setattr__(self, '_local', None)
+            object.__setattr__(self, '_values', contextvars.ContextVar('pokitdok_call_state', default={}))
+
+    def _own_values(self):
+        """
+            :return: dictionary of the values set by the calling task, or thread on Python 3.6
+        """
+        if self._values is None:
+            return self._local.__dict__
+        values = self._values.get()
+        # a task inherits the values of the context it was created in, which are not its own
+        return values if values.get(_OWNER) is _current_task() else {}
+
+    def __getattr__(self, name):
+        values = self._own_values()
+        if name in values:
+            return values[name]
+        try:
+            return self._shared[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._shared[name] = value
+        if self._values is None:
+            setattr(self._local, name, value)
+        else:
+            # the dictionary may be shared with the task's parent, so it is copied rather than changed
+            values = dict(self._own_values())
+            values[name] = value
+            values[_OWNER] = _current_task()
+            self._values.set(values)
+
+
+# the _TaskLocal key naming the task which set a context's values
+_OWNER = '__owner__'
+
+
+def _current_task():
+    """
+        :return: the running asyncio task, or None outside a task
+    """
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def _timing_trace_config():
+    """
+        :return: an aiohttp TraceConfig which records the phases of each request in the timings dictionary passed
+                 as the request's trace_request_ctx
+    """
+    import aiohttp
+
+    def add_timing(context, phase, seconds):
+        timings = context.trace_request_ctx
+        if timings is not None:
+            timings[phase] += seconds
+            context.connection_time += seconds
+
+    async def on_request_start(session, context, params):
+        context.started = time.time()
+        context.connection_time = 0.0
+
+    async def on_connection_queued_start(session, context, params):
+        context.queued = time.time()
+
+    async def on_connection_queued_end(session, context, params):
+        add_timing(context, 'queue_wait', time.time() - context.queued)
+
+    async def on_connection_create_start(session, context, params):
+        context.connecting = time.time()
+
+    async def on_connection_create_end(session, context, params):
+        add_timing(context, 'connect', time.time() - context.connecting)
+
+    async def on_request_end(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx['ttfb'] = max(0.0, time.time() - context.started - context.connection_time)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+def _query_params(params):
+    """
+        Converts request keyword arguments to query parameters, expanding list values into repeated
+        parameters as requests does
+    """
+    query = []
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((key, str(v)) for v in values)
+    return query
+
+
+def _form_data(data, files):
+    """
+        Builds a multipart form from request data and a requests-style files dictionary
+    """
+    import aiohttp
+
+    form = aiohttp.FormData()
+    for name, value in (data or {}).items():
+        form.add_field(name, str(value))
+    for name, (filename, file_object, content_type) in files.items():
+        form.add_field(name, file_object, filename=filename, content_type=content_type)
+    return form
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+from collections import deque
+
+
+def run_batch(func, items, max_concurrency=10):
+    """
+        Applies func to each item using a pool of worker threads
+
+        Items are consumed lazily from the iterable, so at most a small multiple of max_concurrency items
+        are held in memory while they wait for a worker.
+
+        :param func: a callable which accepts a single item
+        :param items: a list or iterator of items
+        :param max_concurrency: the maximum number of items processed at the same time
+        :return: a list of results in the same order as the input items.  If processing an item raised an
+                 exception, the exception instance is returned in its place.
+    """
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be at least 1')
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_concurrency * 2:
+                results.append(_outcome(pending.popleft()))
+        while pending:
+            results.append(_outcome(pending.popleft()))
+    return results
+
+
+def _outcome(future):
+    """
+        Returns the result of a completed future, or the exception it raised
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return e
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# default time to live, in seconds, of cached responses for reference data APIs.  providers_npi is the
+# time to live of provider lookups by NPI, while provider searches are only cached when given a time to live.
+DEFAULT_TTLS = {
+    'appointment_types': 3600,
+    'icd_convert': 86400,
+    'mpc': 86400,
+    'pharmacy_plans': 3600,
+    'plans': 3600,
+    'providers_npi': 3600,
+    'schedulers': 3600,
+    'trading_partners': 3600,
+}
+
+# default time to live, in seconds, of responses held by a persistent cache
+PERSISTENT_DEFAULT_TTLS = {
+    'pharmacy_network': 86400,
+    'providers': 86400,
+    'providers_npi': 86400,
+}
+
+
+class ResponseCache(object):
+    """
+        In-memory cache of API responses with per-endpoint expiration and least recently used eviction
+
+        Only GET requests to endpoints which have a time to live are cached.  The cache is safe to share
+        between threads and between clients.
+    """
+    default_ttls = DEFAULT_TTLS
+
+    def __init__(self, maxsize=1024, ttls=None):
+        """
+            :param maxsize: the maximum number of responses held by the cache
+            :param ttls: dictionary of endpoint name to the number of seconds a response remains cached.
+                         Merged with the cache's default_ttls; use a value of 0 or None to disable caching for an
+                         endpoint.  Provider lookups by NPI are configured as 'providers_npi'.
+        """
+        self.maxsize = maxsize
+        self.ttls = dict(self.default_ttls)
+        self.ttls.update(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint):
+        """
+            :param endpoint: an API endpoint name, such as 'trading_partners'
+            :return: the number of seconds responses for the endpoint remain cached, or None if they are not cached
+        """
+        return self.ttls.get(endpoint) or None
+
+    def get(self, key):
+        """
+            :param key: the cache key of a response
+            :return: the cached value, or None if the key is not cached or has expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                self.misses += 1
+                return None
+            # re-insert the entry to mark it as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        """
+            Caches a value
+            :param key: the cache key of a response
+            :param value: the value to cache
+            :param ttl: the number of seconds the value remains cached
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+            Removes all cached values
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+            :return: dictionary of cache hit, miss and eviction counts along with the number of cached values
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+        Persistent cache of API responses stored in a SQLite database
+
+        The cache survives restarts and may be shared by several processes on a host.  By default it holds
+        providers responses, including lookups by NPI, and pharmacy_network responses.  Cached values are
+        (status code, response body) tuples, as stored by PokitDokClient.
+
+        When the cache holds more than maxsize responses, the responses closest to expiring are discarded.
+        Hit, miss and eviction counts are kept per process.  Worker processes should create their own
+        SQLiteResponseCache after they are forked, since SQLite connections may not be shared across a fork.
+    """
+    default_ttls = PERSISTENT_DEFAULT_TTLS
+
+    # the number of responses stored between checks of the cache size
+    purge_interval = 100
+
+    def __init__(self, path, maxsize=100000, ttls=None, timeout=30):
+        """
+            :param path: the path of the SQLite database file, which is created if it does not exist
+            :param maxsize: the maximum number of responses held by the cache, or None for no limit
+            :param ttls: dictionary of endpoint name to the number of seconds a response remains cached.
+                         Merged with PERSISTENT_DEFAULT_TTLS; use a value of 0 or None to disable caching for an
+                         endpoint.
+            :param timeout: the number of seconds to wait for another process to release the database
+        """
+        super(SQLiteResponseCache, self).__init__(maxsize=maxsize, ttls=ttls)
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sets = 0
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'key TEXT PRIMARY KEY, status INTEGER, content BLOB, expires_at REAL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)')
+
+    def _connection(self):
+        """
+            :return: the calling thread's database connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            import sqlite3
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute('SELECT status, content FROM responses WHERE key = ? AND expires_at > ?',
+                                         (json.dumps(key), time.time())).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], bytes(row[1])
+
+    def set(self, key, value, ttl):
+        import sqlite3
+        status, content = value
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO responses (key, status, content, expires_at) VALUES (?, ?, ?, ?)',
+                           (json.dumps(key), status, sqlite3.Binary(content), time.time() + ttl))
+        with self._lock:
+            self._sets += 1
+            purge = self._sets % self.purge_interval == 1
+        if purge:
+            self.purge()
+
+    def purge(self):
+        """
+            Removes expired responses, and the responses closest to expiring when the cache holds more than maxsize
+        """
+        connection = self._connection()
+        connection.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+        if self.maxsize:
+            count = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            if count > self.maxsize:
+                connection.execute('DELETE FROM responses WHERE key IN '
+                                   '(SELECT key FROM responses ORDER BY expires_at LIMIT ?)',
+                                   (count - self.maxsize,))
+                with self._lock:
+                    self.evictions += count - self.maxsize
+
+    def clear(self):
+        self._connection().execute('DELETE FROM responses')
+
+    def stats(self):
+        size = self._connection().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': size,
+            }
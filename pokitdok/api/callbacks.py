@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import binascii
+import hmac
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from .activities import activity_id
+
+try:
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from urlparse import urlparse, parse_qs
+
+log = logging.getLogger(__name__)
+
+
+class CallbackReceiver(object):
+    """
+        A small http server which receives the platform's activity callbacks and resolves the futures of the
+        activities they describe
+
+        A client the receiver is attached to adds the receiver's callback_url to claims, identity_match and
+        enrollment_snapshot requests.  Its watch_activity futures are then resolved by callbacks, and the activities
+        are polled only when no callback has arrived within poll_after seconds.  Callbacks carry a secret in their
+        URL, and callbacks without it are rejected.
+
+        A callback holding an activity record with a state updates the activity's future.  Any other callback is
+        taken to mean that its activity completed, and its payload is kept in the record's 'callback' field.
+        Callbacks which arrive before their activity is watched are kept until it is.  Whether a callback resolves
+        a watched activity or is kept, and whether a newly watched activity claims a kept callback or waits for
+        one, are decided under the receiver's lock, so that a callback arriving while its activity starts being
+        watched is never lost.
+    """
+    def __init__(self, port=0, host='127.0.0.1', path='/pokitdok/callbacks', public_url=None, poll_after=300.0,
+                 secret=None, max_unmatched=1000, max_body_size=1024 * 1024):
+        """
+            :param port: the port to listen on.  Defaults to 0, which picks a free port.
+            :param host: the address to listen on.  Defaults to 127.0.0.1, which accepts callbacks only from the
+                         local host, such as from a proxy.  Use '' to listen on all addresses.
+            :param path: the URL path which receives callbacks
+            :param public_url: the URL at which the platform reaches the receiver, such as https://example.com when
+                               a proxy forwards callbacks to it.  Defaults to the address the receiver listens on.
+            :param poll_after: the number of seconds after which an activity without a callback is polled
+            :param secret: the secret expected in callback URLs.  Defaults to a random secret.
+            :param max_unmatched: the number of callbacks kept for activities which are not watched yet
+            :param max_body_size: the largest callback body accepted, in bytes.  Larger callbacks are answered with
+                                  413 without being read.
+        """
+        self.port = port
+        self.host = host
+        self.path = path
+        self.public_url = public_url
+        self.poll_after = poll_after
+        self.secret = secret or binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.max_unmatched = max_unmatched
+        self.max_body_size = max_body_size
+        self.received = 0
+        self.rejected = 0
+        self.server = None
+        self._watched = {}
+        self._unmatched = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def callback_url(self):
+        """
+            The callback URL given to the platform
+        """
+        if self.public_url:
+            base = self.public_url.rstrip('/')
+        else:
+            base = 'http://{0}:{1}'.format(self.host or 'localhost', self.port)
+        return '{0}{1}?secret={2}'.format(base, self.path, self.secret)
+
+    def attach(self, client):
+        """
+            Resolves the watched activities of a client with the callbacks received
+            :param client: a PokitDokClient
+        """
+        client.callback_receiver = self
+
+    def receive(self, payload):
+        """
+            Resolves the future of the activity described by a callback.  Use this to deliver callbacks received by
+            another web server.
+            :param payload: the decoded callback body
+            :return: True if the callback matched a watched activity
+        """
+        activity = _callback_activity(payload)
+        received_id = activity_id(activity)
+        if received_id is None:
+            return False
+        with self._lock:
+            self.received += 1
+            watched = self._watched.get(received_id)
+            if watched is None:
+                self._unmatched[received_id] = activity
+                while len(self._unmatched) > self.max_unmatched:
+                    self._unmatched.popitem(last=False)
+                return False
+        # the activity is resolved outside the receiver's lock, since the waiter runs future callbacks, which may
+        # watch more activities, with its own lock held
+        future, waiter = watched
+        waiter.resolve(activity)
+        return True
+
+    def claim(self, future, waiter):
+        """
+            Resolves a newly watched activity with a callback received before it was watched, or else has the
+            callbacks received for it from now on resolve it
+            :param future: the ActivityFuture of the activity which started being watched
+            :param waiter: the ActivityWaiter watching the activity
+        """
+        with self._lock:
+            activity = self._unmatched.pop(future.activity_id, None)
+            if activity is None:
+                self._watched[future.activity_id] = (future, waiter)
+        if activity is not None:
+            waiter.resolve(activity)
+        else:
+            future.add_done_callback(self._unwatch)
+
+    def _unwatch(self, future):
+        """
+            Stops resolving an activity with callbacks once its future is done
+        """
+        with self._lock:
+            watched = self._watched.get(future.activity_id)
+            if watched is not None and watched[0] is future:
+                del self._watched[future.activity_id]
+
+    def start(self):
+        """
+            Starts receiving callbacks in a background thread
+            :return: the receiver
+        """
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+        receiver = self
+
+        class CallbackServer(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                secret = parse_qs(url.query).get('secret', [''])[0]
+                if url.path != receiver.path or not hmac.compare_digest(_utf8(secret), _utf8(receiver.secret)):
+                    with receiver._lock:
+                        receiver.rejected += 1
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._reply(400)
+                    return
+                if length > receiver.max_body_size:
+                    self._reply(413)
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(length).decode('utf-8'))
+                except ValueError:
+                    self._reply(400)
+                    return
+                try:
+                    receiver.receive(payload)
+                except Exception:
+                    log.warning('Unable to process a PokitDok callback', exc_info=True)
+                self._reply(200)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = CallbackServer((self.host, self.port), CallbackHandler)
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """
+            Stops receiving callbacks
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def _utf8(text):
+    """
+        :return: text encoded as UTF-8 bytes, since compare_digest only accepts ASCII strings
+    """
+    return text if isinstance(text, bytes) else text.encode('utf-8')
+
+
+def _callback_activity(payload):
+    """
+        :return: the activity record described by a callback payload
+    """
+    if not isinstance(payload, dict):
+        return {}
+    record = payload.get('data') if isinstance(payload.get('data'), dict) else payload
+    if record.get('state') and activity_id(record):
+        return record
+    return {'id': activity_id(payload), 'state': {'name': 'completed'}, 'callback': payload}
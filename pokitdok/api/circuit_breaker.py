@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import threading
+import time
+from .exceptions import PokitDokError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# response status codes which count as failures of the endpoint
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(PokitDokError):
+    """
+        Raised instead of sending a request while the circuit for its endpoint is open
+    """
+    def __init__(self, endpoint, trading_partner_id, retry_after):
+        """
+            :param endpoint: the endpoint name, or the request path if the endpoint is unknown
+            :param trading_partner_id: the request's trading partner, or None
+            :param retry_after: the number of seconds until the circuit allows a trial request
+        """
+        self.endpoint = endpoint
+        self.trading_partner_id = trading_partner_id
+        self.retry_after = retry_after
+        target = endpoint if trading_partner_id is None else '{0} ({1})'.format(endpoint, trading_partner_id)
+        super(CircuitOpenError, self).__init__(
+            'The circuit for {0} requests is open. Retry in {1:.3f} seconds'.format(target, retry_after))
+
+
+class CircuitBreaker(object):
+    """
+        Fails requests fast while an endpoint is failing or slow, so that they do not hold up requests to healthy
+        endpoints
+
+        Each endpoint has its own circuit, and requests naming a trading partner have a circuit per trading
+        partner, since a single payer may be degraded.  A circuit opens when, over the last window seconds, the
+        rate of failed requests or the rate of slow requests reaches its threshold.  While a circuit is open,
+        requests raise CircuitOpenError.  After open_duration seconds the circuit is half open and allows
+        half_open_requests trial requests; it closes when all of them succeed, and opens again if one fails.
+        Only the outcomes of the trial requests decide whether a half open circuit closes, not those of requests
+        admitted before the circuit opened.
+
+        Failures are connection errors, timeouts and responses with one of the failure statuses.  A circuit breaker
+        may be shared by the clients in a process.
+    """
+    def __init__(self, failure_rate=0.5, slow_rate=None, slow_duration=10.0, min_requests=20, window=30.0,
+                 open_duration=30.0, half_open_requests=1, failure_statuses=FAILURE_STATUSES):
+        """
+            :param failure_rate: the fraction of failed requests which opens a circuit
+            :param slow_rate: the fraction of slow requests which opens a circuit. Defaults to None, which does not
+                              open circuits for slow requests.
+            :param slow_duration: the number of seconds after which a request counts as slow
+            :param min_requests: the number of requests within the window needed before a circuit may open
+            :param window: the number of seconds of requests considered by the failure and slow rates
+            :param open_duration: the number of seconds a circuit stays open before allowing trial requests
+            :param half_open_requests: the number of successful trial requests needed to close a circuit
+            :param failure_statuses: the response status codes which count as failures
+        """
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_duration = slow_duration
+        self.min_requests = min_requests
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_requests = half_open_requests
+        self.failure_statuses = frozenset(failure_statuses)
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def circuit(self, endpoint, trading_partner_id=None):
+        """
+            :param endpoint: the endpoint name, or the request path if the endpoint is unknown
+            :param trading_partner_id: the request's trading partner, or None
+            :return: the Circuit for requests to the endpoint and trading partner
+        """
+        key = (endpoint, trading_partner_id)
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.setdefault(key, Circuit(self, endpoint, trading_partner_id))
+        return circuit
+
+    def states(self):
+        """
+            :return: dictionary of (endpoint, trading partner) to the state of each circuit which is not closed
+        """
+        with self._lock:
+            circuits = list(self._circuits.items())
+        return dict((key, circuit.state) for key, circuit in circuits if circuit.state != CLOSED)
+
+
+class Circuit(object):
+    """
+        The state of the circuit for one endpoint and trading partner
+
+        Request outcomes are counted in ten buckets spanning the circuit breaker's window, so that the
+        failure and slow rates cover recent requests only.  Each change of state starts a new generation, and
+        each admitted request is tagged with the state and generation it was admitted in, so that the outcomes
+        of requests admitted in an earlier generation are ignored.
+    """
+    buckets = 10
+
+    def __init__(self, breaker, endpoint, trading_partner_id):
+        self.breaker = breaker
+        self.endpoint = endpoint
+        self.trading_partner_id = trading_partner_id
+        self.state = CLOSED
+        self._opened_at = 0
+        self._trials = 0
+        self._trial_successes = 0
+        self._generation = 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+            Admits a request, which must be followed by a call to record or release
+            :return: the admission, a (state, generation) tuple which is passed to record or release
+            :raises CircuitOpenError: if the circuit is open, or half open with all trial requests in progress
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return CLOSED, self._generation
+            retry_after = self._opened_at + self.breaker.open_duration - time.time()
+            if self.state == OPEN and retry_after <= 0:
+                self._set_state(HALF_OPEN)
+                self._trials = 0
+                self._trial_successes = 0
+            if self.state == HALF_OPEN and self._trials < self.breaker.half_open_requests:
+                self._trials += 1
+                return HALF_OPEN, self._generation
+        raise CircuitOpenError(self.endpoint, self.trading_partner_id, max(0.0, retry_after))
+
+    def record(self, admission, failed, duration):
+        """
+            Records the outcome of an admitted request
+            :param admission: the admission returned by before_request
+            :param failed: Boolean to indicate whether the request failed
+            :param duration: the number of seconds the request took
+        """
+        breaker = self.breaker
+        slow = breaker.slow_rate is not None and duration >= breaker.slow_duration
+        with self._lock:
+            if admission != (self.state, self._generation):
+                # the request was admitted before the circuit last changed state
+                return
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= breaker.half_open_requests:
+                        self._set_state(CLOSED)
+                        self._counts.clear()
+                return
+
+            now = time.time()
+            width = breaker.window / self.buckets
+            bucket = int(now / width)
+            counts = self._counts.setdefault(bucket, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += 1 if failed else 0
+            counts[2] += 1 if slow else 0
+
+            oldest = bucket - self.buckets + 1
+            total = failures = slows = 0
+            for key in list(self._counts):
+                if key < oldest:
+                    del self._counts[key]
+                else:
+                    total += self._counts[key][0]
+                    failures += self._counts[key][1]
+                    slows += self._counts[key][2]
+            if total >= breaker.min_requests and (
+                    failures >= breaker.failure_rate * total or
+                    (breaker.slow_rate is not None and slows >= breaker.slow_rate * total)):
+                self._open()
+
+    def release(self, admission):
+        """
+            Ends an admitted request whose outcome says nothing about the endpoint's health
+            :param admission: the admission returned by before_request
+        """
+        with self._lock:
+            if admission == (HALF_OPEN, self._generation) and self.state == HALF_OPEN:
+                self._trials -= 1
+
+    def _set_state(self, state):
+        self.state = state
+        self._generation += 1
+
+    def _open(self):
+        self._set_state(OPEN)
+        self._opened_at = time.time()
+        self._counts.clear()
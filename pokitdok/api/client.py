@@ -9,13 +9,78 @@
 
 from __future__ import absolute_import
 import json
+import logging
 import os
-import platform
+import functools
+import re
+import threading
+import time
 import pokitdok
-import requests
-from requests_oauthlib import OAuth2Session, TokenUpdated
-from oauthlib.oauth2 import BackendApplicationClient, TokenExpiredError
 from warnings import warn
+from .batch import run_batch
+from .codec import default_codec
+from .hooks import HOOK_EVENTS, RequestEvent, default_hooks, dispatch_hooks, payload_size
+from .pagination import iter_records
+from .response import APIResponse
+from .retry import RetryPolicy
+from .single_flight import SingleFlight
+from .streaming import StreamingResponse
+from .uploads import MultipartUpload
+
+log = logging.getLogger(__name__)
+
+# requests, requests_oauthlib and oauthlib are imported where they are first needed rather than here, so that
+# importing pokitdok stays fast for programs which construct a client late, or not at all
+
+# API endpoint names along with the client attribute holding each endpoint's URL template
+ENDPOINT_URLS = (
+    ('activities', 'activities_url'),
+    ('appointment_types', 'appointment_types_url'),
+    ('appointments', 'appointments_url'),
+    ('authorizations', 'authorizations_url'),
+    ('cash_prices', 'prices_cash_url'),
+    ('ccd', 'ccd_url'),
+    ('claims', 'claims_url'),
+    ('claims_convert', 'claims_convert_url'),
+    ('claims_status', 'claims_status_url'),
+    ('eligibility', 'eligibility_url'),
+    ('enrollment', 'enrollment_url'),
+    ('enrollment_snapshot', 'enrollment_snapshot_url'),
+    ('enrollment_snapshot_data', 'enrollment_snapshot_data_url'),
+    ('icd_convert', 'icd_url'),
+    ('identity', 'identity_get_url'),
+    ('identity_match', 'identity_match_url'),
+    ('identity_proof_generate', 'identity_proof_generate_url'),
+    ('identity_proof_score', 'identity_proof_score_url'),
+    ('identity_proof_valid', 'identity_proof_valid_url'),
+    ('insurance_prices', 'prices_insurance_url'),
+    ('mpc', 'mpc_url'),
+    ('oop_insurance_estimate', 'oop_insurance_estimate_url'),
+    ('oop_insurance_prices', 'oop_insurance_price_url'),
+    ('pharmacy_formulary', 'pharmacy_formulary_url'),
+    ('pharmacy_network', 'pharmacy_network_url'),
+    ('pharmacy_plans', 'pharmacy_plans_url'),
+    ('plans', 'plans_url'),
+    ('providers', 'providers_url'),
+    ('referrals', 'referrals_url'),
+    ('schedule_slots', 'schedule_slots_url'),
+    ('schedulers', 'schedulers_url'),
+    ('trading_partners', 'trading_partners_url'),
+)
+
+_user_agent = None
+
+
+def user_agent():
+    """
+        :return: the User-Agent header sent with API requests, naming the client, Python and operating system versions
+    """
+    global _user_agent
+    if _user_agent is None:
+        import platform
+        _user_agent = 'pokitdok-python#{0}#{1}#{2}#{3}'.format(pokitdok.__version__, platform.python_version(),
+                                                                platform.system(), platform.release())
+    return _user_agent
 
 
 class PokitDokClient(object):
@@ -23,10 +88,56 @@ class PokitDokClient(object):
         PokitDok Platform API Client
         This class provides a wrapper around requests and requests-oauth
         to handle common API operations
+
+        A client may be shared by several threads, which share its connection pool.  The status_code and
+        last_response attributes describe the last request made by the calling thread.
+
+        A lazy client does no I/O during construction: its access token is fetched on the first API request, or
+        ahead of it by warm_up.
     """
+    # API endpoint URL templates, relative to url_base
+    activities_url = "/activities/{0}"
+    authorizations_url = "/authorizations/"
+    ccd_url = "/ccd/"
+    claims_url = "/claims/"
+    claims_convert_url = "/claims/convert"
+    claims_status_url = "/claims/status"
+    eligibility_url = "/eligibility/"
+    enrollment_url = "/enrollment/"
+    enrollment_snapshot_url = "/enrollment/snapshot"
+    enrollment_snapshot_data_url = "/enrollment/snapshot/{0}/data"
+    icd_url = "/icd/convert/{0}"
+    identity_post_url = "/identity/"
+    identity_put_url = "/identity/{0}"
+    identity_get_url = "/identity"
+    identity_match_url = "/identity/match"
+    identity_history_url = "{0}/identity/{1}/history"
+    identity_proof_generate_url = "/identity/proof/questions/generate/"
+    identity_proof_score_url = "/identity/proof/questions/score/"
+    identity_proof_valid_url = "/identity/proof/valid/"
+    mpc_url = "/mpc/{0}"
+    oop_insurance_estimate_url = "/oop/insurance-estimate"
+    oop_insurance_price_url = "/oop/insurance-load-price"
+    pharmacy_formulary_url = "/pharmacy/formulary"
+    pharmacy_network_url = "/pharmacy/network"
+    pharmacy_plans_url = "/pharmacy/plans"
+    plans_url = "/plans/"
+    prices_cash_url = "/prices/cash"
+    prices_insurance_url = "/prices/insurance"
+    providers_url = "/providers/{0}"
+    referrals_url = "/referrals/"
+    appointments_url = "/schedule/appointments/{0}"
+    appointment_types_url = "/schedule/appointmenttypes/{0}"
+    schedulers_url = "/schedule/schedulers/{0}"
+    schedule_slots_url = "/schedule/slots/"
+    trading_partners_url = "/tradingpartners/{0}"
+
     def __init__(self, client_id, client_secret, base="https://platform.pokitdok.com", version="v4",
                  redirect_uri=None, scope=None, auto_refresh=False, token_refresh_callback=None, code=None,
-                 token=None):
+                 token=None, pool_connections=10, pool_maxsize=10, pool_block=False, tcp_keepalive=False,
+                 token_store=None, refresh_ahead=None, response_cache=None, json_codec=None, retry_policy=None,
+                 rate_limiter=None, circuit_breaker=None, hooks=None, metrics=None, lazy=False,
+                 coalesce_requests=False, callback_receiver=None):
         """
             Initialize a new PokitDok API Client
 
@@ -44,12 +155,50 @@ class PokitDokClient(object):
             :param token: The current API access token for your PokitDok Platform Application. If not provided a new
                 token is generated. Defaults to None.
              API clients to reuse an access token across requests. Defaults to None.
+            :param pool_connections: The number of per-host connection pools to cache. Defaults to 10.
+            :param pool_maxsize: The maximum number of connections kept open to each host. Set this to at least the
+                                 number of threads sharing the client. Defaults to 10.
+            :param pool_block: Boolean to indicate whether requests should wait for a pooled connection when all
+                               connections to a host are in use. Defaults to False.
+            :param tcp_keepalive: Enables TCP keep-alive on pooled connections when True, or when set to the number
+                                  of idle seconds before the first keep-alive probe. Defaults to False.
+            :param token_store: a TokenStore shared with other clients, such as a FileTokenStore shared by the
+                                processes on a host. Client credentials access tokens are reused from the store while
+                                they are valid, and only one client sharing the store requests a replacement.
+                                Defaults to None.
+            :param refresh_ahead: the fraction of an access token's lifetime after which a replacement token is
+                                  requested in the background, for example 0.8.  Requests continue to use the current
+                                  token while the replacement is requested. Defaults to None, which renews tokens
+                                  only once they have expired.
+            :param response_cache: a ResponseCache used to cache responses of reference data APIs, such as
+                                   trading_partners and icd_convert. Defaults to None.
+            :param json_codec: a JSONCodec used to encode request bodies and decode responses. Defaults to a codec
+                               using orjson or ujson when either is installed, or the standard library json module.
+            :param retry_policy: a RetryPolicy used to retry requests which fail with a connection error or a
+                                 429, 502, 503 or 504 response, or True to use the default RetryPolicy.
+                                 Defaults to None, which does not retry requests.
+            :param rate_limiter: a RateLimiter used to limit the rate of requests to each group of endpoints.
+                                 Share one RateLimiter between clients to apply a single limit to all of them.
+                                 Defaults to None.
+            :param circuit_breaker: a CircuitBreaker used to fail requests fast while their endpoint, or their
+                                    endpoint for a trading partner, is failing or slow. Defaults to None.
+            :param hooks: dictionary of request lifecycle event ('before_request', 'after_response' or 'on_error')
+                          to a function, or list of functions, called with a RequestEvent for each attempt of a
+                          request. Defaults to None.
+            :param metrics: a Metrics object which records the client's request counts, errors, retries, access
+                            token requests and per-endpoint latency. Defaults to None.
+            :param lazy: Boolean to indicate whether the access token and http session should be created on first
+                         use rather than during construction, so that constructing the client does no I/O.
+                         Defaults to False.
+            :param coalesce_requests: Boolean to indicate whether concurrent identical GET requests should share a
+                                      single request to the platform.  Each caller receives the same response.
+                                      Defaults to False.
+            :param callback_receiver: a CallbackReceiver whose callback URL is added to claims, identity_match and
+                                      enrollment_snapshot requests, and whose callbacks resolve the client's
+                                      activity futures. Defaults to None.
         """
         self.base_headers = {
-            'User-Agent': 'pokitdok-python#{0}#{1}#{2}#{3}'.format(pokitdok.__version__,
-                                                                   platform.python_version(),
-                                                                   platform.system(),
-                                                                   platform.release())
+            'User-Agent': user_agent()
         }
         self.json_headers = {
             'Content-type': 'application/json',
@@ -63,68 +212,141 @@ class PokitDokClient(object):
         self.auto_refresh = auto_refresh
         self.token_refresh_callback = token_refresh_callback
         self.token = token
+        self.token_store = token_store
+        self.refresh_ahead = refresh_ahead
+        self.response_cache = response_cache
+        self.json_codec = json_codec or default_codec()
+        self.retry_policy = RetryPolicy() if retry_policy is True else retry_policy
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.single_flight = SingleFlight() if coalesce_requests else None
+        self.hooks = default_hooks()
+        for event, hook in (hooks or {}).items():
+            self.register_hook(event, hook)
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
+        self._endpoint_patterns = None
+        self._token_lock = threading.Lock()
+        self._session_lock = threading.RLock()
+        self._next_refresh_attempt = 0
         self.url_base = "{0}/api/{1}".format(base, version)
         self.token_url = "{0}/oauth2/token".format(base)
         self.authorize_url = "{0}/oauth2/authorize".format(base)
-        self.api_client = None
-        self.status_code = 0
-
-        self.activities_url = "/activities/{0}"
-        self.authorizations_url = "/authorizations/"
-        self.ccd_url = "/ccd/"
-        self.claims_url = "/claims/"
-        self.claims_convert_url = "/claims/convert"
-        self.claims_status_url = "/claims/status"
-        self.eligibility_url = "/eligibility/"
-        self.enrollment_url = "/enrollment/"
-        self.enrollment_snapshot_url = "/enrollment/snapshot"
-        self.enrollment_snapshot_data_url = "/enrollment/snapshot/{0}/data"
-        self.icd_url = "/icd/convert/{0}"
-        self.identity_post_url = "/identity/"
-        self.identity_put_url = "/identity/{0}"
-        self.identity_get_url = "/identity"
-        self.identity_match_url = "/identity/match"
-        self.identity_history_url = "{0}/identity/{1}/history"
-        self.identity_proof_generate_url = "/identity/proof/questions/generate/"
-        self.identity_proof_score_url = "/identity/proof/questions/score/"
-        self.identity_proof_valid_url = "/identity/proof/valid/"
-        self.mpc_url = "/mpc/{0}"
-        self.oop_insurance_estimate_url = "/oop/insurance-estimate"
-        self.oop_insurance_price_url = "/oop/insurance-load-price"
-        self.pharmacy_formulary_url = "/pharmacy/formulary"
-        self.pharmacy_network_url = "/pharmacy/network"
-        self.pharmacy_plans_url = "/pharmacy/plans"
-        self.plans_url = "/plans/"
-        self.prices_cash_url = "/prices/cash"
-        self.prices_insurance_url = "/prices/insurance"
-        self.providers_url = "/providers/{0}"
-        self.referrals_url = "/referrals/"
-        self.appointments_url = "/schedule/appointments/{0}"
-        self.appointment_types_url = "/schedule/appointmenttypes/{0}"
-        self.schedulers_url = "/schedule/schedulers/{0}"
-        self.schedule_slots_url = "/schedule/slots/"
-        self.trading_partners_url = "/tradingpartners/{0}"
+        self.lazy = lazy
+        self._activity_waiter = None
+        self.callback_receiver = None
+        if callback_receiver is not None:
+            callback_receiver.attach(self)
+        self._api_client = None
+        self._call_state = threading.local()
+        self._http_adapter = None
+        self._pool_options = {'pool_connections': pool_connections, 'pool_maxsize': pool_maxsize,
+                              'pool_block': pool_block, 'tcp_keepalive': tcp_keepalive}
 
-        self.initialize_api_client()
+        if not lazy:
+            self.initialize_api_client()
+            self._authenticate()
+
+    @property
+    def http_adapter(self):
+        """
+            The PooledHTTPAdapter holding the client's connection pool, created on first use
+        """
+        if self._http_adapter is None:
+            with self._session_lock:
+                if self._http_adapter is None:
+                    from .adapters import PooledHTTPAdapter
+                    self._http_adapter = PooledHTTPAdapter(**self._pool_options)
+        return self._http_adapter
+
+    @http_adapter.setter
+    def http_adapter(self, http_adapter):
+        self._http_adapter = http_adapter
+
+    @property
+    def api_client(self):
+        """
+            The OAuth2Session used for API requests, created on first use
+        """
+        if self._api_client is None:
+            with self._session_lock:
+                if self._api_client is None:
+                    self._api_client = self._create_api_client()
+        return self._api_client
+
+    @api_client.setter
+    def api_client(self, api_client):
+        self._api_client = api_client
+
+    def _authenticate(self):
+        """
+            Fetches an access token during client construction when one has not been provided
+        """
         if self.token is None:
             self.fetch_access_token(code=self.code)
 
+    def _ensure_access_token(self):
+        """
+            Fetches an access token if the client does not have one yet.  Concurrent requests share a single token
+            request.
+        """
+        if self.token is None:
+            with self._token_lock:
+                if self.token is None:
+                    self.fetch_access_token(code=self.code)
+
+    def warm_up(self, background=True):
+        """
+            Fetches an access token ahead of the first API request, if the client does not have one yet.  The token
+            request also opens a pooled connection to the platform, which later requests reuse.
+            :param background: Boolean to indicate whether the token should be fetched in a background thread.
+                               Errors in the background are logged, and the first request fetches the token again.
+            :return: the background thread, or None
+        """
+        if not background:
+            self._ensure_access_token()
+            return None
+        thread = threading.Thread(target=self._warm_up_in_background)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _warm_up_in_background(self):
+        try:
+            self._ensure_access_token()
+        except Exception:
+            log.warning('Unable to fetch the PokitDok access token in the background', exc_info=True)
+
     def initialize_api_client(self):
         """
             Initialize OAuth2Session client depending on client credentials flow or authorization grant flow
         """
+        self.api_client = self._create_api_client()
+
+    def _create_api_client(self):
+        """
+            Creates an OAuth2Session for the client's current token which shares the client's connection pool
+        """
+        from oauthlib.oauth2 import BackendApplicationClient
+        from requests_oauthlib import OAuth2Session
         if self.code is None:
             # client credentials flow
-            self.api_client = OAuth2Session(self.client_id, client=BackendApplicationClient(self.client_id),
-                                            token=self.token)
+            api_client = OAuth2Session(self.client_id, client=BackendApplicationClient(self.client_id),
+                                       token=self.token)
         else:
             # authorization grant flow
             refresh_url = self.token_url if self.auto_refresh else None
-            self.api_client = OAuth2Session(self.client_id, redirect_uri=self.redirect_uri, scope=self.scope,
-                                            auto_refresh_url=refresh_url, token_updater=self.token_refresh_callback,
-                                            auto_refresh_kwargs={
-                                                'client_id': self.client_id,
-                                                'client_secret': self.client_secret})
+            api_client = OAuth2Session(self.client_id, redirect_uri=self.redirect_uri, scope=self.scope,
+                                       auto_refresh_url=refresh_url, token_updater=self.token_refresh_callback,
+                                       token=self.token,
+                                       auto_refresh_kwargs={
+                                           'client_id': self.client_id,
+                                           'client_secret': self.client_secret})
+        # share one connection pool across sessions so that re-initialization keeps established connections
+        api_client.mount('https://', self.http_adapter)
+        api_client.mount('http://', self.http_adapter)
+        return api_client
 
     def authorization_url(self):
         """
@@ -137,43 +359,479 @@ class PokitDokClient(object):
     def fetch_access_token(self, code=None):
         """
             Retrieves an OAuth2 access token.
+            When a token store is configured, a valid client credentials token is taken from the store if available.
             :param code: optional code value obtained via an authorization grant
             :return: the client application's token information as a dictionary
         """
-        self.api_client.token = None
-        self.token = self.api_client.fetch_token(token_url=self.token_url, code=code, client_id=self.client_id,
-                                                 client_secret=self.client_secret, scope=self.scope)
+        if code is None and self.token_store is not None:
+            return self._fetch_shared_access_token()
+        return self._request_access_token(code=code)
+
+    def token_store_key(self):
+        """
+            :return: the key identifying this client's access token within a token store
+        """
+        scope = self.scope if not isinstance(self.scope, (list, tuple)) else ' '.join(self.scope)
+        return '{0}|{1}|{2}'.format(self.client_id, self.token_url, scope or '')
+
+    def _fetch_shared_access_token(self):
+        """
+            Retrieves an access token from the token store, requesting a new token while holding the store's lock
+            if the stored token is missing or expired
+        """
+        key = self.token_store_key()
+        token = self._stored_token(key)
+        if token is None:
+            with self.token_store.lock(key):
+                token = self._stored_token(key)
+                if token is None:
+                    token = self._request_access_token()
+                    self.token_store.set(key, token)
+                    return token
+
+        self.token = token
+        self.initialize_api_client()
         return self.token
 
+    def _stored_token(self, key):
+        """
+            :return: the token held by the token store if it is valid and not yet due for renewal, otherwise None
+        """
+        token = self.token_store.get_valid(key)
+        if token is not None and self._token_refresh_due(token):
+            return None
+        return token
+
+    def _request_access_token(self, code=None):
+        """
+            Requests a new OAuth2 access token from the platform.  The token is requested on a separate
+            OAuth2Session and then installed, so that requests made by other threads in the meantime are still
+            sent with the current token.
+            :param code: optional code value obtained via an authorization grant
+            :return: the client application's token information as a dictionary
+        """
+        api_client = self._create_api_client()
+        api_client.token = None
+        started = time.time()
+        token = api_client.fetch_token(token_url=self.token_url, code=code, client_id=self.client_id,
+                                       client_secret=self.client_secret, scope=self.scope)
+        self._record_token_request(time.time() - started)
+        self.token = token
+        self.initialize_api_client()
+        return token
+
+    def _record_token_request(self, seconds):
+        """
+            Counts an access token requested from the platform in the client's metrics
+            :param seconds: the time taken by the token request
+        """
+        if self.metrics is not None:
+            self.metrics.record_token_request(seconds)
+
+    def _token_refresh_due(self, token):
+        """
+            :return: True if refresh_ahead is enabled and the token has passed that fraction of its lifetime
+        """
+        if not self.refresh_ahead or not token or 'expires_at' not in token or 'expires_in' not in token:
+            return False
+        if self.code is not None and not token.get('refresh_token'):
+            return False
+        lifetime = float(token['expires_in'])
+        return time.time() >= float(token['expires_at']) - lifetime * (1 - self.refresh_ahead)
+
+    def _refresh_token_ahead(self):
+        """
+            Starts a background token renewal when the current token is due for one and no renewal is in progress
+        """
+        token = self.token
+        if (self._token_refresh_due(token) and time.time() >= self._next_refresh_attempt and
+                self._token_lock.acquire(False)):
+            thread = threading.Thread(target=self._refresh_token_in_background, args=(token,))
+            thread.daemon = True
+            thread.start()
+
+    def _refresh_token_in_background(self, token):
+        """
+            Renews the access token unless another thread has already replaced it. Releases the token lock that was
+            acquired when the renewal was started.
+        """
+        try:
+            if self.token is token:
+                self._renew_access_token()
+        except Exception:
+            log.warning('Unable to refresh the PokitDok access token in the background', exc_info=True)
+            self._next_refresh_attempt = time.time() + 10
+        finally:
+            self._token_lock.release()
+
+    def _renew_access_token(self):
+        """
+            Obtains a replacement access token on a separate OAuth2Session and then installs it, so that requests in
+            progress on the current session are not interrupted
+        """
+        api_client = self._create_api_client()
+        started = time.time()
+        if self.code is not None:
+            refresh_token = self.token.get('refresh_token')
+            token = api_client.refresh_token(self.token_url, refresh_token=refresh_token, client_id=self.client_id,
+                                             client_secret=self.client_secret)
+            self._record_token_request(time.time() - started)
+            token.setdefault('refresh_token', refresh_token)
+            if self.token_refresh_callback:
+                self.token_refresh_callback(token)
+        elif self.token_store is not None:
+            key = self.token_store_key()
+            with self.token_store.lock(key):
+                token = self._stored_token(key)
+                if token is None:
+                    api_client.token = None
+                    started = time.time()
+                    token = api_client.fetch_token(token_url=self.token_url, client_id=self.client_id,
+                                                   client_secret=self.client_secret, scope=self.scope)
+                    self._record_token_request(time.time() - started)
+                    self.token_store.set(key, token)
+        else:
+            api_client.token = None
+            token = api_client.fetch_token(token_url=self.token_url, client_id=self.client_id,
+                                           client_secret=self.client_secret, scope=self.scope)
+            self._record_token_request(time.time() - started)
+
+        self.token = token
+        self.initialize_api_client()
+
+    def endpoint_name(self, path):
+        """
+            Identifies the API endpoint of a request path
+            :param path: the API request path
+            :return: the endpoint name, such as 'eligibility' or 'trading_partners', or None if the path is unknown
+        """
+        if self._endpoint_patterns is None:
+            patterns = []
+            for name, url_attribute in ENDPOINT_URLS:
+                template = getattr(self, url_attribute).rstrip('/')
+                pattern = '^{0}(/[^/]*)?/?$'.format(re.escape(template).replace(re.escape('{0}'), '[^/]*'))
+                patterns.append((len(template), name, re.compile(pattern)))
+            # match the most specific templates first, e.g. /claims/status before /claims/
+            patterns.sort(key=lambda pattern: -pattern[0])
+            self._endpoint_patterns = [(name, pattern) for _, name, pattern in patterns]
+
+        for name, pattern in self._endpoint_patterns:
+            if pattern.match(path):
+                return name
+        return None
+
+    def _response_cache_key(self, path, method, data, files, params):
+        """
+            :return: a (cache key, time to live) tuple if the response to the request may be cached,
+                     otherwise (None, None)
+        """
+        if self.response_cache is None or method.lower() != 'get' or data or files:
+            return None, None
+        ttl = self.response_cache.ttl(self._cache_endpoint(path))
+        if not ttl:
+            return None, None
+        return self._request_key(path, params), ttl
+
+    def _cache_endpoint(self, path):
+        """
+            :return: the name under which the time to live of the response to a request is configured: the endpoint
+                     name, or 'providers_npi' for lookups of a single provider, which unlike provider searches are
+                     cached by default
+        """
+        endpoint = self.endpoint_name(path)
+        if endpoint == 'providers' and path.strip('/') != self.providers_url.format('').strip('/'):
+            return 'providers_npi'
+        return endpoint
+
+    def _single_flight_key(self, path, method, data, files, params):
+        """
+            :return: the key shared by identical requests if concurrent requests like this one may be coalesced,
+                     otherwise None
+        """
+        if self.single_flight is None or method.lower() != 'get' or data or files:
+            return None
+        return self._request_key(path, params)
+
+    def _request_key(self, path, params):
+        """
+            :return: a key identifying a GET request by the platform and application it is sent to, its path and
+                     its parameters, so that clients of different platforms or applications sharing a cache never
+                     receive each other's responses
+        """
+        return self.url_base, self.client_id, path, json.dumps(params, sort_keys=True, default=str)
+
+    def _iter_records(self, fetch_page, params, prefetch):
+        """
+            Iterates over the records of a paginated API listing. See pagination.iter_records.
+        """
+        return iter_records(fetch_page, params, prefetch=prefetch)
+
+    @property
+    def status_code(self):
+        """
+            The status code of the last response received by the calling thread, or 0 if it has not made a request
+        """
+        return getattr(self._call_state, 'status_code', 0)
+
+    @status_code.setter
+    def status_code(self, status_code):
+        self._call_state.status_code = status_code
+
+    @property
+    def last_response(self):
+        """
+            The APIResponse of the last request made by the calling thread with request, or one of the API
+            convenience methods, or None if it has not made one
+        """
+        return getattr(self._call_state, 'last_response', None)
+
+    @last_response.setter
+    def last_response(self, response):
+        self._call_state.last_response = response
+        self._call_state.status_code = response.status_code
+
     def request(self, path, method='get', data=None, files=None, **kwargs):
         """
         General method for submitting an API request
 
         :param path: the API request path
         :param method: the http request method that should be used
-        :param data: dictionary of request data that should be used for post/put requests
+        :param data: dictionary of request data that should be used for post/put requests, bytes holding
+                     request data which has already been JSON encoded, or a MultipartUpload
         :param files: dictionary of file information when the API accepts file uploads as input
         :param kwargs: optional keyword arguments to be relayed along as request parameters
         :return:
         """
-        if data and not files:
-            headers = self.json_headers
-            request_data = json.dumps(data)
+        return self.request_response(path, method=method, data=data, files=files, **kwargs).body
+
+    def request_response(self, path, method='get', data=None, files=None, **kwargs):
+        """
+        Submits an API request and returns an APIResponse holding the response's status code, headers, timings
+        and decoded body.  Accepts the same arguments as request.
+
+        :return: an APIResponse
+        """
+        headers, request_data = self._request_body(data, files)
+
+        cache_key, cache_ttl = self._response_cache_key(path, method, data, files, kwargs)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                status_code, content = cached
+                self.last_response = APIResponse(status_code, {}, self.json_codec.loads(content), cached=True)
+                return self.last_response
+
+        request_url = "{0}{1}".format(self.url_base, path)
+        fetch = functools.partial(self._fetch_response, method, request_url, cache_key, cache_ttl,
+                                  trading_partner_id=self._trading_partner_id(data, kwargs), data=request_data,
+                                  files=files, params=kwargs, headers=headers)
+        single_flight_key = self._single_flight_key(path, method, data, files, kwargs)
+        if single_flight_key is not None:
+            self.last_response = self.single_flight.do(single_flight_key, fetch)
         else:
-            headers = self.base_headers
-            request_data = data
+            self.last_response = fetch()
+        return self.last_response
 
+    def _fetch_response(self, method, url, cache_key, cache_ttl, trading_partner_id=None, **kwargs):
+        """
+            Submits a request, caching the response when it may be cached
+            :return: an APIResponse
+        """
+        response = self._send(method, url, trading_partner_id=trading_partner_id, **kwargs)
+        if cache_key is not None and response.status_code == 200:
+            self.response_cache.set(cache_key, (response.status_code, response.content), cache_ttl)
+        event = response.request_event
+        return APIResponse(response.status_code, response.headers, self.json_codec.loads(response.content),
+                           timings=event.timings, retries=event.retries)
+
+    def stream_request(self, path, method='get', data=None, **kwargs):
+        """
+        Submits an API request and decodes the response incrementally as it is received.  Use this for
+        responses which are too large to decode at once, such as the data of a large enrollment snapshot.
+
+        :param path: the API request path
+        :param method: the http request method that should be used
+        :param data: dictionary of request data that should be used for post/put requests
+        :param kwargs: optional keyword arguments to be relayed along as request parameters
+        :return: a StreamingResponse which yields the elements of the response's data array
+        :raises APIError: if the response's data is not an array, as when the response reports errors
+        """
+        headers, request_data = self._request_body(data, None)
         request_url = "{0}{1}".format(self.url_base, path)
-        request_method = getattr(self.api_client, method)
+        response = self._send(method, request_url, trading_partner_id=self._trading_partner_id(data, kwargs),
+                              data=request_data, params=kwargs, headers=headers, stream=True)
+        self.status_code = response.status_code
+        return StreamingResponse(response).start()
+
+    def _request_body(self, data, files):
+        """
+            :return: a (headers, request data) tuple for a request's data and files
+        """
+        if isinstance(data, MultipartUpload):
+            headers = dict(self.base_headers)
+            headers.update(data.headers)
+            return headers, data.body()
+        if isinstance(data, bytes) and not files:
+            return self.json_headers, data
+        if data and not files:
+            return self.json_headers, self.json_codec.dumps(data)
+        return self.base_headers, data
+
+    def _send(self, method, url, trading_partner_id=None, **kwargs):
+        """
+            Submits a request, retrying it according to the client's retry policy.  Each attempt is checked by the
+            client's circuit breaker and waits for its rate limiter.
+
+            :param method: the http request method that should be used
+            :param url: the request URL
+            :param trading_partner_id: the trading partner named by the request, if any
+            :param kwargs: keyword arguments relayed to the requests session
+            :return: the requests response
+        """
+        import requests
+        endpoint = self._url_endpoint(url)
+        policy = self.retry_policy
+        # file objects are consumed by the first attempt, so requests with files are not retried
+        if policy is None or kwargs.get('files'):
+            return self._send_attempt(method, url, endpoint, trading_partner_id, 0, **kwargs)
+
+        policy.budget.record_request()
+        attempt = 0
+        delay = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._send_attempt(method, url, endpoint, trading_partner_id, attempt - 1, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                sent = not isinstance(error, requests.exceptions.ConnectTimeout)
+                delay = policy.retry_delay(attempt, delay, method, endpoint, sent=sent)
+                if delay is None:
+                    raise
+                log.info('Retrying %s %s in %.2f seconds after %r', method.upper(), url, delay, error)
+            else:
+                delay = policy.retry_delay(attempt, delay, method, endpoint, status=response.status_code,
+                                           headers=response.headers)
+                if delay is None:
+                    return response
+                log.info('Retrying %s %s in %.2f seconds after a %s response', method.upper(), url, delay,
+                         response.status_code)
+                response.close()
+            time.sleep(delay)
+
+    def _url_endpoint(self, url):
+        """
+            :return: the endpoint name of a request URL, or None if the endpoint is unknown
+        """
+        return self.endpoint_name(url[len(self.url_base):]) if url.startswith(self.url_base) else None
+
+    def _send_attempt(self, method, url, endpoint, trading_partner_id, retries, **kwargs):
+        """
+            Submits one attempt of a request once the client's circuit breaker and rate limiter allow it, calling
+            the client's lifecycle hooks
+        """
+        import requests
+        from .adapters import record_timings
+        event = self._request_event(method, url, endpoint, kwargs.get('data'), retries)
+        dispatch_hooks(self.hooks, 'before_request', event)
+        timings = event.timings
+        circuit = None
         try:
-            response = request_method(request_url, data=request_data, files=files, params=kwargs, headers=headers)
-            self.status_code = response.status_code
-            return response.json()
+            if self.circuit_breaker is not None:
+                requested_circuit = self.circuit_breaker.circuit(endpoint or url, trading_partner_id)
+                admission = requested_circuit.before_request()
+                circuit = requested_circuit
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(endpoint)
+                timings['queue_wait'] = time.time() - event.started
+            sent = time.time()
+            queue_wait = timings['queue_wait']
+            with record_timings(timings):
+                response = self._send_authorized(method, url, **kwargs)
+        except Exception as error:
+            if circuit is not None:
+                if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    circuit.record(admission, True, time.time() - sent)
+                else:
+                    circuit.release(admission)
+            event.finish(error=error)
+            dispatch_hooks(self.hooks, 'on_error', event)
+            raise
+
+        if circuit is not None:
+            circuit.record(admission, response.status_code in self.circuit_breaker.failure_statuses, time.time() - sent)
+        # requests measures the time from sending until the response headers were parsed, including the time spent
+        # waiting for and establishing a connection
+        connection_time = timings['queue_wait'] - queue_wait + timings['connect'] + timings['tls']
+        timings['ttfb'] = max(0.0, response.elapsed.total_seconds() - connection_time)
+        event.finish(response=response, status_code=response.status_code)
+        dispatch_hooks(self.hooks, 'after_response', event)
+        # the event's timings are reported with the request's APIResponse
+        response.request_event = event
+        return response
+
+    def _request_event(self, method, url, endpoint, data, retries):
+        """
+            :return: a RequestEvent describing an attempt of a request
+        """
+        path = url[len(self.url_base):] if url.startswith(self.url_base) else url
+        return RequestEvent(method, url, path, endpoint, payload_size(data), retries)
+
+    def register_hook(self, event, hook):
+        """
+            Registers a request lifecycle hook.  Hooks are called with a RequestEvent for each attempt of a request:
+            before_request hooks before it is sent, after_response hooks once the response headers have been
+            received and on_error hooks when it fails without a response.
+            :param event: the hook event: 'before_request', 'after_response' or 'on_error'
+            :param hook: a function, or list of functions, accepting a RequestEvent
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError('Unknown hook event {0!r}, expected one of {1}'.format(event, ', '.join(HOOK_EVENTS)))
+        if callable(hook):
+            self.hooks[event].append(hook)
+        else:
+            self.hooks[event].extend(hook)
+
+    def _trading_partner_id(self, data, params):
+        """
+            :return: the trading partner named by a request's data or parameters, or None
+        """
+        if isinstance(data, MultipartUpload):
+            data = data.fields
+        for values in (data, params):
+            if isinstance(values, dict) and values.get('trading_partner_id'):
+                return values['trading_partner_id']
+        return None
+
+    def _send_authorized(self, method, url, **kwargs):
+        """
+            Submits a request using the OAuth2Session, renewing an expired access token and retrying the request
+            when auto_refresh is enabled
+
+            :param method: the http request method that should be used
+            :param url: the request URL
+            :param kwargs: keyword arguments relayed to the requests session
+            :return: the requests response
+        """
+        from oauthlib.oauth2 import TokenExpiredError
+        from requests_oauthlib import TokenUpdated
+        from .adapters import separate_timing
+        if self.token is None:
+            with separate_timing('token'):
+                self._ensure_access_token()
+        elif self.refresh_ahead:
+            self._refresh_token_ahead()
+
+        token = self.token
+        try:
+            return getattr(self.api_client, method)(url, **kwargs)
         except (TokenUpdated, TokenExpiredError):
             if self.auto_refresh:
-                # Re-fetch token and try request again
-                self.fetch_access_token(self.code)
-                return request_method(request_url, data=request_data, files=files, params=kwargs, headers=headers).json()
+                # Re-fetch token and try request again. Concurrent requests which find the same token expired
+                # share a single token request.
+                with separate_timing('token'), self._token_lock:
+                    if self.token is token:
+                        self.fetch_access_token(self.code)
+                return getattr(self.api_client, method)(url, **kwargs)
             else:
                 self.status_code = 401  # UNAUTHORIZED
                 raise TokenExpiredError('Access Token has expired. Please, re-authenticate. '
@@ -220,6 +878,106 @@ class PokitDokClient(object):
         path = self.activities_url.format(activity_id if activity_id else '')
         return self.get(path, **kwargs)
 
+    def iter_activities(self, prefetch=True, **kwargs):
+        """
+            Iterate over platform activities across all pages of results
+
+            :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+                             while the current page is consumed
+            :param kwargs: activity search parameters, as accepted by activities
+        """
+        return self._iter_records(self.activities, kwargs, prefetch=prefetch)
+
+    @property
+    def activity_waiter(self):
+        """
+            The ActivityWaiter which watches activities for watch_activity and wait_for_activity, created on first
+            use.  Assign an ActivityWaiter to change how activities are polled.
+        """
+        if self._activity_waiter is None:
+            with self._session_lock:
+                if self._activity_waiter is None:
+                    self._activity_waiter = self._create_activity_waiter()
+        return self._activity_waiter
+
+    @activity_waiter.setter
+    def activity_waiter(self, activity_waiter):
+        self._activity_waiter = activity_waiter
+
+    def _create_activity_waiter(self):
+        from .activities import ActivityWaiter
+        return ActivityWaiter(self)
+
+    def watch_activity(self, activity, parent_id=None, timeout=None):
+        """
+            Watches a platform activity, such as the activity started by a claims, identity_match or
+            enrollment_snapshot request, until it finishes
+
+            :param activity: an activity id, an activity record, or the API response which started the activity
+            :param parent_id: the id of the activity's parent when it is part of a batch.  The children of a parent
+                              are polled together with a single request.
+            :param timeout: the number of seconds after which the future raises ActivityTimeout, or None
+            :return: an ActivityFuture, whose result is the activity record once the activity completes
+            :raises ValueError: if no activity id can be found in activity
+        """
+        future = self.activity_waiter.watch(activity, parent_id=parent_id, timeout=timeout,
+                                            delay=self._poll_delay())
+        self._claim_callbacks([future])
+        return future
+
+    def watch_child_activities(self, parent, timeout=None):
+        """
+            Watches the child activities of a batch activity until they finish
+
+            :param parent: the parent activity id, activity record, or the API response which started it
+            :param timeout: the number of seconds after which each future raises ActivityTimeout, or None
+            :return: a list of ActivityFutures, one per child activity
+        """
+        futures = self.activity_waiter.watch_children(parent, timeout=timeout, delay=self._poll_delay())
+        self._claim_callbacks(futures)
+        return futures
+
+    def _poll_delay(self):
+        """
+            :return: the number of seconds before a newly watched activity is polled.  Activities are polled only
+                     when no callback has arrived in time if the client has a callback receiver.
+        """
+        return self.callback_receiver.poll_after if self.callback_receiver is not None else None
+
+    def _claim_callbacks(self, futures):
+        """
+            Resolves newly watched activities with callbacks which arrived before they were watched, and has later
+            callbacks resolve the others
+        """
+        if self.callback_receiver is None:
+            return
+        for future in futures:
+            self.callback_receiver.claim(future, self.activity_waiter)
+
+    def _with_callback_url(self, request_data):
+        """
+            :return: the request data along with the callback receiver's callback URL, if the client has a callback
+                     receiver and the request does not name a callback URL
+        """
+        if self.callback_receiver is None or 'callback_url' in request_data:
+            return request_data
+        request_data = dict(request_data)
+        request_data['callback_url'] = self.callback_receiver.callback_url
+        return request_data
+
+    def wait_for_activity(self, activity, timeout=None, parent_id=None):
+        """
+            Waits until a platform activity finishes
+
+            :param activity: an activity id, an activity record, or the API response which started the activity
+            :param timeout: the number of seconds to wait, or None to wait until the activity finishes
+            :param parent_id: the id of the activity's parent when it is part of a batch
+            :return: the activity record of the completed activity
+            :raises ActivityError: if the activity failed or was canceled
+            :raises ActivityTimeout: if the activity did not finish within the timeout
+        """
+        return self.watch_activity(activity, parent_id=parent_id, timeout=timeout).result()
+
     def cash_prices(self, **kwargs):
         """
             Fetch cash price information
@@ -240,17 +998,19 @@ class PokitDokClient(object):
 
             :param claims_request: dictionary representing a claims request
         """
-        return self.post(self.claims_url, data=claims_request)
+        return self.post(self.claims_url, data=self._with_callback_url(claims_request))
 
-    def claims_convert(self, x12_claims_file):
+    def claims_convert(self, x12_claims_file, compress=False):
         """
             Submit a raw X12 837 file to convert to a claims API request and map any ICD-9 codes to ICD-10
 
             :param x12_claims_file: the path to a X12 claims file to be submitted to the platform for processing
+            :param compress: Boolean to indicate whether the upload should be gzip compressed
         """
-        return self.post(self.claims_convert_url, files={
-            'file': (os.path.split(x12_claims_file)[-1], open(x12_claims_file, 'rb'), 'application/EDI-X12')
-        })
+        upload = MultipartUpload(files={
+            'file': (os.path.split(x12_claims_file)[-1], x12_claims_file, 'application/EDI-X12')
+        }, compress=compress)
+        return self.post(self.claims_convert_url, data=upload)
 
     def claims_status(self, claims_status_request):
         """
@@ -260,6 +1020,17 @@ class PokitDokClient(object):
         """
         return self.post(self.claims_status_url, data=claims_status_request)
 
+    def claims_status_many(self, claims_status_requests, max_concurrency=10):
+        """
+            Submit many claims status requests concurrently
+
+            :param claims_status_requests: a list or iterator of dictionaries representing claims status requests
+            :param max_concurrency: the maximum number of requests in flight at the same time
+            :return: a list of responses in the same order as the requests.  A request which failed is
+                     represented by the exception it raised.
+        """
+        return run_batch(self.claims_status, claims_status_requests, max_concurrency=max_concurrency)
+
     def mpc(self, code=None, **kwargs):
         """
             Access clinical and consumer friendly information related to medical procedures
@@ -290,6 +1061,17 @@ class PokitDokClient(object):
         """
         return self.post(self.eligibility_url, data=eligibility_request)
 
+    def eligibility_many(self, eligibility_requests, max_concurrency=10):
+        """
+            Submit many eligibility requests concurrently
+
+            :param eligibility_requests: a list or iterator of dictionaries representing eligibility requests
+            :param max_concurrency: the maximum number of requests in flight at the same time
+            :return: a list of responses in the same order as the requests.  A request which failed is
+                     represented by the exception it raised.
+        """
+        return run_batch(self.eligibility, eligibility_requests, max_concurrency=max_concurrency)
+
     def enrollment(self, enrollment_request):
         """
             Submit a benefits enrollment/maintenance request
@@ -298,18 +1080,73 @@ class PokitDokClient(object):
         """
         return self.post(self.enrollment_url, data=enrollment_request)
 
-    def enrollment_snapshot(self, trading_partner_id, x12_file):
+    def enrollment_snapshot(self, trading_partner_id, x12_file, compress=False):
         """
             Submit a X12 834 file to the platform to establish the enrollment information within it
             as the current membership enrollment snapshot for a trading partner
 
             :param trading_partner_id: the trading partner associated with the enrollment snapshot
             :param x12_file: the path to a X12 834 file that contains the current membership enrollment information
+            :param compress: Boolean to indicate whether the upload should be gzip compressed
         """
-        return self.post(self.enrollment_snapshot_url, data={'trading_partner_id': trading_partner_id},
-                         files={
-                             'file': (os.path.split(x12_file)[-1], open(x12_file, 'rb'), 'application/EDI-X12')
-                         })
+        upload = MultipartUpload(fields=self._with_callback_url({'trading_partner_id': trading_partner_id}), files={
+            'file': (os.path.split(x12_file)[-1], x12_file, 'application/EDI-X12')
+        }, compress=compress)
+        return self.post(self.enrollment_snapshot_url, data=upload)
+
+    def enrollment_snapshot_chunked(self, trading_partner_id, x12_file, max_chunk_size=10 * 1024 * 1024,
+                                    max_concurrency=4, compress=False, timeout=None):
+        """
+            Submit a large X12 834 file as several enrollment snapshots which are uploaded concurrently
+
+            The file is split at member (INS loop) boundaries into chunks of at most max_chunk_size bytes, each
+            a complete interchange with its own envelope, and read from disk through a memory map as the chunks
+            are sent.  Each chunk starts its own enrollment snapshot activity.
+
+            :param trading_partner_id: the trading partner associated with the enrollment snapshot
+            :param x12_file: the path to a X12 834 file that contains the current membership enrollment information
+            :param max_chunk_size: the largest size of a chunk in bytes
+            :param max_concurrency: the maximum number of chunks uploaded at the same time
+            :param compress: Boolean to indicate whether the uploads should be gzip compressed
+            :param timeout: the number of seconds after which an unfinished activity raises ActivityTimeout, or None
+            :return: an ActivityGroup which resolves to the snapshot activity records of the chunks once they have
+                     all completed.  A chunk whose upload failed is represented in the group by a failed future.
+        """
+        from .x12 import X12EnrollmentFile
+        with X12EnrollmentFile(x12_file) as enrollment_file:
+            chunks = enrollment_file.chunks(max_chunk_size)
+            upload = functools.partial(self._enrollment_snapshot_chunk, trading_partner_id, compress=compress)
+            responses = run_batch(upload, chunks, max_concurrency=max_concurrency)
+        return self._activity_group(responses, timeout)
+
+    def _enrollment_snapshot_chunk(self, trading_partner_id, chunk, compress=False):
+        """
+            Submits one chunk of a chunked enrollment snapshot
+        """
+        upload = MultipartUpload(fields=self._with_callback_url({'trading_partner_id': trading_partner_id}), files={
+            'file': (chunk.filename, chunk, 'application/EDI-X12')
+        }, compress=compress)
+        return self.post(self.enrollment_snapshot_url, data=upload)
+
+    def _activity_group(self, responses, timeout):
+        """
+            :return: an ActivityGroup watching the activities started by a list of API responses, with a failed
+                     future in place of each exception and of each response which did not start an activity
+        """
+        from concurrent.futures import Future
+        from .activities import ActivityGroup, activity_id
+        from .exceptions import APIError
+        futures = []
+        for response in responses:
+            if not isinstance(response, Exception) and activity_id(response) is None:
+                response = APIError(response)
+            if isinstance(response, Exception):
+                future = Future()
+                future.set_exception(response)
+            else:
+                future = self.watch_activity(response, timeout=timeout)
+            futures.append(future)
+        return ActivityGroup(futures)
 
     def enrollment_snapshots(self, snapshot_id=None, **kwargs):
         """
@@ -329,6 +1166,29 @@ class PokitDokClient(object):
         path = self.enrollment_snapshot_data_url.format(snapshot_id)
         return self.get(path, **kwargs)
 
+    def iter_enrollment_snapshot_data(self, snapshot_id, prefetch=True, **kwargs):
+        """
+            Iterate over the enrollment request objects of an enrollment snapshot across all pages of results
+
+            :param snapshot_id: the enrollment snapshot id for the enrollment data
+            :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+                             while the current page is consumed
+        """
+        return self._iter_records(functools.partial(self.enrollment_snapshot_data, snapshot_id), kwargs,
+                                  prefetch=prefetch)
+
+    def stream_enrollment_snapshot_data(self, snapshot_id, **kwargs):
+        """
+            Stream the enrollment request objects that make up the specified enrollment snapshot.  The objects are
+            decoded one at a time as the response is received, so large snapshots are not held in memory.
+
+            :param snapshot_id: the enrollment snapshot id for the enrollment data
+            :return: a StreamingResponse which yields enrollment request objects.  Its meta attribute holds the
+                     response meta section once iteration has finished.
+        """
+        path = self.enrollment_snapshot_data_url.format(snapshot_id)
+        return self.stream_request(path, **kwargs)
+
     def insurance_prices(self, **kwargs):
         """
             Fetch insurance price information
@@ -398,6 +1258,17 @@ class PokitDokClient(object):
         path = self.providers_url.format(npi if npi else '')
         return self.get(path, **kwargs)
 
+    def iter_providers(self, prefetch=True, **kwargs):
+        """
+            Iterate over health care providers matching a providers search across all pages of results
+
+            :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+                             while the current page is consumed
+            :param kwargs: provider search parameters, as accepted by providers.  The limit parameter sets the
+                           number of providers fetched per page.
+        """
+        return self._iter_records(self.providers, kwargs, prefetch=prefetch)
+
     def trading_partners(self, trading_partner_id=None):
         """
             Search trading partners in the PokitDok Platform
@@ -455,6 +1326,16 @@ class PokitDokClient(object):
         path = self.appointments_url.format(appointment_uuid if appointment_uuid else '')
         return self.get(path, **kwargs)
 
+    def iter_appointments(self, prefetch=True, **kwargs):
+        """
+            Iterate over open appointment slots across all pages of results
+
+            :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+                             while the current page is consumed
+            :param kwargs: appointment query parameters, as accepted by get_appointments
+        """
+        return self._iter_records(self.get_appointments, kwargs, prefetch=prefetch)
+
     # BACKWARDS COMPATIBILITY AND FEATURE DEPRECATION NOTICE:
     def appointments(self, appointment_uuid=None, **kwargs):
         warn(DeprecationWarning('This convenience function will be deprecated '
@@ -512,6 +1393,16 @@ class PokitDokClient(object):
             path += '/{0}'.format(identity_uuid)
         return self.get(path, **kwargs)
 
+    def iter_identity(self, prefetch=True, **kwargs):
+        """
+            Iterate over identity resources matching a query across all pages of results
+
+            :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+                             while the current page is consumed
+            :param kwargs: query parameters using resource fields such as first_name, last_name, email, etc.
+        """
+        return self._iter_records(self.get_identity, kwargs, prefetch=prefetch)
+
     # BACKWARDS COMPATIBILITY AND FEATURE DEPRECATION NOTICE:
     def identity(self, identity_uuid=None, **kwargs):
         warn(DeprecationWarning('This convenience function will be deprecated '
@@ -555,7 +1446,7 @@ class PokitDokClient(object):
         if historical_version is not None:
             path = "{0}/{1}".format(path, historical_version)
 
-        return self.api_client.get(path, headers=self.base_headers).json()
+        return self.json_codec.loads(self._send('get', path, headers=self.base_headers).content)
 
     def identity_match(self, identity_match_data):
         """
@@ -563,7 +1454,7 @@ class PokitDokClient(object):
             :param identity_match_data: The dictionary containing the identity match data.
             :returns: An activity id of the identity match job
         """
-        return self.post(self.identity_match_url, data=identity_match_data)
+        return self.post(self.identity_match_url, data=self._with_callback_url(identity_match_data))
 
     def pharmacy_plans(self, **kwargs):
         """
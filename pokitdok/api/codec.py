@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import json
+
+
+class JSONCodec(object):
+    """
+        Encodes request bodies and decodes response bodies using the standard library json module
+
+        A codec provides dumps, which returns the encoded body as bytes or text, and loads, which decodes
+        a UTF-8 encoded body.  Subclasses may use a faster JSON library.
+    """
+    name = 'json'
+
+    def dumps(self, data):
+        """
+            :param data: the request data to encode
+            :return: the JSON encoded data
+        """
+        return json.dumps(data)
+
+    def loads(self, content):
+        """
+            :param content: a UTF-8 encoded JSON document, as bytes
+            :return: the decoded document
+        """
+        return json.loads(content.decode('utf-8'))
+
+
+class OrjsonCodec(JSONCodec):
+    """
+        Encodes and decodes JSON using orjson
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data):
+        return self._orjson.dumps(data, option=self._options)
+
+    def loads(self, content):
+        return self._orjson.loads(content)
+
+
+class UjsonCodec(JSONCodec):
+    """
+        Encodes and decodes JSON using ujson
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, data):
+        return self._ujson.dumps(data)
+
+    def loads(self, content):
+        return self._ujson.loads(content.decode('utf-8'))
+
+
+def default_codec():
+    """
+        :return: a codec using the fastest JSON library installed: orjson, then ujson, then the standard library
+    """
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        try:
+            return codec_class()
+        except ImportError:
+            pass
+    return JSONCodec()
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+
+
+class PokitDokError(Exception):
+    """
+        Base class for errors raised by the PokitDok API client
+    """
+
+
+class APIError(PokitDokError):
+    """
+        Raised when an API response reports errors where a successful response is required
+    """
+    def __init__(self, response):
+        """
+            :param response: the decoded API response
+        """
+        self.response = response
+        data = response.get('data')
+        errors = data.get('errors') if isinstance(data, dict) else data
+        super(APIError, self).__init__('The PokitDok API reported errors: {0}'.format(errors))
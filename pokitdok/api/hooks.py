@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import time
+
+# the events for which request lifecycle hooks may be registered
+HOOK_EVENTS = ('before_request', 'after_response', 'on_error')
+
+
+def default_hooks():
+    """
+        :return: dictionary of each hook event to an empty list of hooks
+    """
+    return dict((event, []) for event in HOOK_EVENTS)
+
+
+def dispatch_hooks(hooks, event, request_event):
+    """
+        Calls the hooks registered for an event
+        :param hooks: dictionary of hook event to a list of hooks
+        :param event: the hook event, one of HOOK_EVENTS
+        :param request_event: the RequestEvent passed to each hook
+    """
+    for hook in hooks.get(event, ()):
+        hook(request_event)
+
+
+class RequestEvent(object):
+    """
+        Describes one attempt of an API request to request lifecycle hooks
+
+        The timings dictionary holds the number of seconds spent in each phase of the attempt:
+        - queue_wait: waiting for the client's rate limiter and for a pooled connection
+        - connect: opening a TCP connection, or 0 when a pooled connection was reused
+        - tls: the TLS handshake, or 0 when a pooled connection was reused.  None when the time is included in
+          connect, as with the asyncio client.
+        - ttfb: from sending the request until the response headers were received
+        - token: fetching or renewing the client's access token, or waiting for another request to do so, before
+          the request was sent.  Token requests are not included in any other phase, or in total.
+        - total: the whole attempt, from the before_request hooks until the response was received.  For streamed
+          responses and responses to the asyncio client, the response body is read after the attempt.
+        Phases which were not reached are None.
+    """
+    def __init__(self, method, url, path, endpoint, payload_size, retries):
+        """
+            :param method: the http request method
+            :param url: the request URL
+            :param path: the API request path
+            :param endpoint: the endpoint name, such as 'eligibility', or None if the endpoint is unknown
+            :param payload_size: the size of the request body in bytes, or None if it is not known in advance
+            :param retries: the number of previous attempts of the request
+        """
+        self.method = method
+        self.url = url
+        self.path = path
+        self.endpoint = endpoint
+        self.payload_size = payload_size
+        self.retries = retries
+        self.status_code = None
+        self.response = None
+        self.error = None
+        self.timings = {'queue_wait': 0.0, 'connect': 0.0, 'tls': 0.0, 'ttfb': None, 'token': 0.0, 'total': None}
+        self.started = time.time()
+
+    def finish(self, response=None, status_code=None, error=None):
+        """
+            Records the outcome of the attempt
+            :param response: the http response, if one was received
+            :param status_code: the response status code, if a response was received
+            :param error: the exception raised by the attempt, if any
+        """
+        self.response = response
+        self.status_code = status_code
+        self.error = error
+        self.timings['total'] = time.time() - self.started - self.timings['token']
+
+
+def payload_size(data):
+    """
+        :param data: a request body
+        :return: the size of the body, or None if it is not known in advance
+    """
+    if data is None:
+        return 0
+    if isinstance(data, dict):
+        return None
+    try:
+        return len(data)
+    except TypeError:
+        return None
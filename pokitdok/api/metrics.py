@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import threading
+
+# the quantiles reported for each endpoint's latency
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram(object):
+    """
+        Latency histogram with bounded relative error, in the style of HdrHistogram
+
+        Values are counted in buckets whose width grows with the value, so that every bucket spans less than
+        1/2**(precision - 1) of its values, about 1.6% with the default precision, from microseconds to hours.
+        Only buckets holding values are stored.
+    """
+    def __init__(self, unit=1e-6, precision=7):
+        """
+            :param unit: the resolution of recorded values, in seconds.  Defaults to one microsecond.
+            :param precision: the number of significant bits kept for each value
+        """
+        self.unit = unit
+        self.precision = precision
+        self._half = 1 << (precision - 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._buckets = {}
+
+    def _index(self, units):
+        shift = max(0, units.bit_length() - self.precision)
+        return shift * self._half + (units >> shift)
+
+    def _bucket_value(self, index):
+        """
+            :return: the value in the middle of a bucket, in seconds
+        """
+        shift = max(0, index // self._half - 1)
+        lowest = (index - shift * self._half) << shift
+        return (lowest + ((1 << shift) - 1) / 2.0) * self.unit
+
+    def record(self, seconds):
+        """
+            Records a value
+            :param seconds: the value to record
+        """
+        index = self._index(int(max(0.0, seconds) / self.unit))
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """
+            :param quantiles: the quantiles to compute, between 0 and 1
+            :return: dictionary of each quantile to its value in seconds, or to None if no values were recorded
+        """
+        result = dict((quantile, None) for quantile in quantiles)
+        if not self.count:
+            return result
+        pending = sorted(quantiles)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            while pending and seen >= pending[0] * self.count:
+                result[pending.pop(0)] = min(self.max, max(self.min, self._bucket_value(index)))
+            if not pending:
+                break
+        return result
+
+
+class Metrics(object):
+    """
+        Records request counts, errors, retries, access token requests and per-endpoint latency for the clients it
+        is attached to
+
+        Latency is the total time of each attempt of a request, as reported to the client's lifecycle hooks, which
+        does not include the time taken to fetch access tokens.  Token requests have a latency histogram of their
+        own.
+        Metrics are available as a snapshot dictionary and in the Prometheus text exposition format, and may be
+        served over http for Prometheus to scrape.  A Metrics object may be shared by several clients.
+    """
+    def __init__(self, namespace='pokitdok', quantiles=QUANTILES):
+        """
+            :param namespace: the prefix of Prometheus metric names
+            :param quantiles: the latency quantiles reported for each endpoint
+        """
+        self.namespace = namespace
+        self.quantiles = quantiles
+        self.token_requests = 0
+        self._token_latency = Histogram()
+        self._latency = {}
+        self._requests = {}
+        self._errors = {}
+        self._retries = {}
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        """
+            Registers hooks which record the requests of a client
+            :param client: a PokitDokClient
+        """
+        client.register_hook('after_response', self.record_response)
+        client.register_hook('on_error', self.record_error)
+
+    def record_response(self, event):
+        """
+            Records an attempt of a request which received a response
+            :param event: the attempt's RequestEvent
+        """
+        endpoint = event.endpoint or 'other'
+        with self._lock:
+            self._count_attempt(endpoint, event)
+            key = (endpoint, event.method.upper(), str(event.status_code))
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def record_error(self, event):
+        """
+            Records an attempt of a request which failed without a response
+            :param event: the attempt's RequestEvent
+        """
+        endpoint = event.endpoint or 'other'
+        with self._lock:
+            self._count_attempt(endpoint, event)
+            key = (endpoint, type(event.error).__name__)
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def _count_attempt(self, endpoint, event):
+        if event.retries:
+            self._retries[endpoint] = self._retries.get(endpoint, 0) + 1
+        histogram = self._latency.get(endpoint)
+        if histogram is None:
+            histogram = self._latency[endpoint] = Histogram()
+        histogram.record(event.timings['total'])
+
+    def record_token_request(self, seconds=None):
+        """
+            Records an access token requested from the platform
+            :param seconds: the time taken by the token request, if known
+        """
+        with self._lock:
+            self.token_requests += 1
+            if seconds is not None:
+                self._token_latency.record(seconds)
+
+    def snapshot(self):
+        """
+            :return: dictionary of the recorded metrics, holding per endpoint the number of attempts, responses by
+                     status code, errors by exception name, retries and latency quantiles in seconds, and the number
+                     and latency of access token requests
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, histogram in self._latency.items():
+                endpoints[endpoint] = {
+                    'count': histogram.count,
+                    'responses': {},
+                    'errors': {},
+                    'retries': self._retries.get(endpoint, 0),
+                    'latency': self._latency_summary(histogram),
+                }
+            for (endpoint, method, status), count in self._requests.items():
+                responses = endpoints[endpoint]['responses']
+                responses[status] = responses.get(status, 0) + count
+            for (endpoint, error), count in self._errors.items():
+                endpoints[endpoint]['errors'][error] = count
+            return {'endpoints': endpoints, 'token_requests': self.token_requests,
+                    'token_latency': self._latency_summary(self._token_latency)}
+
+    def _latency_summary(self, histogram):
+        """
+            :return: dictionary of the mean, min, max and quantiles of a latency histogram, which are None if it is
+                     empty
+        """
+        return {
+            'mean': histogram.sum / histogram.count if histogram.count else None,
+            'min': histogram.min,
+            'max': histogram.max,
+            'quantiles': histogram.quantiles(self.quantiles),
+        }
+
+    def prometheus(self):
+        """
+            :return: the recorded metrics in the Prometheus text exposition format
+        """
+        name = self.namespace + '_{0}'
+        lines = []
+        with self._lock:
+            lines.append('# HELP {0} API request attempts which received a response'.format(
+                name.format('requests_total')))
+            lines.append('# TYPE {0} counter'.format(name.format('requests_total')))
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append('{0}{{endpoint="{1}",method="{2}",status="{3}"}} {4}'.format(
+                    name.format('requests_total'), endpoint, method, status, count))
+
+            lines.append('# HELP {0} API request attempts which failed without a response'.format(
+                name.format('errors_total')))
+            lines.append('# TYPE {0} counter'.format(name.format('errors_total')))
+            for (endpoint, error), count in sorted(self._errors.items()):
+                lines.append('{0}{{endpoint="{1}",error="{2}"}} {3}'.format(name.format('errors_total'), endpoint,
+                                                                             error, count))
+
+            lines.append('# HELP {0} API request attempts which retried a request'.format(
+                name.format('retries_total')))
+            lines.append('# TYPE {0} counter'.format(name.format('retries_total')))
+            for endpoint, count in sorted(self._retries.items()):
+                lines.append('{0}{{endpoint="{1}"}} {2}'.format(name.format('retries_total'), endpoint, count))
+
+            lines.append('# HELP {0} Access tokens requested from the platform'.format(
+                name.format('token_requests_total')))
+            lines.append('# TYPE {0} counter'.format(name.format('token_requests_total')))
+            lines.append('{0} {1}'.format(name.format('token_requests_total'), self.token_requests))
+
+            token_latency = name.format('token_request_duration_seconds')
+            lines.append('# HELP {0} Access token request latency'.format(token_latency))
+            lines.append('# TYPE {0} summary'.format(token_latency))
+            if self._token_latency.count:
+                for quantile, value in sorted(self._token_latency.quantiles(self.quantiles).items()):
+                    lines.append('{0}{{quantile="{1}"}} {2!r}'.format(token_latency, quantile, value))
+            lines.append('{0}_sum {1!r}'.format(token_latency, self._token_latency.sum))
+            lines.append('{0}_count {1}'.format(token_latency, self._token_latency.count))
+
+            latency = name.format('request_duration_seconds')
+            lines.append('# HELP {0} API request attempt latency'.format(latency))
+            lines.append('# TYPE {0} summary'.format(latency))
+            for endpoint, histogram in sorted(self._latency.items()):
+                for quantile, value in sorted(histogram.quantiles(self.quantiles).items()):
+                    lines.append('{0}{{endpoint="{1}",quantile="{2}"}} {3!r}'.format(latency, endpoint, quantile,
+                                                                                     value))
+                lines.append('{0}_sum{{endpoint="{1}"}} {2!r}'.format(latency, endpoint, histogram.sum))
+                lines.append('{0}_count{{endpoint="{1}"}} {2}'.format(latency, endpoint, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9464, host=''):
+        """
+            Serves the metrics in the Prometheus text exposition format from a background thread
+            :param port: the port to listen on
+            :param host: the address to listen on. Defaults to all addresses.
+            :return: the http server, which may be stopped with its shutdown method
+        """
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
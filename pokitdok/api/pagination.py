@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+from .exceptions import APIError
+
+try:
+    from urllib.parse import urlparse, parse_qsl
+except ImportError:
+    from urlparse import urlparse, parse_qsl
+
+
+def next_page_params(response, params):
+    """
+        Determines the request parameters for the page following a response
+
+        The platform's next page link is followed when the response includes one in its meta section, unless
+        it links to the page itself.  Otherwise the offset is advanced past the records in the response, until
+        a page holds fewer records than the requested limit.
+
+        :param response: a decoded API response
+        :param params: the request parameters used to fetch the response
+        :return: the request parameters for the next page, or None if the response is the last page
+    """
+    data = response.get('data')
+    if not isinstance(data, list) or not data:
+        return None
+
+    meta = response.get('meta') or {}
+    next_url = meta.get('next')
+    if next_url:
+        next_params = dict(params)
+        next_params.update(parse_qsl(urlparse(next_url).query))
+        return next_params if _query(next_params) != _query(params) else None
+    if 'next' in meta:
+        return None
+
+    limit = params.get('limit')
+    if limit is not None and len(data) < int(limit):
+        return None
+    next_params = dict(params)
+    next_params['offset'] = int(params.get('offset') or 0) + len(data)
+    if limit is None:
+        next_params['limit'] = len(data)
+    return next_params
+
+
+def iter_records(fetch_page, params, prefetch=True):
+    """
+        Yields the records of a paginated API listing, fetching each page as it is needed
+
+        At most two pages are held in memory: the page being consumed and, with prefetch enabled, the next
+        page, which is fetched by a background thread while the current page's records are yielded.
+
+        :param fetch_page: a callable which accepts request parameters as keyword arguments and returns a
+                           decoded API response
+        :param params: dictionary of request parameters for the first page
+        :param prefetch: Boolean to indicate whether the next page should be fetched in the background
+    """
+    if not prefetch:
+        previous = None
+        while params is not None:
+            response = fetch_page(**params)
+            if repeats_page(response, previous):
+                return
+            params = next_page_params(response, params)
+            for record in page_records(response):
+                yield record
+            previous = response
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        response = fetch_page(**params)
+        previous = None
+        while response is not None and not repeats_page(response, previous):
+            params = next_page_params(response, params)
+            next_response = executor.submit(fetch_page, **params) if params is not None else None
+            for record in page_records(response):
+                yield record
+            previous = response
+            response = next_response.result() if next_response is not None else None
+    finally:
+        executor.shutdown(wait=False)
+
+
+def page_records(response):
+    """
+        :return: the records held by a page.  A response holding a single record is treated as a page of one.
+        :raises APIError: if the response reports errors
+    """
+    data = response.get('data')
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and 'errors' in data:
+        raise APIError(response)
+    return [data] if data else []
+
+
+def repeats_page(response, previous):
+    """
+        Detects a page which holds the same records as the page before it, as returned when the platform
+        ignores the paging parameters of a listing, so that iterating over the listing does not loop forever
+        :param response: a decoded API response
+        :param previous: the decoded API response for the previous page, or None
+        :return: True if both pages hold the same records
+    """
+    if previous is None:
+        return False
+    data = response.get('data')
+    return isinstance(data, list) and bool(data) and data == previous.get('data')
+
+
+def _query(params):
+    """
+        :return: request parameters as they are sent in a query string, for comparison
+    """
+    return sorted((key, str(value)) for key, value in params.items() if value is not None)
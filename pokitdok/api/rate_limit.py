@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import time
+from .exceptions import PokitDokError
+from .token_store import MemoryTokenStore
+
+# endpoint groups which share a rate limit.  Endpoints not listed here form a group of their own.
+ENDPOINT_GROUPS = {
+    'cash_prices': 'prices',
+    'claims': 'claims',
+    'claims_convert': 'claims',
+    'claims_status': 'claims',
+    'eligibility': 'eligibility',
+    'enrollment': 'enrollment',
+    'enrollment_snapshot': 'enrollment',
+    'enrollment_snapshot_data': 'enrollment',
+    'identity': 'identity',
+    'identity_match': 'identity',
+    'identity_proof_generate': 'identity',
+    'identity_proof_score': 'identity',
+    'identity_proof_valid': 'identity',
+    'insurance_prices': 'prices',
+    'oop_insurance_estimate': 'prices',
+    'oop_insurance_prices': 'prices',
+    'pharmacy_formulary': 'pharmacy',
+    'pharmacy_network': 'pharmacy',
+    'pharmacy_plans': 'pharmacy',
+    'providers': 'providers',
+}
+
+
+class RateLimitExceeded(PokitDokError):
+    """
+        Raised when a request would exceed the client's rate limit and the rate limiter does not wait
+    """
+    def __init__(self, group, retry_after):
+        """
+            :param group: the endpoint group whose limit was reached
+            :param retry_after: the number of seconds until a request to the group is allowed
+        """
+        self.group = group
+        self.retry_after = retry_after
+        super(RateLimitExceeded, self).__init__(
+            'The rate limit for {0} requests was reached. Retry in {1:.3f} seconds'.format(group, retry_after))
+
+
+class RateLimiter(object):
+    """
+        Token bucket rate limiter applied to requests by endpoint group, such as eligibility or claims
+
+        Each group's bucket holds up to burst tokens and is refilled at rate tokens per second, and every request
+        takes a token.  In blocking mode a request which finds the bucket empty reserves the next token and waits
+        for it, so waiting requests proceed in turn.  In non-blocking mode it raises RateLimitExceeded instead.
+
+        Bucket state is kept in a TokenStore.  The default MemoryTokenStore shares the limits between the threads
+        and clients of a process, and a FileTokenStore shares them between the processes on a host.
+    """
+    def __init__(self, rates, default_rate=None, groups=None, block=True, max_wait=None, store=None):
+        """
+            :param rates: dictionary of endpoint group to the number of requests allowed per second, or to a
+                          (requests per second, burst size) tuple.  The burst size defaults to the rate, and at
+                          least one request.
+            :param default_rate: the rate applied to groups not listed in rates.  Defaults to None, which does not
+                                 limit other groups.
+            :param groups: dictionary of endpoint name to endpoint group, merged with ENDPOINT_GROUPS
+            :param block: Boolean to indicate whether requests wait for the rate limit rather than raising
+                          RateLimitExceeded
+            :param max_wait: the longest time a request waits in blocking mode, in seconds.  Requests which would
+                             wait longer raise RateLimitExceeded.  Defaults to None, which waits as long as needed.
+            :param store: the TokenStore holding bucket state.  Defaults to a new MemoryTokenStore.
+        """
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+        self.groups = dict(ENDPOINT_GROUPS)
+        self.groups.update(groups or {})
+        self.block = block
+        self.max_wait = max_wait
+        self.store = store if store is not None else MemoryTokenStore()
+
+    def group(self, endpoint):
+        """
+            :param endpoint: an endpoint name, such as 'claims_status', or None if the endpoint is unknown
+            :return: the endpoint's group, such as 'claims'
+        """
+        if endpoint is None:
+            return 'default'
+        return self.groups.get(endpoint, endpoint)
+
+    def _limit(self, group):
+        """
+            :return: a (rate, burst) tuple for the group, or None if the group is not limited
+        """
+        limit = self.rates.get(group, self.default_rate)
+        if not limit:
+            return None
+        if isinstance(limit, (tuple, list)):
+            rate, burst = limit
+        else:
+            rate, burst = limit, limit
+        return float(rate), max(1.0, float(burst))
+
+    def reserve(self, endpoint, block=None):
+        """
+            Takes a token for a request to an endpoint
+            :param endpoint: the endpoint name, or None if the endpoint is unknown
+            :param block: overrides the limiter's blocking mode when not None
+            :return: the number of seconds the caller must wait before sending the request
+            :raises RateLimitExceeded: if the request is not allowed without waiting, or without waiting longer
+                                       than max_wait
+        """
+        group = self.group(endpoint)
+        limit = self._limit(group)
+        if limit is None:
+            return 0
+        rate, burst = limit
+        block = self.block if block is None else block
+
+        key = 'rate_limit|{0}'.format(group)
+        with self.store.lock(key):
+            now = time.time()
+            bucket = self.store.get(key) or {'tokens': burst, 'updated': now}
+            tokens = min(burst, bucket['tokens'] + (now - bucket['updated']) * rate)
+            wait = max(0.0, (1 - tokens) / rate)
+            if wait > 0 and (not block or (self.max_wait is not None and wait > self.max_wait)):
+                raise RateLimitExceeded(group, wait)
+            # a blocking request may take the token it waits for in advance, leaving the bucket in debt
+            self.store.set(key, {'tokens': tokens - 1, 'updated': now})
+        return wait
+
+    def acquire(self, endpoint, block=None):
+        """
+            Waits until a request to an endpoint is allowed
+            :param endpoint: the endpoint name, or None if the endpoint is unknown
+            :param block: overrides the limiter's blocking mode when not None
+            :raises RateLimitExceeded: if the request is not allowed without waiting, or without waiting longer
+                                       than max_wait
+        """
+        wait = self.reserve(endpoint, block=block)
+        if wait:
+            time.sleep(wait)
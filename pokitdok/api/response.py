@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+
+
+class APIResponse(object):
+    """
+        The outcome of a single API request: its status code, headers, timings and decoded body
+
+        Unlike the client's status_code attribute, an APIResponse belongs to the call which received it, so it may
+        be used freely when a client is shared by several threads.
+    """
+    def __init__(self, status_code, headers, body, timings=None, retries=0, cached=False):
+        """
+            :param status_code: the response status code
+            :param headers: dictionary of response headers
+            :param body: the decoded response body
+            :param timings: dictionary of the timings of the request's last attempt, see RequestEvent. None for a
+                            response taken from the response cache.
+            :param retries: the number of times the request was retried
+            :param cached: Boolean to indicate whether the response was taken from the response cache
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.timings = timings
+        self.retries = retries
+        self.cached = cached
+
+    @property
+    def meta(self):
+        """
+            :return: the meta section of the response body, or None
+        """
+        return self.body.get('meta') if isinstance(self.body, dict) else None
+
+    @property
+    def data(self):
+        """
+            :return: the data section of the response body, or None
+        """
+        return self.body.get('data') if isinstance(self.body, dict) else None
+
+    @property
+    def ok(self):
+        """
+            :return: True if the status code indicates success
+        """
+        return 200 <= self.status_code < 300
+
+    def __repr__(self):
+        return '<APIResponse [{0}]>'.format(self.status_code)
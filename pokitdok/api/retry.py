@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import random
+import threading
+import time
+
+# response status codes which indicate that a request may succeed if it is retried
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# http methods which may be repeated without changing the result of the first request
+IDEMPOTENT_METHODS = ('delete', 'get', 'head', 'options', 'put')
+
+# endpoints whose POST requests only read data, so they may be repeated like a GET
+IDEMPOTENT_ENDPOINTS = ('claims_status', 'eligibility', 'oop_insurance_estimate')
+
+
+class RetryBudget(object):
+    """
+        Limits retries to a fraction of the requests made, so that retries cannot multiply the load on a platform
+        which is already failing
+
+        Each request adds ratio to the budget's balance and each retry spends 1 from it.  The balance is also
+        topped up at min_per_second, which allows occasional retries while requests are infrequent.  A budget may
+        be shared by the clients in a process.
+    """
+    def __init__(self, ratio=0.2, min_per_second=1.0, capacity=10.0):
+        """
+            :param ratio: the number of retries allowed for each request made
+            :param min_per_second: the number of retries allowed per second regardless of the number of requests
+            :param capacity: the largest balance the budget may accumulate
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._balance = capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _top_up(self, amount):
+        now = time.time()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self._balance = min(self.capacity, self._balance + amount)
+
+    def record_request(self):
+        """
+            Adds a request's share to the budget
+        """
+        with self._lock:
+            self._top_up(self.ratio)
+
+    def withdraw(self):
+        """
+            Spends the budget for one retry
+            :return: True if the retry is allowed, False if the budget is exhausted
+        """
+        with self._lock:
+            self._top_up(0)
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+        Decides whether failed requests are retried and how long to wait before each retry
+
+        Requests are retried when the connection fails or the platform responds with one of the retry statuses.
+        Only requests which are safe to repeat are retried after they may have reached the platform: requests using
+        an idempotent method, POST requests to idempotent endpoints, and requests rejected with a 429 status.
+        Retry delays use exponential backoff with decorrelated jitter, and a Retry-After header is honored.
+    """
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_max=30.0, max_retry_after=60.0,
+                 statuses=RETRY_STATUSES, idempotent_endpoints=IDEMPOTENT_ENDPOINTS, budget=None):
+        """
+            :param max_attempts: the maximum number of times a request is sent, including the first attempt
+            :param backoff_base: the shortest delay between attempts, in seconds
+            :param backoff_max: the longest delay between attempts, in seconds
+            :param max_retry_after: the longest Retry-After delay which is waited for, in seconds.  A response
+                                    asking for a longer delay is returned to the caller.
+            :param statuses: the response status codes which are retried
+            :param idempotent_endpoints: the names of endpoints whose POST requests may be retried
+            :param budget: a RetryBudget limiting the number of retries.  Defaults to a new RetryBudget.
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self.idempotent_endpoints = frozenset(idempotent_endpoints)
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def is_idempotent(self, method, endpoint):
+        """
+            :param method: the http request method
+            :param endpoint: the endpoint name, such as 'eligibility', or None if the endpoint is unknown
+            :return: True if the request may be repeated safely
+        """
+        method = method.lower()
+        return method in IDEMPOTENT_METHODS or (method == 'post' and endpoint in self.idempotent_endpoints)
+
+    def retry_delay(self, attempt, previous_delay, method, endpoint, status=None, headers=None, sent=True):
+        """
+            Decides whether a failed attempt is retried
+            :param attempt: the number of attempts made so far
+            :param previous_delay: the delay before the failed attempt, or 0 for the first attempt
+            :param method: the http request method
+            :param endpoint: the endpoint name, or None if the endpoint is unknown
+            :param status: the response status code, or None if the request failed without a response
+            :param headers: the response headers, or None if the request failed without a response
+            :param sent: Boolean to indicate whether the request may have reached the platform
+            :return: the number of seconds to wait before retrying, or None if the request should not be retried
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if status is not None and status not in self.statuses:
+            return None
+        if sent and status != 429 and not self.is_idempotent(method, endpoint):
+            return None
+
+        delay = self.backoff(previous_delay)
+        retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+
+        if not self.budget.withdraw():
+            return None
+        return delay
+
+    def backoff(self, previous_delay):
+        """
+            :param previous_delay: the delay before the previous attempt, or 0 for the first attempt
+            :return: a random delay of up to three times the previous delay, within backoff_base and backoff_max
+        """
+        upper = max(self.backoff_base, previous_delay * 3)
+        return min(self.backoff_max, random.uniform(self.backoff_base, upper))
+
+
+def parse_retry_after(value):
+    """
+        :param value: a Retry-After header value, holding either a number of seconds or an http date
+        :return: the number of seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_tz, mktime_tz
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
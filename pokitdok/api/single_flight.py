@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import threading
+
+
+class SingleFlight(object):
+    """
+        Coalesces concurrent calls with the same key, so that one of them runs and the others wait for it and share
+        its result
+
+        A call which starts after the running call has finished runs again, so results are never reused once they
+        have been returned.  Callers sharing a result receive the same object, and an exception raised by the
+        running call is raised to every caller waiting for it.
+    """
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+            Calls func, unless a call with the same key is in progress, in which case its outcome is shared
+            :param key: a hashable key identifying the call
+            :param func: a callable which takes no arguments
+            :return: the result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            running = call is not None
+            if running:
+                self.coalesced += 1
+            else:
+                call = self._calls[key] = _Call()
+        if running:
+            call.finished.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.finished.set()
+        return call.result
+
+
+class _Call(object):
+    """
+        A call in progress, along with its outcome once it has finished
+    """
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
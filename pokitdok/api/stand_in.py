@@ -0,0 +1,552 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+"""
+    An in-process stand-in for the PokitDok platform, for load and failure-mode testing of the client and of
+    applications using it
+
+    Run it on its own with: python -m pokitdok.api.stand_in --port 8000 --latency 0.05 --error-rate 0.01
+"""
+
+from __future__ import absolute_import, print_function
+import base64
+import binascii
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from .client import ENDPOINT_URLS, PokitDokClient
+
+try:
+    from urllib.parse import urlparse, parse_qsl
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urlparse import urlparse, parse_qsl
+    from urllib2 import Request, urlopen
+
+# endpoints whose requests start a platform activity
+ACTIVITY_ENDPOINTS = ('claims', 'claims_convert', 'enrollment_snapshot', 'identity_match')
+
+# response status codes returned by injected errors
+ERROR_STATUSES = (500, 502, 503, 504)
+
+# the number of running stand-in servers, and the value of OAUTHLIB_INSECURE_TRANSPORT before the first one started
+_insecure_transport = {'servers': 0, 'previous': None}
+_insecure_transport_lock = threading.Lock()
+
+
+def constant(seconds):
+    """
+        :return: a latency distribution which always returns the same latency
+    """
+    return lambda: seconds
+
+
+def uniform(low, high):
+    """
+        :return: a latency distribution uniform between low and high seconds
+    """
+    return lambda: random.uniform(low, high)
+
+
+def exponential(mean):
+    """
+        :return: an exponential latency distribution with the given mean, in seconds
+    """
+    return lambda: random.expovariate(1.0 / mean)
+
+
+def lognormal(median, sigma=0.5):
+    """
+        :return: a log-normal latency distribution with the given median, in seconds.  Its long tail resembles the
+                 latency of real payer connections.
+    """
+    mu = math.log(median) if median > 0 else 0.0
+    return lambda: random.lognormvariate(mu, sigma)
+
+
+class StandInServer(object):
+    """
+        A local http server implementing /oauth2/token and the /api/v4 routes used by PokitDokClient, with canned
+        responses
+
+        Point a client at it with base=server.url.  Since it serves plain http, OAUTHLIB_INSECURE_TRANSPORT is set
+        while the server is running, so that oauthlib fetches tokens over http, and its previous value is restored
+        once every stand-in server has stopped.  Access tokens are issued for any client id
+        and secret unless clients is given, and expire after token_lifetime seconds.  Claims, claims_convert,
+        enrollment_snapshot and identity_match requests start activities which complete after activity_duration
+        seconds, are listed by the activities endpoint and are reported to the request's callback_url, if any.
+
+        Failure modes are injected into API requests, not token requests: latency drawn from a distribution, a
+        fraction of requests failing with an error status or a dropped connection, and 429 responses once
+        requests exceed rate_limit per second.  Each of latency and error_rate may be given per endpoint as a
+        dictionary, with a 'default' entry for the other endpoints.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=None, error_rate=0.0, error_statuses=ERROR_STATUSES,
+                 drop_rate=0.0, rate_limit=None, token_lifetime=3600, activity_duration=1.0, listing_size=100,
+                 clients=None, version='v4'):
+        """
+            :param host: the address to listen on
+            :param port: the port to listen on.  Defaults to 0, which picks a free port.
+            :param latency: the latency added to API responses: a number of seconds, a distribution such as
+                            lognormal(0.2), or a dictionary of endpoint name to either.  Defaults to None.
+            :param error_rate: the fraction of API requests which fail with one of error_statuses, or a dictionary
+                               of endpoint name to a fraction
+            :param error_statuses: the response statuses of injected errors
+            :param drop_rate: the fraction of API requests whose connection is closed without a response
+            :param rate_limit: the number of API requests allowed per second before requests receive 429 responses
+                               with a Retry-After header.  Defaults to None, which does not limit requests.
+            :param token_lifetime: the number of seconds issued access tokens are valid for
+            :param activity_duration: the number of seconds after which activities complete
+            :param listing_size: the number of records listed by listing endpoints across all pages
+            :param clients: dictionary of client id to client secret accepted by the token endpoint.  Defaults to
+                            None, which accepts any credentials.
+            :param version: the API version in request paths
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.drop_rate = drop_rate
+        self.rate_limit = rate_limit
+        self.token_lifetime = token_lifetime
+        self.activity_duration = activity_duration
+        self.listing_size = listing_size
+        self.clients = clients
+        self.api_prefix = '/api/{0}'.format(version)
+        self.server = None
+        self.responses = {}
+        self._tokens = {}
+        self._activities = {}
+        self._stats = {'requests': {}, 'tokens_issued': 0, 'uploaded_files': 0, 'uploaded_bytes': 0}
+        self._bucket = None
+        self._lock = threading.Lock()
+        self._router = PokitDokClient('stand-in', 'stand-in', lazy=True)
+
+    @property
+    def url(self):
+        """
+            The base URL to pass to the client as base
+        """
+        return 'http://{0}:{1}'.format(self.host, self.port)
+
+    def start(self):
+        """
+            Starts serving requests in background threads
+            :return: the server
+        """
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+        stand_in = self
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, which would otherwise stall keep-alive connections
+            disable_nagle_algorithm = True
+
+            def handle_request(self):
+                body = _read_body(self)
+                status, headers, content = stand_in.handle(self.command, self.path, self.headers, body)
+                if status is None:
+                    self.close_connection = True
+                    return
+                self.send_response(status)
+                headers.setdefault('Content-Type', 'application/json')
+                headers['Content-Length'] = str(len(content))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = Server((self.host, self.port), Handler)
+        _allow_insecure_transport()
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """
+            Stops serving requests
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            _restore_insecure_transport()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def set_response(self, endpoint, response):
+        """
+            Replaces the canned response of an endpoint
+            :param endpoint: the endpoint name, such as 'eligibility'
+            :param response: the response data, or a function accepting (method, resource id, request data) and
+                             returning the response data
+        """
+        self.responses[endpoint] = response
+
+    def expire_tokens(self):
+        """
+            Expires every access token issued so far, so that API requests using them receive 401 responses
+        """
+        with self._lock:
+            for token in self._tokens:
+                self._tokens[token] = 0
+
+    def stats(self):
+        """
+            :return: dictionary of the number of requests by endpoint and status code, the number of access tokens
+                     issued and the number and size of uploaded files
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['requests'] = dict((endpoint, dict(statuses)) for endpoint, statuses in
+                                     self._stats['requests'].items())
+            return stats
+
+    def handle(self, method, path, headers, body):
+        """
+            Handles a request
+            :param method: the http request method
+            :param path: the request path and query
+            :param headers: the request headers
+            :param body: the request body
+            :return: a (status, headers, content) tuple, with a None status to drop the connection
+        """
+        url = urlparse(path)
+        if url.path.rstrip('/') == '/oauth2/token':
+            return self._token(_token_form(headers, body))
+        if not url.path.startswith(self.api_prefix):
+            return self._reply(404, {'errors': 'Not found'})
+
+        api_path = url.path[len(self.api_prefix):]
+        endpoint = self._endpoint(api_path)
+        status, headers, content = self._api(method, api_path, endpoint, url.query, headers, body)
+        with self._lock:
+            statuses = self._stats['requests'].setdefault(endpoint or 'other', {})
+            key = 'dropped' if status is None else status
+            statuses[key] = statuses.get(key, 0) + 1
+        return status, headers, content
+
+    def _token(self, form):
+        if self.clients is not None and self.clients.get(form.get('client_id')) != form.get('client_secret'):
+            return self._json(401, {'error': 'invalid_client'})
+        token = _new_id()
+        with self._lock:
+            self._tokens[token] = time.time() + self.token_lifetime
+            self._stats['tokens_issued'] += 1
+        response = {'access_token': token, 'token_type': 'bearer', 'expires_in': self.token_lifetime}
+        if form.get('grant_type') in ('authorization_code', 'refresh_token'):
+            response['refresh_token'] = _new_id()
+        return self._json(200, response)
+
+    def _api(self, method, api_path, endpoint, query, headers, body):
+        authorization = headers.get('Authorization') or ''
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else None
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        if expires_at is None or expires_at <= time.time():
+            return self._json(401, {'error': 'invalid_token'})
+
+        retry_after = self._throttle()
+        if retry_after:
+            return self._reply(429, {'errors': 'Too many requests'}, {'Retry-After': '{0:.3f}'.format(retry_after)})
+
+        latency = _per_endpoint(self.latency, endpoint)
+        if latency:
+            time.sleep(max(0.0, latency() if callable(latency) else latency))
+        if self.drop_rate and random.random() < self.drop_rate:
+            return None, {}, b''
+        error_rate = _per_endpoint(self.error_rate, endpoint)
+        if error_rate and random.random() < error_rate:
+            return self._reply(random.choice(self.error_statuses), {'errors': 'Injected error'})
+
+        data = _request_data(headers, body, self._stats, self._lock)
+        data.update(dict(parse_qsl(query)))
+        resource_id = self._resource_id(api_path, endpoint)
+        if endpoint == 'activities':
+            return self._activities_response(resource_id, data)
+        if endpoint in ACTIVITY_ENDPOINTS and method == 'POST':
+            activity = self._start_activity(endpoint, data)
+            return self._reply(200, self._activity_record(activity), {}, activity['id'])
+
+        response = self.responses.get(endpoint)
+        if callable(response):
+            response = response(method, resource_id, data)
+        if response is not None:
+            return self._reply(200, response)
+        if resource_id is None and method == 'GET':
+            return self._page(data, [{'id': str(index), 'endpoint': endpoint} for index in range(self.listing_size)])
+        return self._reply(200, self._canned(endpoint, resource_id, data))
+
+    def _throttle(self):
+        """
+            :return: 0 if a request is allowed by the rate limit, otherwise the number of seconds until one is
+        """
+        if not self.rate_limit:
+            return 0
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._bucket or (self.rate_limit, now)
+            tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+            if tokens < 1:
+                self._bucket = (tokens, now)
+                return (1 - tokens) / self.rate_limit
+            self._bucket = (tokens - 1, now)
+            return 0
+
+    def _endpoint(self, api_path):
+        if api_path.startswith('/identity/') and api_path.rstrip('/').endswith('/history'):
+            return 'identity_history'
+        return self._router.endpoint_name(api_path)
+
+    def _resource_id(self, api_path, endpoint):
+        """
+            :return: the resource id in a request path, such as the trading partner id of /tradingpartners/MOCKPAYER
+        """
+        segments = [segment for segment in api_path.split('/') if segment]
+        if endpoint == 'identity_history':
+            return segments[1]
+        url_attribute = dict(ENDPOINT_URLS).get(endpoint)
+        if url_attribute is None:
+            return None
+        template = [segment for segment in getattr(self._router, url_attribute).split('/') if segment]
+        index = template.index('{0}') if '{0}' in template else len(template)
+        return segments[index] if len(segments) > index else None
+
+    def _start_activity(self, endpoint, data, parent_id=None):
+        activity = {
+            'id': _new_id(),
+            'name': endpoint,
+            'parent_id': parent_id,
+            'callback_url': data.get('callback_url'),
+            'trading_partner_id': data.get('trading_partner_id'),
+            'created': time.time(),
+        }
+        with self._lock:
+            self._activities[activity['id']] = activity
+        if activity['callback_url']:
+            timer = threading.Timer(self.activity_duration, self._deliver_callback, (activity,))
+            timer.daemon = True
+            timer.start()
+        return activity
+
+    def _activity_record(self, activity):
+        done = time.time() >= activity['created'] + self.activity_duration
+        state = 'completed' if done else 'scheduled'
+        return {
+            'id': activity['id'],
+            'name': activity['name'],
+            'parent_id': activity['parent_id'],
+            'callback_url': activity['callback_url'],
+            'trading_partner_id': activity['trading_partner_id'],
+            'state': {'name': state, 'title': state.title()},
+            'units_of_work': 1,
+            'result': {'status': 'accepted'} if done else None,
+        }
+
+    def _activities_response(self, activity_id, data):
+        with self._lock:
+            if activity_id is not None:
+                activity = self._activities.get(activity_id)
+                if activity is None:
+                    return self._reply(404, {'errors': 'Activity {0} was not found'.format(activity_id)})
+                return self._reply(200, self._activity_record(activity))
+            activities = [activity for activity in self._activities.values()
+                          if 'parent_id' not in data or activity['parent_id'] == data['parent_id']]
+        activities.sort(key=lambda activity: activity['created'])
+        return self._page(data, [self._activity_record(activity) for activity in activities])
+
+    def _deliver_callback(self, activity):
+        content = json.dumps({'meta': {'activity_id': activity['id']},
+                              'data': self._activity_record(activity)}).encode('utf-8')
+        try:
+            urlopen(Request(activity['callback_url'], data=content, headers={'Content-Type': 'application/json'}),
+                    timeout=10).close()
+        except Exception:
+            pass
+
+    def _canned(self, endpoint, resource_id, data):
+        """
+            :return: the canned response data for a single record, echoing the request data
+        """
+        record = {'id': resource_id or _new_id(), 'endpoint': endpoint}
+        record.update((key, value) for key, value in data.items() if not isinstance(value, bytes))
+        if endpoint == 'eligibility':
+            record['coverage'] = {'active': True, 'plan_begin_date': '2017-01-01', 'service_types': ['health']}
+        return record
+
+    def _page(self, data, records):
+        offset = int(data.get('offset') or 0)
+        limit = int(data.get('limit') or 50)
+        return self._reply(200, records[offset:offset + limit])
+
+    def _reply(self, status, data, headers=None, activity_id=None):
+        meta = {'processing_time': 0, 'credits_billed': 0 if status != 200 else 1}
+        if activity_id is not None:
+            meta['activity_id'] = activity_id
+        return self._json(status, {'meta': meta, 'data': data}, headers)
+
+    def _json(self, status, response, headers=None):
+        return status, dict(headers or {}), json.dumps(response).encode('utf-8')
+
+
+def _new_id():
+    return binascii.hexlify(os.urandom(12)).decode('ascii')
+
+
+def _allow_insecure_transport():
+    """
+        Lets oauthlib fetch tokens over plain http, which it refuses unless OAUTHLIB_INSECURE_TRANSPORT is set, while
+        a stand-in server is running
+    """
+    with _insecure_transport_lock:
+        if not _insecure_transport['servers']:
+            _insecure_transport['previous'] = os.environ.get('OAUTHLIB_INSECURE_TRANSPORT')
+            os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+        _insecure_transport['servers'] += 1
+
+
+def _restore_insecure_transport():
+    """
+        Restores the value of OAUTHLIB_INSECURE_TRANSPORT from before the first stand-in server started once the
+        last one has stopped
+    """
+    with _insecure_transport_lock:
+        _insecure_transport['servers'] -= 1
+        if _insecure_transport['servers']:
+            return
+        previous = _insecure_transport['previous']
+        if previous is None:
+            os.environ.pop('OAUTHLIB_INSECURE_TRANSPORT', None)
+        else:
+            os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = previous
+
+
+def _per_endpoint(setting, endpoint):
+    if isinstance(setting, dict):
+        return setting.get(endpoint, setting.get('default'))
+    return setting
+
+
+def _token_form(headers, body):
+    """
+        :return: dictionary of the fields of a token request, including client credentials given with basic auth
+    """
+    form = dict(parse_qsl(body.decode('utf-8')))
+    authorization = headers.get('Authorization') or ''
+    if authorization.startswith('Basic '):
+        credentials = base64.b64decode(authorization[len('Basic '):].encode('ascii')).decode('utf-8')
+        form['client_id'], _, form['client_secret'] = credentials.partition(':')
+    return form
+
+
+def _read_body(handler):
+    """
+        :return: the body of a request, reading chunked transfer encoding
+    """
+    if handler.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int(handler.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                handler.rfile.readline()
+                return b''.join(chunks)
+            chunks.append(handler.rfile.read(size))
+            handler.rfile.readline()
+    length = int(handler.headers.get('Content-Length') or 0)
+    return handler.rfile.read(length) if length else b''
+
+
+def _request_data(headers, body, stats, lock):
+    """
+        :return: dictionary of the fields of a JSON, form or multipart request body.  Uploaded files are counted in
+                 the stats rather than returned.
+    """
+    if headers.get('Content-Encoding', '').lower() == 'gzip':
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    content_type = headers.get('Content-Type') or ''
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        data = json.loads(body.decode('utf-8'))
+        return data if isinstance(data, dict) else {'data': data}
+    if content_type.startswith('multipart/form-data'):
+        import email
+        parse = getattr(email, 'message_from_bytes', email.message_from_string)
+        message = parse('Content-Type: {0}\r\n\r\n'.format(content_type).encode('ascii') + body)
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            content = part.get_payload(decode=True)
+            if part.get_filename():
+                with lock:
+                    stats['uploaded_files'] += 1
+                    stats['uploaded_bytes'] += len(content)
+            else:
+                fields[name] = content.decode('utf-8')
+        return fields
+    return dict(parse_qsl(body.decode('utf-8')))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Runs a stand-in PokitDok platform server')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='the port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='the median API latency in seconds')
+    parser.add_argument('--latency-sigma', type=float, default=0.0,
+                        help='the shape of a log-normal latency distribution; 0 for a constant latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='the fraction of API requests which fail')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='the fraction of API requests whose connection is dropped')
+    parser.add_argument('--rate-limit', type=float, default=None, help='the API requests allowed per second')
+    parser.add_argument('--token-lifetime', type=int, default=3600, help='the access token lifetime in seconds')
+    parser.add_argument('--activity-duration', type=float, default=1.0,
+                        help='the number of seconds after which activities complete')
+    args = parser.parse_args(argv)
+
+    latency = None
+    if args.latency:
+        latency = lognormal(args.latency, args.latency_sigma) if args.latency_sigma else args.latency
+    server = StandInServer(host=args.host, port=args.port, latency=latency, error_rate=args.error_rate,
+                           drop_rate=args.drop_rate, rate_limit=args.rate_limit, token_lifetime=args.token_lifetime,
+                           activity_duration=args.activity_duration).start()
+    print('Serving a stand-in PokitDok platform at {0}'.format(server.url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
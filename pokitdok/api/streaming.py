@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import codecs
+import json
+from .exceptions import APIError
+
+_WHITESPACE = ' \t\n\r'
+
+# the characters which may follow a complete number or literal
+_DELIMITERS = ',]}' + _WHITESPACE
+
+
+class ResponseParser(object):
+    """
+        Incremental parser for API responses
+
+        Response text is fed to the parser as it is received.  The elements of the top level "data" array are
+        returned one at a time as soon as each is complete, while every other top level value, such as "meta",
+        is kept in the fields dictionary, as is a "data" value which is not an array.  Only the text of the element
+        being parsed is held in memory.
+    """
+    def __init__(self, array_key='data'):
+        """
+            :param array_key: the top level key of the array whose elements are returned as they are parsed
+        """
+        self.array_key = array_key
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._state = 'start'
+        self._key = None
+        self._wanted = 0
+        self.array_started = False
+
+    @property
+    def done(self):
+        """
+            True once the whole response has been parsed
+        """
+        return self._state == 'done'
+
+    def raise_for_data(self):
+        """
+            :raises APIError: if the response's array key held a value other than an array, as it does when the
+                              response reports errors
+        """
+        if self.array_key in self.fields:
+            raise APIError(dict(self.fields))
+
+    def feed(self, text, final=False):
+        """
+            Parses the next piece of response text
+            :param text: the response text received since the previous call
+            :param final: Boolean to indicate that the response text is complete
+            :return: a list of the array elements completed by this text
+        """
+        self._buffer += text
+        if len(self._buffer) < self._wanted and not final:
+            return []
+
+        elements = []
+        position = 0
+        buffer_ = self._buffer
+        while True:
+            position = _skip_whitespace(buffer_, position)
+            if position >= len(buffer_):
+                break
+            char = buffer_[position]
+            state = self._state
+
+            if state == 'start':
+                self._expect(char, '{')
+                position += 1
+                self._state = 'key'
+            elif state in ('key', 'next_key'):
+                if char == '}' and state == 'key':
+                    position += 1
+                    self._state = 'done'
+                    continue
+                end = self._decode(buffer_, position, final)
+                if end is None:
+                    break
+                self._key, position = end
+                self._state = 'colon'
+            elif state == 'colon':
+                self._expect(char, ':')
+                position += 1
+                self._state = 'value'
+            elif state == 'value':
+                if self._key == self.array_key and char == '[':
+                    position += 1
+                    self._state = 'element'
+                    self.array_started = True
+                    continue
+                end = self._decode(buffer_, position, final)
+                if end is None:
+                    break
+                self.fields[self._key], position = end
+                self._state = 'after_value'
+            elif state in ('element', 'next_element'):
+                if char == ']' and state == 'element':
+                    position += 1
+                    self._state = 'after_value'
+                    continue
+                end = self._decode(buffer_, position, final)
+                if end is None:
+                    break
+                element, position = end
+                elements.append(element)
+                self._state = 'after_element'
+            elif state == 'after_element':
+                self._expect(char, ',]')
+                position += 1
+                self._state = 'next_element' if char == ',' else 'after_value'
+            elif state == 'after_value':
+                self._expect(char, ',}')
+                position += 1
+                self._state = 'next_key' if char == ',' else 'done'
+            else:
+                raise ValueError('Unexpected data after the end of the response: {0!r}'.format(buffer_[position:]))
+
+        self._buffer = buffer_[position:]
+        if final and self._state != 'done':
+            raise ValueError('The response ended before it was complete')
+        return elements
+
+    def _decode(self, buffer_, position, final):
+        """
+            Decodes the JSON value at position
+            :return: a (value, end position) tuple, or None if more text is needed to complete the value
+        """
+        try:
+            value, end = self._decoder.raw_decode(buffer_, position)
+        except ValueError:
+            if final:
+                raise
+            self._wait_for_more(buffer_, position)
+            return None
+        if not final and buffer_[position] not in '"{[' and (end >= len(buffer_) or buffer_[end] not in _DELIMITERS):
+            # a number or literal is only complete once it is followed by a delimiter, as 12 may continue as 12.5.
+            # strings, objects and arrays end with their closing character, and keys are followed by a colon.
+            self._wait_for_more(buffer_, position)
+            return None
+        self._wanted = 0
+        return value, end
+
+    def _wait_for_more(self, buffer_, position):
+        # retry once the incomplete value's text has doubled, so large values are not re-parsed for every piece
+        self._wanted = 2 * (len(buffer_) - position)
+
+    def _expect(self, char, expected):
+        if char not in expected:
+            raise ValueError('Expected one of {0!r} in the response but found {1!r}'.format(expected, char))
+
+
+def _skip_whitespace(text, position):
+    while position < len(text) and text[position] in _WHITESPACE:
+        position += 1
+    return position
+
+
+class StreamingResponse(object):
+    """
+        An API response which is decoded incrementally as it is received
+
+        Iterating over the response yields the elements of its "data" array one at a time.  The other
+        top level values, such as meta, are available once they have been received, which for meta usually
+        means after iteration has finished.  The response should be closed, or used as a context manager,
+        so that its connection is returned to the connection pool.
+    """
+    def __init__(self, response, chunk_size=65536):
+        """
+            :param response: a requests response opened with stream=True
+            :param chunk_size: the number of bytes read from the connection at a time
+        """
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.chunk_size = chunk_size
+        self.parser = ResponseParser()
+        self._parsed = self._parse()
+        self._pending = []
+
+    @property
+    def meta(self):
+        """
+            :return: the response meta section, or None if it has not been received yet
+        """
+        return self.parser.fields.get('meta')
+
+    @property
+    def fields(self):
+        """
+            :return: dictionary of the top level response values received so far, other than the data array
+        """
+        return self.parser.fields
+
+    def start(self):
+        """
+            Reads the response up to the start of its data array.  The elements read along the way are yielded
+            when the response is iterated.
+            :return: the response
+            :raises APIError: if the response's data is not an array, as when the response reports errors
+        """
+        try:
+            while not self.parser.array_started and not self.parser.done:
+                self._pending.extend(next(self._parsed))
+            self.parser.raise_for_data()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _parse(self):
+        """
+            Yields a list of the array elements completed by each chunk of the response
+        """
+        decoder = codecs.getincrementaldecoder(self.response.encoding or 'utf-8')(errors='replace')
+        for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+            yield self.parser.feed(decoder.decode(chunk))
+        yield self.parser.feed(decoder.decode(b'', final=True), final=True)
+
+    def __iter__(self):
+        try:
+            pending, self._pending = self._pending, []
+            for element in pending:
+                yield element
+            for elements in self._parsed:
+                for element in elements:
+                    yield element
+            self.parser.raise_for_data()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+            Releases the response's connection
+        """
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import json
+import os
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# abstract base class which works on both python 2 and 3
+_ABC = ABCMeta('ABC', (object,), {'__slots__': ()})
+
+
+class TokenStore(_ABC):
+    """
+        Abstract base class for access token stores shared by PokitDok API clients
+
+        Clients using the client credentials flow look up a token in the store before requesting one
+        from the platform.  The store's lock is held while a token is requested, so that only one of the
+        clients sharing the store fetches a new token when the stored token has expired.  Subclasses implement
+        get, set and lock.
+    """
+    def __init__(self, min_ttl=60):
+        """
+            :param min_ttl: stored tokens which expire within this many seconds are treated as expired
+        """
+        self.min_ttl = min_ttl
+
+    @abstractmethod
+    def get(self, key):
+        """
+            :param key: the key identifying the token
+            :return: the stored token dictionary, or None
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key, token):
+        """
+            Stores a token
+            :param key: the key identifying the token
+            :param token: the token dictionary
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def lock(self, key):
+        """
+            :param key: the key identifying the token
+            :return: a context manager which holds an exclusive lock for the key
+        """
+        raise NotImplementedError
+
+    def get_valid(self, key):
+        """
+            :param key: the key identifying the token
+            :return: the stored token dictionary if it is present and not about to expire, otherwise None
+        """
+        token = self.get(key)
+        if not token or 'access_token' not in token:
+            return None
+        expires_at = token.get('expires_at')
+        if expires_at is not None and float(expires_at) - self.min_ttl <= time.time():
+            return None
+        return token
+
+
+class MemoryTokenStore(TokenStore):
+    """
+        Token store shared by clients within a single process
+    """
+    def __init__(self, min_ttl=60):
+        super(MemoryTokenStore, self).__init__(min_ttl=min_ttl)
+        self._tokens = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        return self._tokens.get(key)
+
+    def set(self, key, token):
+        self._tokens[key] = dict(token)
+
+    def lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+class FileTokenStore(TokenStore):
+    """
+        Token store shared by processes on a host through files in a directory
+
+        Each token is kept in its own file, named by a hash of its key, and an advisory file lock
+        serializes token requests across processes.
+    """
+    def __init__(self, directory=None, min_ttl=60):
+        """
+            :param directory: the directory used to store tokens.  Defaults to a pokitdok-tokens directory
+                              within the system temporary directory.
+            :param min_ttl: stored tokens which expire within this many seconds are treated as expired
+        """
+        super(FileTokenStore, self).__init__(min_ttl=min_ttl)
+        import tempfile
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'pokitdok-tokens')
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory, 0o700)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        self._thread_locks = MemoryTokenStore()
+
+    def _path(self, key, extension):
+        import hashlib
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '{0}.{1}'.format(digest, extension))
+
+    def get(self, key):
+        try:
+            with open(self._path(key, 'json'), 'r') as token_file:
+                return json.load(token_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, token):
+        path = self._path(key, 'json')
+        import tempfile
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as temp_file:
+                json.dump(token, temp_file)
+            if hasattr(os, 'replace'):
+                os.replace(temp_path, path)
+            else:
+                os.rename(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    @contextmanager
+    def lock(self, key):
+        # file locks are held per process, so threads within a process are serialized separately
+        with self._thread_locks.lock(key):
+            fd = os.open(self._path(key, 'lock'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                _lock_file(fd)
+                try:
+                    yield
+                finally:
+                    _unlock_file(fd)
+            finally:
+                os.close(fd)
+
+
+def _lock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import os
+import zlib
+
+
+class MultipartUpload(object):
+    """
+        A multipart/form-data request body which streams files from disk
+
+        The body is generated in chunks as it is sent, so uploads use a constant amount of memory regardless
+        of file size.  Each file is opened when its content is sent and closed as soon as it has been read,
+        or when sending stops.  The body may be iterated more than once, which allows a request to be retried.
+    """
+    def __init__(self, fields=None, files=None, compress=False, chunk_size=65536):
+        """
+            :param fields: dictionary of form field names to values
+            :param files: dictionary of form field names to (filename, file, content type) tuples.  A file is a file
+                          path, or an object with a size attribute and an iter_chunks(chunk_size) method yielding
+                          its content, such as an X12Chunk.
+            :param compress: Boolean to indicate whether the body should be gzip compressed.  The length of a
+                             compressed body is not known in advance, so it is sent with chunked transfer encoding.
+            :param chunk_size: the number of bytes read from a file at a time
+        """
+        self.fields = fields or {}
+        self.files = files or {}
+        self.compress = compress
+        self.chunk_size = chunk_size
+        import uuid
+        self.boundary = uuid.uuid4().hex
+
+    @property
+    def headers(self):
+        """
+            :return: dictionary of the request headers which describe the body
+        """
+        headers = {'Content-Type': 'multipart/form-data; boundary={0}'.format(self.boundary)}
+        if self.compress:
+            headers['Content-Encoding'] = 'gzip'
+        return headers
+
+    def _field_header(self, name, filename=None, content_type=None):
+        disposition = 'form-data; name="{0}"'.format(_quote(name))
+        if filename is not None:
+            disposition += '; filename="{0}"'.format(_quote(filename))
+        lines = ['--{0}'.format(self.boundary), 'Content-Disposition: {0}'.format(disposition)]
+        if content_type is not None:
+            lines.append('Content-Type: {0}'.format(content_type))
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    def _closing_boundary(self):
+        return '--{0}--\r\n'.format(self.boundary).encode('utf-8')
+
+    def _parts(self):
+        """
+            Generates the uncompressed body in chunks
+        """
+        for name, value in sorted(self.fields.items()):
+            yield self._field_header(name) + _encode(value) + b'\r\n'
+
+        for name, (filename, path, content_type) in sorted(self.files.items()):
+            yield self._field_header(name, filename, content_type)
+            if hasattr(path, 'iter_chunks'):
+                for chunk in path.iter_chunks(self.chunk_size):
+                    yield chunk
+            else:
+                with open(path, 'rb') as upload_file:
+                    chunk = upload_file.read(self.chunk_size)
+                    while chunk:
+                        yield chunk
+                        chunk = upload_file.read(self.chunk_size)
+            yield b'\r\n'
+
+        yield self._closing_boundary()
+
+    def __iter__(self):
+        if not self.compress:
+            return self._parts()
+        return self._compressed_parts()
+
+    def _compressed_parts(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for part in self._parts():
+            chunk = compressor.compress(part)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    def length(self):
+        """
+            :return: the length of the body in bytes, or None for a compressed body whose length is not known in advance
+        """
+        if self.compress:
+            return None
+        length = len(self._closing_boundary())
+        for name, value in self.fields.items():
+            length += len(self._field_header(name)) + len(_encode(value)) + 2
+        for name, (filename, path, content_type) in self.files.items():
+            size = path.size if hasattr(path, 'iter_chunks') else os.path.getsize(path)
+            length += len(self._field_header(name, filename, content_type)) + size + 2
+        return length
+
+    def body(self):
+        """
+            :return: the body to submit with requests.  requests sends a body which reports its length with a
+                     Content-Length header, and any other iterable body with chunked transfer encoding.
+        """
+        if self.compress:
+            return _UploadBody(self)
+        return _SizedUploadBody(self)
+
+
+class _UploadBody(object):
+    def __init__(self, upload):
+        self.upload = upload
+
+    def __iter__(self):
+        return iter(self.upload)
+
+
+class _SizedUploadBody(_UploadBody):
+    def __len__(self):
+        return self.upload.length()
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    if not isinstance(value, type(u'')):
+        value = str(value)
+    return value.encode('utf-8')
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014, All Rights Reserved, PokitDok, Inc.
+# https://www.pokitdok.com
+#
+# Please see the License.txt file for more information.
+# All other rights reserved.
+#
+
+from __future__ import absolute_import
+import os
+import re
+
+# the length of an ISA segment, which has fixed width elements, including its segment terminator
+ISA_LENGTH = 106
+
+# the QTY segment qualifiers of an 834 header which count the members of a transaction set
+MEMBER_COUNT_QUALIFIERS = (b'TO', b'ET', b'DT')
+
+
+class X12EnrollmentFile(object):
+    """
+        A X12 834 benefit enrollment file which is read through a memory map, so that files of any size may be split
+        into chunks without reading them into memory
+
+        Each chunk holds whole members (INS loops) of one transaction set and is a complete interchange: the
+        original ISA, GS and transaction set header segments, followed by the members and new SE, GE and IEA
+        trailers.  The trailers count the chunk's segments, and the header's QTY member totals are recalculated
+        for the chunk.  Each chunk gets its own interchange and group control numbers, counting up from those of
+        the original file.  The file must stay open while its chunks are read.
+    """
+    def __init__(self, path):
+        """
+            :param path: the path to a X12 834 file
+        """
+        self.path = path
+        self._file = None
+        self._map = None
+
+    def open(self):
+        """
+            Opens and maps the file
+            :return: the file
+        """
+        import mmap
+        if os.path.getsize(self.path) < ISA_LENGTH:
+            raise ValueError('{0} is not a X12 file'.format(self.path))
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def close(self):
+        """
+            Unmaps and closes the file
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def chunks(self, max_chunk_size=10 * 1024 * 1024):
+        """
+            Splits the file at member boundaries
+            :param max_chunk_size: the largest size of a chunk in bytes.  A chunk holds at least one member, so
+                                   a member larger than this is sent in a chunk of its own.
+            :return: a list of X12Chunks
+        """
+        if self._map is None:
+            self.open()
+        data = self._map
+        start = data.find(b'ISA')
+        if start < 0 or len(data) < start + ISA_LENGTH:
+            raise ValueError('{0} is not a X12 file'.format(self.path))
+        separator = data[start + 3:start + 4]
+        terminator = data[start + ISA_LENGTH - 1:start + ISA_LENGTH]
+        splitter = _Splitter(self, separator, terminator, _line_break(data, start + ISA_LENGTH), max_chunk_size)
+
+        position = start
+        length = len(data)
+        while position < length:
+            end = data.find(terminator, position)
+            if end < 0:
+                end = length
+            segment = data[position:end]
+            following = end + 1
+            while data[following:following + 1] in (b'\r', b'\n'):
+                following += 1
+            segment = segment.strip(b'\r\n')
+            resume = splitter.segment(data, segment, position) if segment else None
+            position = following if resume is None else resume
+        if splitter.in_transaction:
+            raise ValueError('{0} ends within a transaction set'.format(self.path))
+        return splitter.chunks
+
+
+class X12Chunk(object):
+    """
+        A chunk of a X12 834 file, sent by MultipartUpload as a file.  Its members are read from the file's memory
+        map as the chunk is sent.
+    """
+    def __init__(self, x12_file, index, header, start, end, trailer, members):
+        """
+            :param x12_file: the X12EnrollmentFile
+            :param index: the index of the chunk within the file
+            :param header: the chunk's envelope and transaction set header segments
+            :param start: the offset of the chunk's first member in the file
+            :param end: the offset following the chunk's last member in the file
+            :param trailer: the chunk's SE, GE and IEA segments
+            :param members: the number of members in the chunk
+        """
+        self.x12_file = x12_file
+        self.index = index
+        self.header = header
+        self.start = start
+        self.end = end
+        self.trailer = trailer
+        self.members = members
+
+    @property
+    def size(self):
+        """
+            The size of the chunk in bytes
+        """
+        return len(self.header) + self.end - self.start + len(self.trailer)
+
+    @property
+    def filename(self):
+        """
+            The chunk's file name, such as employees-003.x12 for the fourth chunk of employees.x12
+        """
+        base, extension = os.path.splitext(os.path.basename(self.x12_file.path))
+        return '{0}-{1:03d}{2}'.format(base, self.index, extension)
+
+    def iter_chunks(self, chunk_size):
+        """
+            Yields the content of the chunk
+            :param chunk_size: the number of bytes read from the file at a time
+        """
+        yield self.header
+        data = self.x12_file._map
+        if data is None:
+            raise ValueError('{0} was closed'.format(self.x12_file.path))
+        for position in range(self.start, self.end, chunk_size):
+            yield data[position:min(position + chunk_size, self.end)]
+        yield self.trailer
+
+    def read(self):
+        """
+            :return: the content of the chunk
+        """
+        return b''.join(self.iter_chunks(65536))
+
+
+class _Splitter(object):
+    """
+        Splits the segments of a X12 834 file into chunks as they are scanned.  Envelope and header segments are
+        scanned one at a time, while members are found by searching for their INS segments, since they make up
+        almost all of a file.
+    """
+    def __init__(self, x12_file, separator, terminator, line_break, max_chunk_size):
+        self.x12_file = x12_file
+        self.separator = separator
+        self.terminator = terminator
+        self.segment_end = terminator + line_break
+        self.max_chunk_size = max_chunk_size
+        # matches the start of the INS segment of the next member, or the SE segment following the last member
+        self.member_pattern = re.compile(re.escape(terminator) + b'[\r\n]*(INS|SE)' + re.escape(separator))
+        self.chunks = []
+        self.isa = None
+        self.gs = None
+        self.header = None
+        self.split = False
+
+    @property
+    def in_transaction(self):
+        """
+            True while a transaction set has started but its SE segment has not been scanned
+        """
+        return self.header is not None
+
+    def segment(self, data, segment, position):
+        """
+            Scans a segment
+            :return: the position at which scanning continues, or None to continue with the next segment
+        """
+        identifier = segment.split(self.separator, 1)[0]
+        if identifier == b'ISA':
+            self.isa = segment.split(self.separator)
+        elif identifier == b'GS':
+            self.gs = segment.split(self.separator)
+        elif identifier == b'ST':
+            self.header = [segment]
+            self.split = False
+        elif identifier == b'INS' and self.header is not None and not self.split:
+            self.split = True
+            return self._split_members(data, position)
+        elif identifier == b'SE' and self.header is not None:
+            if not self.split:
+                # a transaction set without members is sent as it is
+                self._add_chunk(data, position, position, 0, 0)
+            self.header = None
+        elif identifier not in (b'GE', b'IEA') and self.header is not None:
+            self.header.append(segment)
+        return None
+
+    def _split_members(self, data, position):
+        """
+            Splits the members of a transaction set into chunks
+            :param position: the position of the transaction set's first INS segment
+            :return: the position of the transaction set's SE segment
+        """
+        envelope_size = self._envelope_size()
+        chunk_start = member_start = position
+        members = employees = 0
+        employee = data[position + 4:position + 5] == b'Y'
+        for match in self.member_pattern.finditer(data, position):
+            end = match.start(1)
+            # close the chunk before the member which would make it too large
+            if members and end - chunk_start + envelope_size > self.max_chunk_size:
+                self._add_chunk(data, chunk_start, member_start, members, employees)
+                chunk_start = member_start
+                members = employees = 0
+            members += 1
+            employees += employee
+            if match.group(1) == b'SE':
+                self._add_chunk(data, chunk_start, end, members, employees)
+                return end
+            member_start = end
+            employee = data[end + 4:end + 5] == b'Y'
+        raise ValueError('{0} ends within a transaction set'.format(self.x12_file.path))
+
+    def _add_chunk(self, data, start, end, members, employees):
+        index = len(self.chunks)
+        interchange_number = _control_number(self.isa[13], index, width=9)
+        group_number = _control_number(self.gs[6], index)
+        isa = list(self.isa)
+        isa[13] = interchange_number
+        gs = list(self.gs)
+        gs[6] = group_number
+
+        header = [self.separator.join(isa), self.separator.join(gs)]
+        counts = {b'TO': members, b'ET': employees, b'DT': members - employees}
+        for segment in self.header:
+            elements = segment.split(self.separator)
+            if elements[0] == b'QTY' and len(elements) > 2 and elements[1] in MEMBER_COUNT_QUALIFIERS:
+                elements[2] = str(counts[elements[1]]).encode('ascii')
+                segment = self.separator.join(elements)
+            header.append(segment)
+
+        transaction_number = self.header[0].split(self.separator)[2]
+        segment_count = len(self.header) + data[start:end].count(self.terminator) + 1
+        trailer = [
+            self.separator.join([b'SE', str(segment_count).encode('ascii'), transaction_number]),
+            self.separator.join([b'GE', b'1', group_number]),
+            self.separator.join([b'IEA', b'1', interchange_number]),
+        ]
+        self.chunks.append(X12Chunk(self.x12_file, index, self._join(header), start, end, self._join(trailer),
+                                    members))
+
+    def _envelope_size(self):
+        """
+            :return: an upper bound of the size of a chunk's envelope, header and trailer segments
+        """
+        segments = [self.separator.join(self.isa), self.separator.join(self.gs)] + self.header
+        return sum(len(segment) + len(self.segment_end) + 8 for segment in segments) + 96
+
+    def _join(self, segments):
+        return b''.join(segment + self.segment_end for segment in segments)
+
+
+def _line_break(data, position):
+    """
+        :return: the line break which follows segment terminators in a file, if any
+    """
+    line_break = b''
+    while data[position:position + 1] in (b'\r', b'\n') and len(line_break) < 2:
+        line_break += data[position:position + 1]
+        position += 1
+    return line_break
+
+
+def _control_number(number, offset, width=1):
+    """
+        :return: a control number offset from the original control number of a file, zero padded to width
+    """
+    value = (int(number) + offset) % 10 ** 9 if number.strip().isdigit() else offset + 1
+    return str(value).zfill(width).encode('ascii')
@@ -36,7 +36,11 @@ setup(
     platforms="any",
     install_requires=[
         "requests>=2.3.0", "oauthlib<0.7.0", "requests-oauthlib==0.4.1",
+        'futures>=3.0; python_version < "3.2"',
     ],
+    extras_require={
+        "async": ["aiohttp>=3.0"],
+    },
     test_suite='nose.collector',
     tests_require=["nose==1.3.7"],
     keywords=['health', 'api', 'pokitdok', 'X12', 'eligibility', 'claims', 'providers', 'prices', 'healthcare',
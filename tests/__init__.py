@@ -1,7 +1,7 @@
 import os
 
-client_id = os.environ['POKITDOK_CLIENT_ID']
-client_secret = os.environ['POKITDOK_CLIENT_SECRET']
+client_id = os.environ.get('POKITDOK_CLIENT_ID')
+client_secret = os.environ.get('POKITDOK_CLIENT_SECRET')
 
 client_settings = {
     "client_id": client_id,
@@ -0,0 +1,146 @@
+from __future__ import absolute_import
+
+import threading
+import time
+
+from pokitdok.api.activities import ActivityError, ActivityTimeout, ActivityWaiter
+
+
+class FakeActivityClient(object):
+    """
+    Stands in for a PokitDokClient, serving activity records whose states are set by the test
+    """
+    def __init__(self):
+        self.states = {}
+        self.parents = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def record(self, watched_id):
+        return {'id': watched_id, 'state': {'name': self.states[watched_id]}}
+
+    def activities(self, watched_id):
+        with self.lock:
+            self.requests.append((time.time(), watched_id))
+            return {'meta': {}, 'data': self.record(watched_id)}
+
+    def iter_activities(self, parent_id=None, prefetch=True):
+        with self.lock:
+            self.requests.append((time.time(), parent_id))
+            return [self.record(child) for child in self.parents[parent_id]]
+
+
+class TestActivityWaiter(object):
+    """
+    Validates the polling backoff, resolution and timeouts of watched activities
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def test_backoff_intervals(self):
+        client = FakeActivityClient()
+        client.states['a'] = 'scheduled'
+        waiter = ActivityWaiter(client, poll_interval=1.0, max_poll_interval=5.0, backoff=2.0)
+        waiter.watch('a', delay=60)
+        watch = waiter._watches[('activity', 'a')]
+        intervals = []
+        for poll in range(5):
+            waiter._polled(watch, [client.record('a')])
+            intervals.append(watch.interval)
+        # the first poll records the activity's state, and later polls find it unchanged
+        assert intervals == [1.0, 2.0, 4.0, 5.0, 5.0], self.ASSERTION_EQ_MSG.format([1.0, 2.0, 4.0, 5.0, 5.0],
+                                                                                     intervals)
+        client.states['a'] = 'in_progress'
+        waiter._polled(watch, [client.record('a')])
+        assert watch.interval == 1.0, 'a change of state must reset the poll interval'
+        waiter._poll_failed(watch, IOError('unreachable'))
+        assert watch.interval == 2.0, 'a failed poll must back off'
+        assert watch.next_poll > time.time() + 1.5, watch.next_poll
+        waiter.cancel()
+
+    def test_polls_back_off_until_completion(self):
+        client = FakeActivityClient()
+        client.states['a'] = 'scheduled'
+        waiter = ActivityWaiter(client, poll_interval=0.02, max_poll_interval=0.1, backoff=2.0)
+        future = waiter.watch('a')
+        time.sleep(0.5)
+        client.states['a'] = 'completed'
+        activity = future.result(timeout=2)
+        assert activity['id'] == 'a', activity
+
+        times = [requested for requested, watched_id in client.requests]
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        assert 5 <= len(times) <= 12, self.ASSERTION_EQ_MSG.format('5 to 12 polls', len(times))
+        assert gaps[2] >= 0.07, gaps
+        assert max(gaps) < 0.3, gaps
+
+    def test_timeout(self):
+        client = FakeActivityClient()
+        client.states['a'] = 'scheduled'
+        waiter = ActivityWaiter(client, poll_interval=0.05)
+        started = time.time()
+        future = waiter.watch('a', timeout=0.2)
+        try:
+            future.result(timeout=2)
+        except ActivityTimeout as error:
+            assert error.activity_id == 'a', error.activity_id
+            assert error.timeout == 0.2, error.timeout
+        else:
+            raise AssertionError('ActivityTimeout was not raised')
+        elapsed = time.time() - started
+        assert 0.2 <= elapsed < 0.5, elapsed
+        assert future.activity['state']['name'] == 'scheduled', future.activity
+
+    def test_failed_activity(self):
+        client = FakeActivityClient()
+        client.states['a'] = 'failed'
+        future = ActivityWaiter(client, poll_interval=0.01).watch('a')
+        try:
+            future.result(timeout=2)
+        except ActivityError:
+            pass
+        else:
+            raise AssertionError('ActivityError was not raised')
+
+    def test_children_share_a_poll(self):
+        client = FakeActivityClient()
+        client.parents['parent'] = ['a', 'b', 'c']
+        for child in client.parents['parent']:
+            client.states[child] = 'scheduled'
+        waiter = ActivityWaiter(client, poll_interval=0.01, max_poll_interval=0.02)
+        futures = waiter.watch_children('parent', delay=0)
+        time.sleep(0.1)
+        for child in client.parents['parent']:
+            client.states[child] = 'completed'
+        results = [future.result(timeout=2)['id'] for future in futures]
+        assert results == ['a', 'b', 'c'], results
+        polled = set(watched_id for requested, watched_id in client.requests)
+        assert polled == set(['parent']), polled
+
+    def test_resolve(self):
+        client = FakeActivityClient()
+        client.states['a'] = 'scheduled'
+        waiter = ActivityWaiter(client)
+        future = waiter.watch('a', delay=60)
+        assert waiter.resolve({'id': 'a', 'state': {'name': 'completed'}})
+        assert future.result(timeout=0)['id'] == 'a'
+        assert not waiter.resolve({'id': 'unknown', 'state': {'name': 'completed'}})
+        assert client.requests == [], client.requests
+
+    def test_missing_activity_id(self):
+        client = FakeActivityClient()
+        waiter = ActivityWaiter(client)
+        for activity in (None, '', {'meta': {}, 'data': {'errors': {'query': 'invalid'}}}):
+            try:
+                waiter.watch(activity)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError('ValueError was not raised for {0!r}'.format(activity))
+        try:
+            waiter.watch_children({'meta': {}, 'data': {}})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError was not raised')
+        assert waiter._watches == {}, waiter._watches
+        assert client.requests == [], client.requests
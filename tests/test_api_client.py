@@ -2,8 +2,13 @@ from __future__ import absolute_import
 
 import pokitdok
 import copy
+import tempfile
+from unittest import SkipTest
 from tests import client_settings
 
+if not client_settings['client_id'] or not client_settings['client_secret']:
+    raise SkipTest('POKITDOK_CLIENT_ID and POKITDOK_CLIENT_SECRET are required for API client tests')
+
 
 
 class TestAPIClient(object):
@@ -63,6 +68,19 @@ class TestAPIClient(object):
         third_token = copy.deepcopy(self.pd_client.token)
         assert third_token not in [first_token, second_token], "The tokens are not unique"
 
+    def test_connect_token_store(self):
+        """
+            Tests pokitdok.api.connect (PokitDok.__init__()) with a shared token store
+            Validates that clients sharing a token store reuse a single access token
+        """
+        token_store = pokitdok.api.FileTokenStore(tempfile.mkdtemp())
+        first_client = pokitdok.api.connect(token_store=token_store, **client_settings)
+        second_client = pokitdok.api.connect(token_store=token_store, **client_settings)
+        assert first_client.token == second_client.token, "The tokens do not match"
+
+        response = second_client.activities()
+        assert response["meta"] is not None, "The meta section is unexpectedly empty. Full reponse: {}" .format(str(response))
+
     #
     # ******************************
     # error tests
@@ -354,6 +372,31 @@ class TestAPIClient(object):
         response = self.pd_client.eligibility(request)
         self.assert_helper(response, 200)
 
+    def test_eligibility_many(self):
+        """
+        X12 API Convenience function test: eligibility_many
+        submits a batch of eligibility requests, one of which is invalid
+        """
+        request = {
+            "member": {
+                "birth_date": "1970-01-25",
+                "first_name": "Jane",
+                "last_name": "Doe",
+                "id": "W000000000"
+            },
+            "provider": {
+                "first_name": "JEROME",
+                "last_name": "AYA-AY",
+                "npi": "1467560003"
+            },
+            "trading_partner_id": "MOCKPAYER"
+        }
+        responses = self.pd_client.eligibility_many([request, "bad request", request], max_concurrency=2)
+        assert len(responses) == 3, self.ASSERTION_EQ_MSG.format(3, len(responses))
+        assert "errors" not in responses[0]["data"], str(responses[0])
+        assert "errors" in responses[1]["data"], str(responses[1])
+        assert "errors" not in responses[2]["data"], str(responses[2])
+
     def test_referrals(self):
         """
         X12 API Convenience function test: referrals
@@ -522,6 +565,21 @@ class TestAPIClient(object):
         assert type(response["data"]) is dict, self.ASSERTION_EQ_MSG.format("dict", type(response["data"]))
         assert type(response["meta"]) is dict, self.ASSERTION_EQ_MSG.format("dict", type(response["meta"]))
 
+    def test_trading_partners_cached(self):
+        """
+        Data API Convenience function test: trading_partners with a response cache
+        validates that repeated requests are served from the cache
+        """
+        cache = pokitdok.api.ResponseCache()
+        self.pd_client = pokitdok.api.connect(response_cache=cache, **client_settings)
+        first_response = self.pd_client.trading_partners('aetna')
+        self.assert_helper(first_response, 200)
+        second_response = self.pd_client.trading_partners('aetna')
+        self.assert_helper(second_response, 200)
+        assert first_response == second_response, self.ASSERTION_EQ_MSG.format(first_response, second_response)
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1, str(stats)
+
     #
     # ******************************
     # Pharmacy API Convenience Functions
@@ -0,0 +1,47 @@
+from __future__ import absolute_import
+
+import sys
+from unittest import SkipTest
+
+from pokitdok.api.stand_in import StandInServer
+
+if sys.version_info < (3, 6):
+    raise SkipTest('AsyncPokitDokClient requires Python 3.6 or later')
+
+import asyncio
+from pokitdok.api.async_client import AsyncPokitDokClient
+
+
+class TestAsyncCallState(object):
+    """
+    Validates that status_code and last_response describe the calling task's last request, and the client's last
+    request when read outside of it
+    """
+    def test_last_call(self):
+        with StandInServer() as server:
+            server.set_response('trading_partners', lambda method, resource_id, data: {'id': resource_id})
+            client = AsyncPokitDokClient('client', 'secret', base=server.url)
+            loop = asyncio.new_event_loop()
+
+            async def trading_partner(trading_partner_id):
+                await client.trading_partners(trading_partner_id)
+                await asyncio.sleep(0.05)
+                # requests made by other tasks in the meantime do not change the task's last response
+                return client.last_response.body['data']['id']
+
+            async def gather():
+                return await asyncio.gather(trading_partner('MOCKPAYER'), trading_partner('OTHERPAYER'))
+
+            try:
+                assert client.status_code == 0, client.status_code
+                assert client.last_response is None
+                loop.run_until_complete(client.providers('1467560003'))
+                assert client.status_code == 200, client.status_code
+                assert client.last_response.body['data']['id'] == '1467560003', client.last_response.body
+
+                results = loop.run_until_complete(gather())
+                assert results == ['MOCKPAYER', 'OTHERPAYER'], results
+                assert client.last_response.body['data']['id'] in results, client.last_response.body
+            finally:
+                loop.run_until_complete(client.close())
+                loop.close()
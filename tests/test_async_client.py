@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import sys
+from unittest import SkipTest
+
+import pokitdok
+from tests import client_settings
+
+if sys.version_info < (3, 6):
+    raise SkipTest('AsyncPokitDokClient requires Python 3.6 or later')
+if not client_settings['client_id'] or not client_settings['client_secret']:
+    raise SkipTest('POKITDOK_CLIENT_ID and POKITDOK_CLIENT_SECRET are required for API client tests')
+
+import asyncio
+
+
+class TestAsyncAPIClient(object):
+    """
+    Validates that asyncio PokitDok API client requests are well formed.
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def __init__(self):
+        """
+            Defines instance attributes used in test cases
+            - loop = The event loop used to run client coroutines
+        """
+        self.loop = asyncio.new_event_loop()
+
+    def run(self, coroutine):
+        """
+        runs a coroutine to completion on the test event loop
+        """
+        return self.loop.run_until_complete(coroutine)
+
+    def assert_helper(self, pd_client, response, status_code):
+        """
+        helper function for assert statement pattern
+        :param pd_client: the client which submitted the request
+        :param response: the payload to test
+        :param status_code: the expected status code
+        """
+        assert response["meta"] is not None, "The meta section is unexpectedly empty. Full reponse: {}" .format(str(response))
+        assert response["data"] is not None, "The data section is unexpectedly empty. Full reponse: {}" .format(str(response))
+        assert pd_client.status_code == status_code, str(response)
+
+    def test_connect(self):
+        """
+        tests that the access token is fetched on first use rather than during construction
+        """
+        pd_client = pokitdok.api.AsyncPokitDokClient(**client_settings)
+        assert pd_client.token is None, "The access token was fetched during construction."
+        token = self.run(pd_client.fetch_access_token())
+        assert token is not None, "The access token was not fetched."
+        self.run(pd_client.close())
+
+    def test_concurrent_eligibility(self):
+        """
+        Submits concurrent eligibility requests from a single client
+        """
+        pd_client = pokitdok.api.AsyncPokitDokClient(**client_settings)
+        request = {
+            "member": {
+                "birth_date": "1970-01-25",
+                "first_name": "Jane",
+                "last_name": "Doe",
+                "id": "W000000000"
+            },
+            "provider": {
+                "first_name": "JEROME",
+                "last_name": "AYA-AY",
+                "npi": "1467560003"
+            },
+            "trading_partner_id": "MOCKPAYER"
+        }
+        responses = self.run(asyncio.gather(*[pd_client.eligibility(request) for _ in range(5)]))
+        for response in responses:
+            self.assert_helper(pd_client, response, 200)
+        self.run(pd_client.close())
+
+    def test_trading_partners(self):
+        """
+        Data API Convenience function test: trading_partners
+        """
+        pd_client = pokitdok.api.AsyncPokitDokClient(**client_settings)
+        response = self.run(pd_client.trading_partners('aetna'))
+        self.assert_helper(pd_client, response, 200)
+        assert type(response["data"]) is dict, self.ASSERTION_EQ_MSG.format("dict", type(response["data"]))
+        self.run(pd_client.close())
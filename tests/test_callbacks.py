@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+
+import json
+import socket
+import threading
+
+import pokitdok
+from pokitdok.api.callbacks import CallbackReceiver
+
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError
+
+
+class TestCallbackReceiver(object):
+    """
+    Validates that activity callbacks resolve watched activities, whichever arrives first
+    """
+    def create_client(self, receiver):
+        # the activities are never polled, since poll_after outlasts the tests
+        return pokitdok.api.connect('client', 'secret', base='http://stub.invalid', lazy=True,
+                                    callback_receiver=receiver)
+
+    def test_callback_after_watch(self):
+        receiver = CallbackReceiver(poll_after=3600)
+        client = self.create_client(receiver)
+        future = client.watch_activity('a')
+        assert receiver.receive({'id': 'a', 'state': {'name': 'completed'}})
+        assert future.result(timeout=0)['id'] == 'a'
+        assert receiver._watched == {}, 'finished activities must stop being watched'
+
+    def test_callback_before_watch(self):
+        receiver = CallbackReceiver(poll_after=3600)
+        client = self.create_client(receiver)
+        assert not receiver.receive({'meta': {'activity_id': 'a'}, 'data': {'result': 'ok'}})
+        future = client.watch_activity('a')
+        activity = future.result(timeout=0)
+        assert activity['callback']['data'] == {'result': 'ok'}, activity
+        assert receiver._unmatched == {}, receiver._unmatched
+
+    def test_concurrent_callbacks_and_watches(self):
+        receiver = CallbackReceiver(poll_after=3600)
+        client = self.create_client(receiver)
+        count = 300
+        futures = [None] * count
+        barriers = [threading.Event() for index in range(count)]
+
+        def watch():
+            for index in range(count):
+                barriers[index].wait()
+                futures[index] = client.watch_activity(str(index))
+
+        def receive():
+            for index in range(count):
+                barriers[index].set()
+                receiver.receive({'id': str(index), 'state': {'name': 'completed'}})
+
+        threads = [threading.Thread(target=watch), threading.Thread(target=receive)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        resolved = [future.result(timeout=1)['id'] for future in futures]
+        assert resolved == [str(index) for index in range(count)]
+        assert receiver.received == count, receiver.received
+        assert receiver._unmatched == {}, receiver._unmatched
+        client.activity_waiter.cancel()
+
+    def test_unmatched_limit(self):
+        receiver = CallbackReceiver(max_unmatched=2)
+        for index in range(3):
+            receiver.receive({'id': str(index), 'state': {'name': 'completed'}})
+        assert list(receiver._unmatched) == ['1', '2'], list(receiver._unmatched)
+
+    def test_http_callbacks(self):
+        receiver = CallbackReceiver(poll_after=3600).start()
+        try:
+            # only local connections are accepted unless another host is given
+            assert receiver.server.server_address[0] == '127.0.0.1', receiver.server.server_address
+            assert receiver.callback_url.startswith('http://127.0.0.1:'), receiver.callback_url
+            client = self.create_client(receiver)
+            future = client.watch_activity('a')
+            body = json.dumps({'id': 'a', 'state': {'name': 'completed'}}).encode('utf-8')
+            headers = {'Content-Type': 'application/json'}
+
+            try:
+                urlopen(Request(receiver.callback_url.replace(receiver.secret, 'wrong'), body, headers))
+            except HTTPError as error:
+                assert error.code == 403, error.code
+            else:
+                raise AssertionError('A callback without the secret was accepted')
+            assert not future.done()
+
+            try:
+                urlopen(Request(receiver.callback_url.replace(receiver.secret, '%C3%A9'), body, headers))
+            except HTTPError as error:
+                assert error.code == 403, error.code
+            else:
+                raise AssertionError('A callback with a non-ASCII secret was accepted')
+            assert not future.done()
+
+            response = urlopen(Request(receiver.callback_url, body, headers))
+            assert response.getcode() == 200, response.getcode()
+            assert future.result(timeout=1)['id'] == 'a'
+            assert receiver.rejected == 2, receiver.rejected
+        finally:
+            receiver.stop()
+
+    def post_raw(self, receiver, content_length, body=b''):
+        url = receiver.callback_url[len('http://{0}:{1}'.format(receiver.host, receiver.port)):]
+        connection = socket.create_connection((receiver.host, receiver.port), timeout=5)
+        try:
+            connection.sendall('POST {0} HTTP/1.0\r\nContent-Length: {1}\r\n\r\n'.format(url, content_length)
+                               .encode('ascii') + body)
+            return int(connection.makefile('rb').readline().split()[1])
+        finally:
+            connection.close()
+
+    def test_body_limits(self):
+        receiver = CallbackReceiver(max_body_size=100).start()
+        try:
+            body = json.dumps({'id': 'a', 'state': {'name': 'completed'}}).encode('utf-8')
+            assert self.post_raw(receiver, len(body), body) == 200
+            # the body is not read when it is declared too large
+            assert self.post_raw(receiver, 10 ** 12) == 413
+            assert self.post_raw(receiver, 101, b'x' * 101) == 413
+            assert self.post_raw(receiver, 'abc') == 400
+            assert self.post_raw(receiver, -1) == 400
+            assert receiver.received == 1, receiver.received
+        finally:
+            receiver.stop()
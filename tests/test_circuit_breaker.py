@@ -0,0 +1,148 @@
+from __future__ import absolute_import
+
+import time
+
+from pokitdok.api import circuit_breaker
+from pokitdok.api.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module used by the circuit breaker, so that tests control the passing of time
+    """
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+class TestCircuitBreaker(object):
+    """
+    Validates the state transitions of circuits
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def setup_method(self, method=None):
+        self.clock = FakeClock()
+        circuit_breaker.time = self.clock
+
+    def teardown_method(self, method=None):
+        circuit_breaker.time = time
+
+    # nose runs setup and teardown rather than the pytest method names
+    setup = setup_method
+    teardown = teardown_method
+
+    def create_breaker(self, **kwargs):
+        settings = {'failure_rate': 0.5, 'min_requests': 4, 'window': 10, 'open_duration': 5}
+        settings.update(kwargs)
+        return CircuitBreaker(**settings)
+
+    def request(self, circuit, failed, duration=0.1):
+        circuit.record(circuit.before_request(), failed, duration)
+
+    def assert_open(self, circuit):
+        try:
+            circuit.before_request()
+        except CircuitOpenError as error:
+            return error
+        raise AssertionError('CircuitOpenError was not raised')
+
+    def open_circuit(self, circuit):
+        for request in range(4):
+            self.request(circuit, True)
+        assert circuit.state == OPEN, self.ASSERTION_EQ_MSG.format(OPEN, circuit.state)
+
+    def test_closed_to_open(self):
+        circuit = self.create_breaker().circuit('eligibility', 'MOCKPAYER')
+        self.request(circuit, True)
+        self.request(circuit, True)
+        self.request(circuit, False)
+        assert circuit.state == CLOSED, 'a circuit must not open before min_requests'
+        self.request(circuit, True)
+        assert circuit.state == OPEN, self.ASSERTION_EQ_MSG.format(OPEN, circuit.state)
+        error = self.assert_open(circuit)
+        assert error.retry_after == 5, error.retry_after
+        assert error.trading_partner_id == 'MOCKPAYER', error.trading_partner_id
+
+    def test_failures_outside_the_window(self):
+        circuit = self.create_breaker().circuit('eligibility')
+        for request in range(3):
+            self.request(circuit, True)
+        self.clock.now += 20
+        self.request(circuit, True)
+        assert circuit.state == CLOSED, self.ASSERTION_EQ_MSG.format(CLOSED, circuit.state)
+
+    def test_slow_requests(self):
+        circuit = self.create_breaker(slow_rate=0.5, slow_duration=2).circuit('claims')
+        for request in range(4):
+            self.request(circuit, False, duration=3)
+        assert circuit.state == OPEN, self.ASSERTION_EQ_MSG.format(OPEN, circuit.state)
+
+    def test_open_to_half_open_to_closed(self):
+        breaker = self.create_breaker(half_open_requests=2)
+        circuit = breaker.circuit('eligibility')
+        self.open_circuit(circuit)
+        self.clock.now += 5
+        first = circuit.before_request()
+        assert circuit.state == HALF_OPEN, self.ASSERTION_EQ_MSG.format(HALF_OPEN, circuit.state)
+        second = circuit.before_request()
+        self.assert_open(circuit)
+        assert breaker.states() == {('eligibility', None): HALF_OPEN}, breaker.states()
+        circuit.record(first, False, 0.1)
+        assert circuit.state == HALF_OPEN, self.ASSERTION_EQ_MSG.format(HALF_OPEN, circuit.state)
+        circuit.record(second, False, 0.1)
+        assert circuit.state == CLOSED, self.ASSERTION_EQ_MSG.format(CLOSED, circuit.state)
+        assert breaker.states() == {}, breaker.states()
+
+    def test_half_open_to_open(self):
+        circuit = self.create_breaker().circuit('eligibility')
+        self.open_circuit(circuit)
+        self.clock.now += 5
+        self.request(circuit, True)
+        assert circuit.state == OPEN, self.ASSERTION_EQ_MSG.format(OPEN, circuit.state)
+        error = self.assert_open(circuit)
+        assert error.retry_after == 5, error.retry_after
+
+    def test_release_returns_a_trial(self):
+        circuit = self.create_breaker().circuit('eligibility')
+        self.open_circuit(circuit)
+        self.clock.now += 5
+        circuit.release(circuit.before_request())
+        assert circuit.state == HALF_OPEN, self.ASSERTION_EQ_MSG.format(HALF_OPEN, circuit.state)
+        self.request(circuit, False)
+        assert circuit.state == CLOSED, self.ASSERTION_EQ_MSG.format(CLOSED, circuit.state)
+
+    def test_stale_results_do_not_decide_half_open(self):
+        circuit = self.create_breaker().circuit('eligibility')
+        stale = [circuit.before_request() for request in range(4)]
+        self.open_circuit(circuit)
+        self.clock.now += 5
+        trial = circuit.before_request()
+        assert circuit.state == HALF_OPEN, self.ASSERTION_EQ_MSG.format(HALF_OPEN, circuit.state)
+
+        # requests admitted while the circuit was closed finish during the trial
+        circuit.record(stale[0], False, 0.1)
+        assert circuit.state == HALF_OPEN, 'a stale success must not close the circuit'
+        circuit.record(stale[1], True, 0.1)
+        assert circuit.state == HALF_OPEN, 'a stale failure must not open the circuit'
+        circuit.release(stale[2])
+        self.assert_open(circuit)
+
+        circuit.record(trial, False, 0.1)
+        assert circuit.state == CLOSED, self.ASSERTION_EQ_MSG.format(CLOSED, circuit.state)
+        circuit.record(stale[3], True, 0.1)
+        for request in range(3):
+            self.request(circuit, True)
+        assert circuit.state == CLOSED, 'stale failures must not count towards opening a closed circuit'
+        self.request(circuit, True)
+        assert circuit.state == OPEN, self.ASSERTION_EQ_MSG.format(OPEN, circuit.state)
+
+    def test_circuits_per_trading_partner(self):
+        breaker = self.create_breaker()
+        self.open_circuit(breaker.circuit('eligibility', 'MOCKPAYER'))
+        circuit = breaker.circuit('eligibility', 'OTHERPAYER')
+        self.request(circuit, False)
+        assert circuit.state == CLOSED, self.ASSERTION_EQ_MSG.format(CLOSED, circuit.state)
+        assert breaker.circuit('eligibility', 'MOCKPAYER') is breaker.circuit('eligibility', 'MOCKPAYER')
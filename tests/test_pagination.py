@@ -0,0 +1,63 @@
+from __future__ import absolute_import
+
+import pokitdok
+from pokitdok.api.pagination import iter_records
+from pokitdok.api.stand_in import StandInServer
+
+# records without ids, as returned by listings such as provider searches
+RECORDS = [{'provider': {'npi': str(1467560003 + index)}} for index in range(25)]
+
+
+class FakeListing(object):
+    """
+    Serves pages of RECORDS, ignoring the offset when ignore_offset is set
+    """
+    def __init__(self, ignore_offset=False):
+        self.ignore_offset = ignore_offset
+        self.requests = []
+
+    def fetch_page(self, **params):
+        self.requests.append(params)
+        if len(self.requests) > 10:
+            raise AssertionError('The listing was requested {0} times'.format(len(self.requests)))
+        offset = 0 if self.ignore_offset else int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 10)
+        return {'meta': {}, 'data': RECORDS[offset:offset + limit]}
+
+
+class TestIterRecords(object):
+    """
+    Validates that listings are iterated across their pages, and that pages repeated by the platform end iteration
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def test_pages_without_ids(self):
+        for prefetch in (False, True):
+            listing = FakeListing()
+            records = list(iter_records(listing.fetch_page, {}, prefetch=prefetch))
+            assert records == RECORDS, self.ASSERTION_EQ_MSG.format(RECORDS, records)
+            assert len(listing.requests) == 3, listing.requests
+
+    def test_offset_ignored(self):
+        for prefetch in (False, True):
+            listing = FakeListing(ignore_offset=True)
+            records = list(iter_records(listing.fetch_page, {'limit': 10}, prefetch=prefetch))
+            assert records == RECORDS[:10], self.ASSERTION_EQ_MSG.format(RECORDS[:10], records)
+            assert len(listing.requests) == 2, listing.requests
+
+    def test_stand_in_server_ignoring_offset(self):
+        with StandInServer() as server:
+            requests = []
+
+            def providers(method, resource_id, data):
+                # an empty page ends iteration, should repeated pages not be detected
+                requests.append(data)
+                return RECORDS[:10] if len(requests) <= 10 else []
+
+            server.set_response('providers', providers)
+            client = pokitdok.api.connect('client', 'secret', base=server.url)
+            for prefetch in (False, True):
+                records = list(client.iter_providers(zipcode='94401', prefetch=prefetch))
+                assert records == RECORDS[:10], self.ASSERTION_EQ_MSG.format(RECORDS[:10], records)
+            statuses = server.stats()['requests']['providers']
+            assert statuses == {200: 4}, self.ASSERTION_EQ_MSG.format({200: 4}, statuses)
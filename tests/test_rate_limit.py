@@ -0,0 +1,125 @@
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import time
+
+from pokitdok.api import rate_limit
+from pokitdok.api.rate_limit import RateLimiter, RateLimitExceeded
+from pokitdok.api.token_store import FileTokenStore
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module used by the rate limiter, so that tests control the passing of time
+    """
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(object):
+    """
+    Validates the token bucket refill and blocking behavior of the rate limiter
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def setup_method(self, method=None):
+        self.clock = FakeClock()
+        rate_limit.time = self.clock
+
+    def teardown_method(self, method=None):
+        rate_limit.time = time
+
+    # nose runs setup and teardown rather than the pytest method names
+    setup = setup_method
+    teardown = teardown_method
+
+    def allowed(self, limiter, endpoint, requests):
+        count = 0
+        for request in range(requests):
+            try:
+                limiter.reserve(endpoint, block=False)
+                count += 1
+            except RateLimitExceeded:
+                pass
+        return count
+
+    def test_burst_and_refill(self):
+        limiter = RateLimiter({'eligibility': (4, 8)}, block=False)
+        assert self.allowed(limiter, 'eligibility', 20) == 8
+        self.clock.now += 0.5
+        allowed = self.allowed(limiter, 'eligibility', 20)
+        assert allowed == 2, self.ASSERTION_EQ_MSG.format(2, allowed)
+        self.clock.now += 0.1
+        assert self.allowed(limiter, 'eligibility', 1) == 0
+
+    def test_refill_is_capped_at_burst(self):
+        limiter = RateLimiter({'eligibility': (4, 8)}, block=False)
+        assert self.allowed(limiter, 'eligibility', 8) == 8
+        self.clock.now += 3600
+        allowed = self.allowed(limiter, 'eligibility', 100)
+        assert allowed == 8, self.ASSERTION_EQ_MSG.format(8, allowed)
+
+    def test_retry_after(self):
+        limiter = RateLimiter({'claims': 2}, block=False)
+        self.allowed(limiter, 'claims', 2)
+        self.clock.now += 0.25
+        try:
+            limiter.reserve('claims_status')
+        except RateLimitExceeded as error:
+            assert error.group == 'claims', error.group
+            assert abs(error.retry_after - 0.25) < 1e-9, error.retry_after
+        else:
+            raise AssertionError('RateLimitExceeded was not raised')
+
+    def test_blocking_requests_proceed_in_turn(self):
+        limiter = RateLimiter({'eligibility': (10, 1)})
+        waits = [limiter.reserve('eligibility') for request in range(4)]
+        expected = [0, 0.1, 0.2, 0.3]
+        assert all(abs(wait - value) < 1e-9 for wait, value in zip(waits, expected)), \
+            self.ASSERTION_EQ_MSG.format(expected, waits)
+
+    def test_acquire_waits(self):
+        limiter = RateLimiter({'eligibility': (10, 1)})
+        start = self.clock.now
+        for request in range(5):
+            limiter.acquire('eligibility')
+        elapsed = self.clock.now - start
+        assert abs(elapsed - 0.4) < 1e-9, self.ASSERTION_EQ_MSG.format(0.4, elapsed)
+
+    def test_max_wait(self):
+        limiter = RateLimiter({'eligibility': (1, 1)}, max_wait=1.5)
+        assert limiter.reserve('eligibility') == 0
+        assert limiter.reserve('eligibility') == 1
+        try:
+            limiter.reserve('eligibility')
+        except RateLimitExceeded as error:
+            assert error.retry_after == 2, error.retry_after
+        else:
+            raise AssertionError('RateLimitExceeded was not raised')
+
+    def test_groups(self):
+        limiter = RateLimiter({'claims': 1}, default_rate=None, groups={'x12': 'claims'}, block=False)
+        assert self.allowed(limiter, 'claims_convert', 1) == 1
+        assert self.allowed(limiter, 'x12', 1) == 0
+        assert self.allowed(limiter, 'providers', 100) == 100
+        assert limiter.group(None) == 'default'
+
+    def test_shared_file_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            limiters = [RateLimiter({'eligibility': 3}, block=False, store=FileTokenStore(directory))
+                        for limiter in range(3)]
+            allowed = sum(self.allowed(limiter, 'eligibility', 3) for limiter in limiters)
+            assert allowed == 3, self.ASSERTION_EQ_MSG.format(3, allowed)
+            self.clock.now += 1
+            allowed = sum(self.allowed(limiter, 'eligibility', 3) for limiter in limiters)
+            assert allowed == 3, self.ASSERTION_EQ_MSG.format(3, allowed)
+        finally:
+            shutil.rmtree(directory)
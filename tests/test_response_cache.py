@@ -0,0 +1,41 @@
+from __future__ import absolute_import
+
+import pokitdok
+from pokitdok.api.stand_in import StandInServer
+
+
+class TestResponseCache(object):
+    """
+    Validates which responses are cached by default
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def test_provider_lookups(self):
+        with StandInServer() as server:
+            cache = pokitdok.api.ResponseCache()
+            client = pokitdok.api.connect('client', 'secret', base=server.url, response_cache=cache)
+            first = client.providers(npi='1467560003')
+            second = client.providers(npi='1467560003')
+            assert first == second, self.ASSERTION_EQ_MSG.format(first, second)
+            assert client.last_response.cached
+            statuses = server.stats()['requests']['providers']
+            assert statuses == {200: 1}, self.ASSERTION_EQ_MSG.format({200: 1}, statuses)
+
+            client.providers(npi='1881692002')
+            assert server.stats()['requests']['providers'] == {200: 2}
+
+    def test_provider_searches(self):
+        with StandInServer() as server:
+            cache = pokitdok.api.ResponseCache()
+            client = pokitdok.api.connect('client', 'secret', base=server.url, response_cache=cache)
+            for search in range(2):
+                client.providers(zipcode='94401', radius='10mi')
+            statuses = server.stats()['requests']['providers']
+            assert statuses == {200: 2}, self.ASSERTION_EQ_MSG.format({200: 2}, statuses)
+            assert cache.stats()['size'] == 0, cache.stats()
+
+            cache = pokitdok.api.ResponseCache(ttls={'providers': 60})
+            client = pokitdok.api.connect('client', 'secret', base=server.url, response_cache=cache)
+            for search in range(2):
+                client.providers(zipcode='94401', radius='10mi')
+            assert server.stats()['requests']['providers'] == {200: 3}
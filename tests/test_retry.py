@@ -0,0 +1,122 @@
+from __future__ import absolute_import
+
+import time
+from email.utils import formatdate
+
+import pokitdok
+from pokitdok.api.retry import RetryBudget, RetryPolicy, parse_retry_after
+from pokitdok.api.stand_in import StandInServer
+
+
+class TestRetryAfter(object):
+    """
+    Validates that Retry-After header values are parsed
+    """
+    def test_seconds(self):
+        assert parse_retry_after('2') == 2.0
+        assert parse_retry_after('0.25') == 0.25
+        assert parse_retry_after('-3') == 0.0
+
+    def test_http_date(self):
+        delay = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        assert 28 <= delay <= 30, delay
+        assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+    def test_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('') is None
+        assert parse_retry_after('soon') is None
+
+
+class TestRetryPolicy(object):
+    """
+    Validates which failed requests are retried and how long each retry waits
+    """
+    def create_policy(self, **kwargs):
+        kwargs.setdefault('budget', RetryBudget(min_per_second=0, capacity=100))
+        return RetryPolicy(**kwargs)
+
+    def test_retry_after_is_honored(self):
+        policy = self.create_policy(backoff_base=0.1, backoff_max=0.2)
+        delay = policy.retry_delay(1, 0, 'get', 'providers', 503, {'Retry-After': '5'})
+        assert delay == 5.0, delay
+        delay = policy.retry_delay(1, 0, 'get', 'providers', 503, {'Retry-After': '0'})
+        assert 0.1 <= delay <= 0.2, delay
+
+    def test_long_retry_after_is_returned(self):
+        policy = self.create_policy(max_retry_after=10)
+        assert policy.retry_delay(1, 0, 'get', 'providers', 429, {'Retry-After': '11'}) is None
+        assert policy.budget._balance == 100, 'a request which is not retried must not spend the budget'
+
+    def test_statuses_and_attempts(self):
+        policy = self.create_policy(max_attempts=3)
+        assert policy.retry_delay(1, 0, 'get', 'providers', 500, {}) is None
+        assert policy.retry_delay(1, 0, 'get', 'providers', 502, {}) is not None
+        assert policy.retry_delay(2, 0.5, 'get', 'providers', 504, {}) is not None
+        assert policy.retry_delay(3, 0.5, 'get', 'providers', 504, {}) is None
+
+    def test_idempotency(self):
+        policy = self.create_policy()
+        assert policy.retry_delay(1, 0, 'post', 'claims', 503, {}) is None
+        assert policy.retry_delay(1, 0, 'post', 'claims', 429, {}) is not None
+        assert policy.retry_delay(1, 0, 'post', 'claims', None, None, sent=False) is not None
+        assert policy.retry_delay(1, 0, 'post', 'eligibility', 503, {}) is not None
+
+    def test_backoff_bounds(self):
+        policy = self.create_policy(backoff_base=0.5, backoff_max=4.0)
+        delay = 0
+        for attempt in range(50):
+            next_delay = policy.backoff(delay)
+            assert 0.5 <= next_delay <= min(4.0, max(0.5, delay * 3)), (delay, next_delay)
+            delay = next_delay
+
+
+class TestRetryBudget(object):
+    """
+    Validates that retries are limited to a share of the requests made
+    """
+    def test_budget_accounting(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=2)
+        assert budget.withdraw()
+        assert budget.withdraw()
+        assert not budget.withdraw()
+        budget.record_request()
+        assert not budget.withdraw()
+        budget.record_request()
+        assert budget.withdraw()
+        assert not budget.withdraw()
+
+    def test_capacity(self):
+        budget = RetryBudget(ratio=1, min_per_second=0, capacity=3)
+        for request in range(10):
+            budget.record_request()
+        retries = sum(1 for retry in range(10) if budget.withdraw())
+        assert retries == 3, retries
+
+    def test_exhausted_budget_stops_retries(self):
+        policy = RetryPolicy(budget=RetryBudget(min_per_second=0, capacity=1))
+        assert policy.retry_delay(1, 0, 'get', 'providers', 503, {}) is not None
+        assert policy.retry_delay(1, 0, 'get', 'providers', 503, {}) is None
+
+    def test_min_per_second(self):
+        budget = RetryBudget(ratio=0, min_per_second=100, capacity=1)
+        assert budget.withdraw()
+        time.sleep(0.05)
+        assert budget.withdraw()
+
+
+class TestClientRetries(object):
+    """
+    Validates that the client retries rate limited requests against a stand-in platform
+    """
+    def test_rate_limited_requests_are_retried(self):
+        with StandInServer(rate_limit=20) as server:
+            policy = RetryPolicy(max_attempts=10, backoff_base=0.01, backoff_max=0.1,
+                                 budget=RetryBudget(min_per_second=0, capacity=100))
+            client = pokitdok.api.connect('client', 'secret', base=server.url, retry_policy=policy)
+            for request in range(40):
+                response = client.providers('1467560003')
+                assert client.status_code == 200, response
+            statuses = server.stats()['requests']['providers']
+            assert statuses[200] == 40, statuses
+            assert statuses.get(429, 0) > 0, statuses
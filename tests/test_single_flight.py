@@ -0,0 +1,118 @@
+from __future__ import absolute_import
+
+import threading
+import time
+
+import pokitdok
+from pokitdok.api.single_flight import SingleFlight
+from pokitdok.api.stand_in import StandInServer
+
+THREADS = 16
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out waiting for the condition')
+        time.sleep(0.001)
+
+
+class TestSingleFlight(object):
+    """
+    Validates that concurrent calls with the same key are coalesced
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def run_threads(self, target):
+        results = [None] * THREADS
+        threads = [threading.Thread(target=lambda index=index: results.__setitem__(index, target()))
+                   for index in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_one_result(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        def func():
+            calls.append(1)
+            # hold the call open until every other thread is waiting for it
+            wait_for(lambda: single_flight.coalesced == THREADS - 1)
+            return object()
+
+        results = self.run_threads(lambda: single_flight.do('key', func))
+        assert len(calls) == 1, self.ASSERTION_EQ_MSG.format(1, len(calls))
+        assert single_flight.coalesced == THREADS - 1, single_flight.coalesced
+        assert all(result is results[0] for result in results)
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+
+        def func():
+            wait_for(lambda: single_flight.coalesced == THREADS - 1)
+            raise ValueError('failed')
+
+        def call():
+            try:
+                single_flight.do('key', func)
+            except ValueError as error:
+                return str(error)
+
+        results = self.run_threads(call)
+        assert results == ['failed'] * THREADS, results
+
+    def test_finished_calls_run_again(self):
+        single_flight = SingleFlight()
+        results = [single_flight.do('key', object) for call in range(3)]
+        assert len(set(id(result) for result in results)) == 3
+        assert single_flight.coalesced == 0, single_flight.coalesced
+
+    def test_different_keys_are_not_coalesced(self):
+        single_flight = SingleFlight()
+        started = []
+
+        def func(index):
+            started.append(index)
+            wait_for(lambda: len(started) == THREADS)
+            return index
+
+        lock = threading.Lock()
+        keys = iter(range(THREADS))
+
+        def call():
+            with lock:
+                key = next(keys)
+            return single_flight.do(key, lambda: func(key))
+
+        results = self.run_threads(call)
+        assert sorted(results) == list(range(THREADS)), results
+        assert single_flight.coalesced == 0, single_flight.coalesced
+
+
+class TestClientCoalescing(object):
+    """
+    Validates that identical GET requests made by threads sharing a client are sent once
+    """
+    def test_identical_requests(self):
+        with StandInServer(latency=0.5) as server:
+            client = pokitdok.api.connect('client', 'secret', base=server.url, coalesce_requests=True)
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(client.providers('1467560003')))
+                       for thread in range(THREADS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert len(results) == THREADS, len(results)
+            assert all(result == results[0] for result in results)
+            statuses = server.stats()['requests']['providers']
+            assert statuses == {200: 1}, statuses
+            assert client.single_flight.coalesced == THREADS - 1, client.single_flight.coalesced
+
+            client.providers('1467560003', zipcode='94401')
+            assert server.stats()['requests']['providers'] == {200: 2}
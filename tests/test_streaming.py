@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import json
+
+from pokitdok.api.exceptions import APIError
+from pokitdok.api.streaming import ResponseParser, StreamingResponse
+
+
+class FakeResponse(object):
+    """
+    A requests response which yields its content in fixed size chunks
+    """
+    def __init__(self, content, chunk_size):
+        self.content = content.encode('utf-8')
+        self.read_size = chunk_size
+        self.status_code = 200
+        self.headers = {}
+        self.encoding = 'utf-8'
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for position in range(0, len(self.content), self.read_size):
+            yield self.content[position:position + self.read_size]
+
+    def close(self):
+        self.closed = True
+
+
+class TestResponseParser(object):
+    """
+    Validates that responses are parsed the same however their text is split into pieces
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+    RESPONSE = {
+        'meta': {'processing_time': 12.5, 'next': None, 'count': 1e5, 'test': True},
+        'data': [12.5, -1e-05, True, False, None, 'text, with ] delimiters', {'id': 7, 'values': [1, 2.25]},
+                 [], {}, 1234567890, 'é'],
+    }
+
+    def parse(self, pieces):
+        parser = ResponseParser()
+        elements = []
+        for piece in pieces[:-1]:
+            elements.extend(parser.feed(piece))
+        elements.extend(parser.feed(pieces[-1], final=True))
+        return parser, elements
+
+    def assert_parsed(self, text, pieces):
+        parser, elements = self.parse(pieces)
+        expected = json.loads(text)
+        assert elements == expected['data'], self.ASSERTION_EQ_MSG.format(expected['data'], elements)
+        assert parser.fields == {'meta': expected['meta']}, self.ASSERTION_EQ_MSG.format(expected['meta'],
+                                                                                          parser.fields)
+
+    def test_every_split_point(self):
+        for text in (json.dumps(self.RESPONSE), json.dumps(self.RESPONSE, indent=2)):
+            for split in range(len(text) + 1):
+                self.assert_parsed(text, [text[:split], text[split:]])
+
+    def test_split_scalars(self):
+        for value in ('12.5', '1e5', '-0.25E-3', 'true', 'false', 'null'):
+            text = '{"data": [' + value + ', ' + value + '], "meta": {"value": ' + value + '}}'
+            for split in range(len(text) + 1):
+                self.assert_parsed(text, [text[:split], text[split:]])
+
+    def test_single_characters(self):
+        text = json.dumps(self.RESPONSE)
+        self.assert_parsed(text, list(text))
+
+    def test_elements_are_returned_as_they_arrive(self):
+        records = [{'id': str(index), 'name': 'PROVIDER {0}'.format(index), 'npi': 1467560003 + index,
+                    'locations': [{'zipcode': '94401', 'distance': index * 0.5}]} for index in range(2000)]
+        text = json.dumps({'meta': {'count': len(records)}, 'data': records})
+        chunk_size = 4096
+        parser = ResponseParser()
+        elements = []
+        for position in range(0, len(text), chunk_size):
+            parsed = parser.feed(text[position:position + chunk_size])
+            assert position < chunk_size or parsed, 'No elements were returned at {0}'.format(position)
+            assert len(parser._buffer) < chunk_size, len(parser._buffer)
+            elements.extend(parsed)
+        # only the last element can be completed by the final feed
+        assert len(elements) >= len(records) - 1, len(elements)
+        elements.extend(parser.feed('', final=True))
+        assert elements == records
+        assert parser.fields == {'meta': {'count': len(records)}}, parser.fields
+
+    def test_data_which_is_not_an_array(self):
+        parser, elements = self.parse(['{"data": {"errors": {"query": "invalid"}}, "meta": {}}'])
+        assert elements == [], self.ASSERTION_EQ_MSG.format([], elements)
+        try:
+            parser.raise_for_data()
+        except APIError as error:
+            assert error.response['data'] == {'errors': {'query': 'invalid'}}, str(error.response)
+        else:
+            raise AssertionError('APIError was not raised')
+
+    def test_incomplete_response(self):
+        try:
+            self.parse(['{"data": [1, 2', ''])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError was not raised')
+
+
+class TestStreamingResponse(object):
+    """
+    Validates that streaming responses yield their data and raise errors reported by the platform
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def test_elements(self):
+        text = json.dumps({'data': [{'id': index} for index in range(100)], 'meta': {'count': 100}})
+        for chunk_size in (1, 7, 64, len(text)):
+            response = FakeResponse(text, chunk_size)
+            streaming = StreamingResponse(response).start()
+            ids = [element['id'] for element in streaming]
+            assert ids == list(range(100)), self.ASSERTION_EQ_MSG.format(list(range(100)), ids)
+            assert streaming.meta == {'count': 100}, self.ASSERTION_EQ_MSG.format({'count': 100}, streaming.meta)
+            assert response.closed
+
+    def test_errors_raised_by_start(self):
+        text = json.dumps({'meta': {'processing_time': 3}, 'data': {'errors': {'validation': ['invalid']}}})
+        for chunk_size in (1, 16, len(text)):
+            response = FakeResponse(text, chunk_size)
+            try:
+                StreamingResponse(response).start()
+            except APIError as error:
+                assert error.response['meta'] == {'processing_time': 3}, str(error.response)
+                assert 'errors' in error.response['data'], str(error.response)
+            else:
+                raise AssertionError('APIError was not raised')
+            assert response.closed
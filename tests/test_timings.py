@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+
+import sys
+import time
+
+import pokitdok
+from pokitdok.api.client import PokitDokClient
+from pokitdok.api.metrics import Metrics
+from pokitdok.api.stand_in import StandInServer
+
+TOKEN_DELAY = 0.3
+
+
+class SlowTokenClient(PokitDokClient):
+    """
+    A client whose access token requests take at least TOKEN_DELAY seconds
+    """
+    def fetch_access_token(self, code=None):
+        time.sleep(TOKEN_DELAY)
+        return super(SlowTokenClient, self).fetch_access_token(code=code)
+
+
+class TestTokenTimings(object):
+    """
+    Validates that the time taken to fetch access tokens is kept out of request timings
+    """
+    def assert_timings(self, timings, metrics, endpoint):
+        assert timings['token'] >= TOKEN_DELAY, timings
+        assert timings['total'] < TOKEN_DELAY, timings
+        assert timings['ttfb'] < TOKEN_DELAY, timings
+        snapshot = metrics.snapshot()
+        assert snapshot['token_requests'] == 1, snapshot
+        assert snapshot['token_latency']['max'] is not None, snapshot
+        assert snapshot['endpoints'][endpoint]['latency']['max'] < TOKEN_DELAY, snapshot
+
+    def test_lazy_token_fetch(self):
+        with StandInServer() as server:
+            metrics = Metrics()
+            client = SlowTokenClient('client', 'secret', base=server.url, lazy=True, metrics=metrics)
+            response = client.request_response('/providers/1467560003')
+            self.assert_timings(response.timings, metrics, 'providers')
+            response = client.request_response('/providers/1467560003')
+            assert response.timings['token'] == 0, response.timings
+
+    def test_expired_token_renewal(self):
+        with StandInServer() as server:
+            metrics = Metrics()
+            client = SlowTokenClient('client', 'secret', base=server.url, lazy=True, auto_refresh=True)
+            client.request_response('/providers/1467560003')
+            metrics.attach(client)
+            client.metrics = metrics
+            server.expire_tokens()
+            token = dict(client.token)
+            token['expires_at'] = time.time() - 1
+            token.pop('expires_in', None)
+            client.token = token
+            client.initialize_api_client()
+            response = client.request_response('/providers/1467560003')
+            assert response.status_code == 200, response.status_code
+            self.assert_timings(response.timings, metrics, 'providers')
+
+    def test_async_token_fetch(self):
+        if sys.version_info < (3, 6):
+            return
+        import asyncio
+        from pokitdok.api.async_client import AsyncPokitDokClient
+
+        class SlowTokenAsyncClient(AsyncPokitDokClient):
+            async def fetch_access_token(self, code=None):
+                await asyncio.sleep(TOKEN_DELAY)
+                return await super(SlowTokenAsyncClient, self).fetch_access_token(code=code)
+
+        async def run(url, metrics):
+            client = SlowTokenAsyncClient('client', 'secret', base=url, metrics=metrics)
+            try:
+                return await client.request_response('/providers/1467560003')
+            finally:
+                await client.close()
+
+        with StandInServer() as server:
+            metrics = Metrics()
+            loop = asyncio.new_event_loop()
+            try:
+                response = loop.run_until_complete(run(server.url, metrics))
+            finally:
+                loop.close()
+            self.assert_timings(response.timings, metrics, 'providers')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from email.parser import BytesParser
+
+from pokitdok.api.uploads import MultipartUpload
+
+
+class ChunkedFile(object):
+    """
+    A file held in memory which is sent like an X12Chunk
+    """
+    def __init__(self, content):
+        self.content = content
+        self.size = len(content)
+
+    def iter_chunks(self, chunk_size):
+        for position in range(0, self.size, chunk_size):
+            yield self.content[position:position + chunk_size]
+
+
+class TestMultipartUpload(object):
+    """
+    Validates that multipart upload bodies are well formed
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def create_upload(self, directory, compress=False):
+        path = os.path.join(directory, 'claims.837')
+        with open(path, 'wb') as upload_file:
+            upload_file.write(bytearray(range(256)) * 800)
+        files = {
+            'file': ('claims.837', path, 'application/EDI-X12'),
+            'chunk': ('chunk "1".x12', ChunkedFile(b'ISA*00~' * 1000), 'application/EDI-X12'),
+        }
+        fields = {'trading_partner_id': 'MOCKPAYER', 'name': u'Sébastien', 'count': 3}
+        return MultipartUpload(fields=fields, files=files, compress=compress, chunk_size=4096), path
+
+    def parse(self, upload, body):
+        headers = 'Content-Type: {0}\r\n\r\n'.format(upload.headers['Content-Type']).encode('ascii')
+        message = BytesParser().parsebytes(headers + body)
+        return dict((part.get_param('name', header='content-disposition'), part) for part in message.get_payload())
+
+    def assert_parts(self, upload, path, body):
+        parts = self.parse(upload, body)
+        assert parts['trading_partner_id'].get_payload(decode=True) == b'MOCKPAYER'
+        assert parts['name'].get_payload(decode=True) == u'Sébastien'.encode('utf-8')
+        assert parts['count'].get_payload(decode=True) == b'3'
+        with open(path, 'rb') as upload_file:
+            assert parts['file'].get_payload(decode=True) == upload_file.read()
+        assert parts['file'].get_filename() == 'claims.837'
+        assert parts['chunk'].get_payload(decode=True) == b'ISA*00~' * 1000
+
+    def test_length_matches_body(self):
+        directory = tempfile.mkdtemp()
+        try:
+            upload, path = self.create_upload(directory)
+            body = b''.join(upload)
+            assert upload.length() == len(body), self.ASSERTION_EQ_MSG.format(upload.length(), len(body))
+            assert len(upload.body()) == len(body), self.ASSERTION_EQ_MSG.format(len(upload.body()), len(body))
+            assert 'Content-Encoding' not in upload.headers
+            self.assert_parts(upload, path, body)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_body_may_be_sent_again(self):
+        directory = tempfile.mkdtemp()
+        try:
+            upload, path = self.create_upload(directory)
+            body = upload.body()
+            assert b''.join(body) == b''.join(body)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_gzip_round_trip(self):
+        directory = tempfile.mkdtemp()
+        try:
+            upload, path = self.create_upload(directory, compress=True)
+            compressed = b''.join(upload.body())
+            assert upload.length() is None
+            assert upload.headers['Content-Encoding'] == 'gzip'
+            body = gzip.GzipFile(fileobj=io.BytesIO(compressed)).read()
+            assert len(compressed) < len(body), self.ASSERTION_EQ_MSG.format(len(body), len(compressed))
+            self.assert_parts(upload, path, body)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,155 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+import pokitdok
+from pokitdok.api.stand_in import StandInServer
+from pokitdok.api.x12 import X12EnrollmentFile
+
+ISA = (b'ISA*00*          *00*          *ZZ*SENDER         *ZZ*RECEIVER       *140101*1200*^*00501*000000905*0*P*:')
+HEADER = [
+    ISA,
+    b'GS*BE*SENDER*RECEIVER*20140101*1200*41*X*005010X220A1',
+    b'ST*834*0001*005010X220A1',
+    b'BGN*00*12456*20140101*1200****4',
+    b'QTY*TO*0',
+    b'QTY*ET*0',
+    b'QTY*DT*0',
+    b'N1*P5*EMPLOYER*FI*999888777',
+    b'N1*IN*INSURER*FI*654456654',
+]
+TRAILER = [b'SE*0*0001', b'GE*1*41', b'IEA*1*000000905']
+
+# the number of members in the test file, of which every third is an employee
+MEMBERS = 40
+
+
+def member_segments(index):
+    """
+    :return: the segments of a member, whose length varies with its index
+    """
+    employee = b'Y' if index % 3 == 0 else b'N'
+    segments = [
+        b'INS*' + employee + b'*18*030*XN*A*E**FT',
+        'REF*0F*{0:09d}'.format(index).encode('ascii'),
+        'NM1*IL*1*MEMBER*NUMBER{0}'.format(index).encode('ascii'),
+        b'DMG*D8*19700101*F',
+    ]
+    segments.extend(b'HD*030**HLT*PLAN' + str(plan).encode('ascii') + b'*EMP' for plan in range(index % 4))
+    return segments
+
+
+def segments(content):
+    return [segment.strip(b'\r\n') for segment in content.split(b'~') if segment.strip(b'\r\n')]
+
+
+def elements(chunk_segments, identifier):
+    return [segment.split(b'*') for segment in chunk_segments if segment.split(b'*')[0] == identifier]
+
+
+class TestX12EnrollmentFile(object):
+    """
+    Validates that 834 files are split into complete interchanges holding whole members
+    """
+    ASSERTION_EQ_MSG = 'Expected {} != Actual {}'
+
+    def setup_method(self, method=None):
+        self.directory = tempfile.mkdtemp()
+        self.members = [member_segments(index) for index in range(MEMBERS)]
+
+    def teardown_method(self, method=None):
+        shutil.rmtree(self.directory)
+
+    setup = setup_method
+    teardown = teardown_method
+
+    def write_file(self, line_break=b'\n'):
+        path = os.path.join(self.directory, 'employees.x12')
+        file_segments = HEADER + [segment for member in self.members for segment in member] + TRAILER
+        with open(path, 'wb') as x12_file:
+            x12_file.write(b''.join(segment + b'~' + line_break for segment in file_segments))
+        return path
+
+    def test_isa_length(self):
+        assert len(ISA) + 1 == 106, len(ISA)
+
+    def test_chunk_envelopes(self):
+        with X12EnrollmentFile(self.write_file()) as x12_file:
+            chunks = x12_file.chunks(max_chunk_size=1500)
+            assert len(chunks) > 2, len(chunks)
+            for index, chunk in enumerate(chunks):
+                content = chunk.read()
+                assert chunk.size == len(content), self.ASSERTION_EQ_MSG.format(chunk.size, len(content))
+                assert chunk.size <= 1500 or chunk.members == 1, chunk.size
+                assert chunk.filename == 'employees-{0:03d}.x12'.format(index), chunk.filename
+
+                chunk_segments = segments(content)
+                identifiers = [segment.split(b'*')[0] for segment in chunk_segments]
+                assert identifiers[:3] == [b'ISA', b'GS', b'ST'], identifiers
+                assert identifiers[-3:] == [b'SE', b'GE', b'IEA'], identifiers
+
+                # SE counts the segments from ST to SE inclusive
+                se = elements(chunk_segments, b'SE')[0]
+                expected = identifiers.index(b'SE') - identifiers.index(b'ST') + 1
+                assert int(se[1]) == expected, self.ASSERTION_EQ_MSG.format(expected, int(se[1]))
+                assert se[2] == b'0001', se
+
+                isa = chunk_segments[0].split(b'*')
+                interchange_number = '{0:09d}'.format(905 + index).encode('ascii')
+                assert isa[13] == interchange_number, self.ASSERTION_EQ_MSG.format(interchange_number, isa[13])
+                assert elements(chunk_segments, b'IEA')[0][2] == interchange_number
+                group_number = str(41 + index).encode('ascii')
+                assert elements(chunk_segments, b'GS')[0][6] == group_number
+                assert elements(chunk_segments, b'GE')[0][2] == group_number
+
+                ins = elements(chunk_segments, b'INS')
+                assert chunk.members == len(ins), self.ASSERTION_EQ_MSG.format(len(ins), chunk.members)
+                employees = len([member for member in ins if member[1] == b'Y'])
+                counts = dict((qty[1], int(qty[2])) for qty in elements(chunk_segments, b'QTY'))
+                expected = {b'TO': len(ins), b'ET': employees, b'DT': len(ins) - employees}
+                assert counts == expected, self.ASSERTION_EQ_MSG.format(expected, counts)
+
+    def test_members_round_trip(self):
+        for line_break in (b'', b'\n', b'\r\n'):
+            with X12EnrollmentFile(self.write_file(line_break)) as x12_file:
+                chunks = x12_file.chunks(max_chunk_size=1000)
+                assert sum(chunk.members for chunk in chunks) == MEMBERS
+                found = []
+                for chunk in chunks:
+                    chunk_segments = segments(chunk.read())
+                    identifiers = [segment.split(b'*')[0] for segment in chunk_segments]
+                    found.extend(chunk_segments[identifiers.index(b'INS'):identifiers.index(b'SE')])
+                expected = [segment for member in self.members for segment in member]
+                assert found == expected, line_break
+
+    def test_large_member(self):
+        self.members[5].extend(b'HD*030**HLT*PLAN*EMP' for plan in range(100))
+        with X12EnrollmentFile(self.write_file()) as x12_file:
+            chunks = x12_file.chunks(max_chunk_size=1500)
+            large = [chunk for chunk in chunks if chunk.size > 1500]
+            assert len(large) == 1, [chunk.size for chunk in chunks]
+            assert large[0].members == 1, large[0].members
+            assert sum(chunk.members for chunk in chunks) == MEMBERS
+
+    def test_single_chunk(self):
+        with X12EnrollmentFile(self.write_file()) as x12_file:
+            chunks = x12_file.chunks()
+            assert len(chunks) == 1, len(chunks)
+            assert segments(chunks[0].read())[3:-3] == HEADER[3:4] + [
+                b'QTY*TO*40', b'QTY*ET*14', b'QTY*DT*26'] + HEADER[7:] + [
+                segment for member in self.members for segment in member]
+
+    def test_chunked_upload(self):
+        with StandInServer(activity_duration=0) as server:
+            client = pokitdok.api.connect('client', 'secret', base=server.url)
+            path = self.write_file()
+            with X12EnrollmentFile(path) as x12_file:
+                sizes = [chunk.size for chunk in x12_file.chunks(max_chunk_size=1500)]
+            group = client.enrollment_snapshot_chunked('MOCKPAYER', path, max_chunk_size=1500)
+            activities = group.result(timeout=10)
+            assert len(activities) == len(sizes), self.ASSERTION_EQ_MSG.format(len(sizes), len(activities))
+            stats = server.stats()
+            assert stats['uploaded_files'] == len(sizes), stats
+            assert stats['uploaded_bytes'] == sum(sizes), self.ASSERTION_EQ_MSG.format(sum(sizes), stats)